@@ -1,11 +1,23 @@
 from langchain_core.tools import Tool, StructuredTool
-from hotel_search import search_hotels
+from hotel_search import search_hotels, search_more_hotels, new_search_cursor, BOOKING_MAX_PAGES, BOOKING_PAGE_SIZE
 from browserbase import browserbase
+from credentials import SearchCredentials, use_credentials
+from prefetch import get_prefetcher, PREFETCH_ENABLED
+from prewarm import ensure_prewarm_scheduler
+from search_log import record_search
+from groq_helper import stream_personalized_recommendation
+from hotel_index import shortlist_hotels
+from prompt_builder import PROMPT_MAX_CANDIDATES
 from kayak import kayak_hotels, kayak_hotel_search
-from typing import Dict, Optional, List, Any
+from gazetteer import get_gazetteer
+from facets import FacetIndex
+from typing import Dict, Optional, List, Any, Tuple, Union
 import streamlit as st
-from datetime import date
-from crewai import Task, Agent
+import re
+import uuid
+import threading
+from datetime import date, datetime
+from crewai import Task, Agent, Crew
 from crewai.tools import BaseTool, tool
 
 # Define tools as LangChain tools
@@ -35,7 +47,7 @@ def continue_iteration(response: str) -> bool:
     return response.lower().strip() in positive_responses
 
 # Combine tools into a custom executor
-def run_hotel_search(location: str, check_in_date: str = None, check_out_date: str = None, num_adults: int = 2, api_keys: Optional[Dict[str, str]] = None):
+def run_hotel_search(location: str, check_in_date: str = None, check_out_date: str = None, num_adults: int = 2, api_keys: Optional[Dict[str, str]] = None, cursor: Optional[Dict[str, Any]] = None):
     """
     Fast executor to run hotel search.
     
@@ -44,32 +56,27 @@ def run_hotel_search(location: str, check_in_date: str = None, check_out_date: s
         check_in_date: Check-in date (YYYY-MM-DD)
         check_out_date: Check-out date (YYYY-MM-DD)
         num_adults: Number of adults
-        api_keys: Dictionary containing API keys (BROWSERBASE_API_KEY, BROWSERBASE_PROJECT_ID, GROQ_API_KEY)
+        api_keys: Dictionary containing API keys (BROWSERBASE_API_KEY, BROWSERBASE_PROJECT_ID, GROQ_API_KEY),
+            scoped to this search so concurrent users never share keys
+        cursor: Optional cursor from new_search_cursor(), advanced for iterate_hotel_search
     """
     # Run search
     try:
-        # Convert API key names if needed for backward compatibility
-        search_api_keys = {}
-        
-        if api_keys:
-            # Map new key names to the ones expected by search_hotels
-            key_mapping = {
-                "BROWSERBASE_API_KEY": "BROWSERBASE_KEY",
-                "BROWSERBASE_PROJECT_ID": "BROWSERBASE_PROJECT_ID",
-                "GROQ_API_KEY": "GROQ_API_KEY"
-            }
-            
-            for new_key, old_key in key_mapping.items():
-                if new_key in api_keys and api_keys[new_key]:
-                    search_api_keys[old_key] = api_keys[new_key]
+        # Resolve this request's credentials; both BROWSERBASE_API_KEY and the older
+        # BROWSERBASE_KEY spelling are accepted
+        credentials = SearchCredentials.from_api_keys(api_keys)
+
+        # Remember what users search for so popular destinations can be pre-warmed
+        record_search(location, check_in_date, check_out_date, num_adults)
         
-        # Run the search with mapped keys
+        # Run the search with the request's own credentials
         results = search_hotels(
             location=location,
             check_in_date=check_in_date,
             check_out_date=check_out_date,
             num_adults=num_adults,
-            api_keys=search_api_keys  # Pass API keys to the search function
+            cursor=cursor,
+            credentials=credentials
         )
         
         # Ensure results is a list of dictionaries
@@ -88,10 +95,13 @@ def run_hotel_search(location: str, check_in_date: str = None, check_out_date: s
         return []
 
 # Create a separate function for additional iterations if needed
-def iterate_hotel_search(initial_results, location: str, check_in_date: str = None, check_out_date: str = None, num_adults: int = 2, api_keys: Optional[Dict[str, str]] = None):
+def iterate_hotel_search(initial_results, location: str, check_in_date: str = None, check_out_date: str = None, num_adults: int = 2, api_keys: Optional[Dict[str, str]] = None, cursor: Optional[Dict[str, Any]] = None):
     """
     Perform additional hotel search iterations if requested.
     
+    Each iteration continues from the search cursor, fetching the next Booking.com
+    result pages instead of re-running the whole search.
+    
     Args:
         initial_results: Results from the first search
         location: Location to search
@@ -99,39 +109,29 @@ def iterate_hotel_search(initial_results, location: str, check_in_date: str = No
         check_out_date: Check-out date (YYYY-MM-DD)
         num_adults: Number of adults
         api_keys: Dictionary containing API keys (BROWSERBASE_API_KEY, BROWSERBASE_PROJECT_ID, GROQ_API_KEY)
+        cursor: Cursor passed to run_hotel_search for the first search; if omitted the
+            first search is assumed to have fetched the default number of pages
         
     Returns:
         Updated results with any new hotels found
     """
     results = initial_results.copy() if initial_results else []
     
+    if cursor is None:
+        cursor = new_search_cursor(next_offset=BOOKING_MAX_PAGES * BOOKING_PAGE_SIZE)
+    
     # Ask if user wants to iterate (for more results)
     response = input("\nWould you like to search for more hotels? (yes/no): ")
     should_continue = continue_iteration(response)
     
-    # Convert API key names if needed for backward compatibility
-    search_api_keys = {}
-    
-    if api_keys:
-        # Map new key names to the ones expected by search_hotels
-        key_mapping = {
-            "BROWSERBASE_API_KEY": "BROWSERBASE_KEY",
-            "BROWSERBASE_PROJECT_ID": "BROWSERBASE_PROJECT_ID",
-            "GROQ_API_KEY": "GROQ_API_KEY"
-        }
-        
-        for new_key, old_key in key_mapping.items():
-            if new_key in api_keys and api_keys[new_key]:
-                search_api_keys[old_key] = api_keys[new_key]
-    
     while should_continue:
         print("Searching for more hotels...")
-        more_results = search_hotels(
+        more_results = search_more_hotels(
             location=location,
             check_in_date=check_in_date,
             check_out_date=check_out_date,
             num_adults=num_adults,
-            api_keys=search_api_keys  # Pass mapped API keys to the search function
+            cursor=cursor
         )
         
         if more_results:
@@ -149,6 +149,10 @@ def iterate_hotel_search(initial_results, location: str, check_in_date: str = No
             print("No additional hotels found.")
             should_continue = False
         
+        if should_continue and cursor.get("exhausted"):
+            print("Reached the last page of results.")
+            should_continue = False
+        
         if should_continue:
             response = input("\nContinue to iterate for more results? (yes/no): ")
             should_continue = continue_iteration(response)
@@ -266,14 +270,17 @@ def present_hotel_results(hotels):
     
     return result
 
-def load_llm():
-    """Load and return Groq LLM with functions"""
+# Groq model behind the CrewAI agents
+AGENT_LLM_MODEL = "groq/meta-llama/llama-4-scout-17b-16e-instruct"
+
+def load_llm(api_key: Optional[str] = None):
+    """Load and return Groq LLM with functions (api_key defaults to GROQ_API_KEY)"""
     try:
         from crewai import LLM
         from groq_helper import generate_review_summary, generate_personalized_recommendation
         
         # Create a crewai LLM instance
-        llm = LLM(model="groq/meta-llama/llama-4-scout-17b-16e-instruct")
+        llm = LLM(model=AGENT_LLM_MODEL, api_key=api_key) if api_key else LLM(model=AGENT_LLM_MODEL)
         
         # Return a dictionary with the functions for compatibility
         return {
@@ -334,11 +341,164 @@ search_task = Task(
     agent=hotels_agent,
 )
 
+def build_search_crew(credentials: SearchCredentials) -> Crew:
+    """
+    Build the hotels agent and its search task for one request.
+
+    The module-level agents hold an LLM created at import from GROQ_API_KEY, so a
+    request's own Groq key needs an LLM, agent and task of its own.
+    """
+    agent = Agent(
+        role=hotels_agent.role,
+        goal=hotels_agent.goal,
+        backstory=hotels_agent.backstory,
+        tools=[kayak_search_tool, browserbase_search_tool],
+        allow_delegation=False,
+        llm=load_llm(credentials.groq_api_key)["instance"],
+    )
+    task = Task(description=search_task.description, expected_output=search_task.expected_output, agent=agent)
+    return Crew(agents=[agent], tasks=[task])
+
+_router_lock = threading.Lock()
+# agent_measured counts the agent runs that reported their LLM calls (agent_llm_calls)
+_router_stats = {"direct": 0, "agent": 0, "agent_measured": 0, "agent_llm_calls": 0}
+
+_ISO_DATE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+_ADULTS = re.compile(r"\b(\d+)\s*(?:adults?|guests?|people|persons?)\b", re.IGNORECASE)
+_LOCATION = re.compile(r"\b(?:in|at|near|to)\s+([A-Za-zÀ-ÿ .,'-]+?)(?=\s+(?:from|for|on|between|checking|check-in)\b|\s*\d|[.;!?]|$)", re.IGNORECASE)
+
+def _parse_adults(value: Any) -> int:
+    if value is None or value == "":
+        return 2
+    try:
+        num_adults = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"num_adults must be a whole number, not {value!r}")
+    if num_adults < 1 or num_adults != float(value):
+        raise ValueError(f"num_adults must be a whole number of at least 1, not {value!r}")
+    return num_adults
+
+def _parse_dates(check_in_date: str, check_out_date: str) -> Tuple[str, str]:
+    for value in (check_in_date, check_out_date):
+        try:
+            datetime.strptime(value, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            raise ValueError(f"Dates must be real dates in YYYY-MM-DD format, not {value!r}")
+    if check_out_date <= check_in_date:
+        raise ValueError(f"check_out_date ({check_out_date}) must be after check_in_date ({check_in_date})")
+    return check_in_date, check_out_date
+
+def parse_structured_request(request: Union[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Extract location, dates and adults from a request, if it is fully structured.
+
+    Dicts need location, check_in_date and check_out_date. Text qualifies only when it
+    names a known place (via the gazetteer) and two ISO dates, e.g. "hotels in Paris
+    from 2025-06-01 to 2025-06-03 for 3 adults". Anything else returns None and is
+    left to the agent.
+
+    Raises:
+        ValueError: A dict without a location, invalid or reversed dates, or an invalid num_adults
+    """
+    if isinstance(request, dict):
+        if not request.get("location"):
+            raise ValueError("A location or a free-text query is required")
+        num_adults = _parse_adults(request.get("num_adults"))
+        if request.get("check_in_date") and request.get("check_out_date"):
+            check_in_date, check_out_date = _parse_dates(request["check_in_date"], request["check_out_date"])
+            return {
+                "location": request["location"],
+                "check_in_date": check_in_date,
+                "check_out_date": check_out_date,
+                "num_adults": num_adults,
+            }
+        return None
+
+    dates = _ISO_DATE.findall(request or "")
+    location_match = _LOCATION.search(request or "")
+    if len(dates) != 2 or not location_match:
+        return None
+    place = get_gazetteer().resolve(location_match.group(1).strip(" ,"))
+    if place is None:
+        return None
+    # Two explicit dates for a known place: wrong ones are an error, not a question for the agent
+    check_in_date, check_out_date = _parse_dates(*sorted(dates))
+    adults_match = _ADULTS.search(request)
+    return {
+        "location": place.display_name,
+        "check_in_date": check_in_date,
+        "check_out_date": check_out_date,
+        "num_adults": _parse_adults(adults_match.group(1) if adults_match else None),
+    }
+
+def route_hotel_request(request: Union[str, Dict[str, Any]], api_keys: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Answer a hotel request on the cheapest path that can handle it.
+
+    Fully structured requests go straight to the provider orchestrator through
+    run_hotel_search, with no LLM involved. Free-form requests are handed to the
+    CrewAI hotels agent, which plans its tool calls with the LLM.
+
+    Args:
+        request: Search fields (location, check_in_date, check_out_date, num_adults) or free text
+        api_keys: Dictionary containing API keys, as for run_hotel_search
+
+    Returns:
+        dict: {"route": "direct", "hotels": [...]} or {"route": "agent", "answer": "..."}
+
+    Raises:
+        ValueError: The request is empty or has invalid fields
+    """
+    if isinstance(request, str) and not request.strip():
+        raise ValueError("A location or a free-text query is required")
+    structured = parse_structured_request(request)
+    if structured is not None:
+        hotels = run_hotel_search(api_keys=api_keys, **structured)
+        with _router_lock:
+            _router_stats["direct"] += 1
+        return {"route": "direct", "hotels": hotels}
+
+    text = request if isinstance(request, str) else ", ".join(f"{key}: {value}" for key, value in request.items() if value)
+    credentials = SearchCredentials.from_api_keys(api_keys)
+    # The crew's LLM uses the request's Groq key; its tools read the other keys from the context
+    crew = build_search_crew(credentials)
+    with use_credentials(credentials):
+        output = crew.kickoff(inputs={"request": text, "current_year": date.today().year})
+    usage = getattr(output, "token_usage", None)
+    llm_calls = getattr(usage, "successful_requests", 0)
+    with _router_lock:
+        _router_stats["agent"] += 1
+        if llm_calls:
+            _router_stats["agent_measured"] += 1
+            _router_stats["agent_llm_calls"] += llm_calls
+    return {"route": "agent", "answer": str(output)}
+
+def get_router_stats() -> Dict[str, Any]:
+    """
+    Requests per route and the LLM calls measured on the agent route.
+
+    estimated_llm_calls_saved is the direct requests times the measured mean LLM
+    calls of an agent run (None until an agent run reported its usage); it is an
+    estimate, since the direct requests never ran through the agent.
+    """
+    with _router_lock:
+        stats = dict(_router_stats)
+    mean_calls = stats["agent_llm_calls"] / stats["agent_measured"] if stats["agent_measured"] else None
+    stats["mean_agent_llm_calls"] = round(mean_calls, 2) if mean_calls is not None else None
+    stats["estimated_llm_calls_saved"] = round(stats["direct"] * mean_calls, 1) if mean_calls is not None else None
+    return stats
+
 # Streamlit UI setup
+# Session-state keys of the result filter widgets, reset by every new search
+_FILTER_KEYS = ("filter_price", "filter_rating", "filter_stars", "filter_areas")
+
 def setup_streamlit_ui():
     # Set the title of the application
     st.title("Best Hotel Finder")
 
+    # Refresh popular searches off-peak (no-op unless HOTELFINDER_PREWARM is set)
+    ensure_prewarm_scheduler()
+
     # Sidebar for API Key Inputs
     st.sidebar.header("API Key Settings")
     browserbase_key = st.sidebar.text_input("BrowserBase API Key", type="password")
@@ -352,6 +512,23 @@ def setup_streamlit_ui():
     # Add date fields for check-in and check-out
     check_in_date = st.date_input("Check-in date:", min_value=date.today(), key="check_in_input")
     check_out_date = st.date_input("Check-out date:", min_value=check_in_date, key="check_out_input")
+    preferences_text = st.text_input("What matters to you? (optional)", placeholder="quiet, near old town, under $150", key="preferences_input")
+
+    # Start searching in the background once the inputs settle, so "Find Hotels" hits a warm cache
+    if PREFETCH_ENABLED and location and check_in_date and check_out_date:
+        session_id = st.session_state.setdefault("prefetch_session_id", uuid.uuid4().hex)
+        get_prefetcher().observe(
+            session_id,
+            location,
+            check_in_date.strftime("%Y-%m-%d"),
+            check_out_date.strftime("%Y-%m-%d"),
+            num_adults,
+            SearchCredentials.from_api_keys({
+                "BROWSERBASE_KEY": browserbase_key,
+                "BROWSERBASE_PROJECT_ID": browserbase_project_id,
+                "GROQ_API_KEY": groq_key
+            })
+        )
 
     # Button to find hotels
     if st.button("Find Hotels", key="find_hotels_button"):
@@ -379,13 +556,6 @@ def setup_streamlit_ui():
                     }
                 )
             
-            # Display summary of results
-            kayak_count = len([h for h in results if h.get('source') == 'Kayak'])
-            booking_count = len([h for h in results if h.get('source') == 'Booking.com'])
-            st.write(f"Found {len(results)} hotels: {kayak_count} from Kayak and {booking_count} from Booking.com")
-            
-            st.write("### Top Hotel Results:")
-            
             # Filter and sort by rating only - ensure we have both Kayak and Booking.com results
             valid_hotels = []
             for h in results:
@@ -407,30 +577,101 @@ def setup_streamlit_ui():
                     valid_hotels.append(h)
             
             sorted_hotels = sorted(valid_hotels, key=lambda x: (-x.get('rating_num', 0), x.get('price_value', float('inf'))))
-            top_hotels = sorted_hotels[:10]
-            
-            # Create tabs for Kayak and Booking.com results
-            all_tab, kayak_tab, booking_tab = st.tabs(["All Hotels", "Kayak", "Booking.com"])
-            
-            with all_tab:
-                display_hotels(top_hotels)
-                
-            with kayak_tab:
-                kayak_hotels = [h for h in sorted_hotels if h.get('source') == 'Kayak']
-                if kayak_hotels:
-                    display_hotels(kayak_hotels[:10])
-                else:
-                    st.info("No Kayak hotel results found.")
-                    
-            with booking_tab:
-                booking_hotels = [h for h in sorted_hotels if h.get('source') == 'Booking.com']
-                if booking_hotels:
-                    display_hotels(booking_hotels[:10])
-                else:
-                    st.info("No Booking.com hotel results found.")
+
+            # Keep the results and their facet index across reruns, so changing a filter
+            # re-slices the index instead of searching again
+            for key in _FILTER_KEYS:
+                st.session_state.pop(key, None)
+            st.session_state["search_results"] = {
+                "hotels": sorted_hotels,
+                "facets": FacetIndex(sorted_hotels),
+                "found": len(results),
+                "kayak_count": len([h for h in results if h.get('source') == 'Kayak']),
+                "booking_count": len([h for h in results if h.get('source') == 'Booking.com']),
+                "location": location,
+                "check_in": check_in_str,
+                "check_out": check_out_str,
+                "preferences_text": preferences_text,
+                "recommendation": None,
+            }
         else:
             st.error("Please enter all required fields.")
 
+    search = st.session_state.get("search_results")
+    if search:
+        display_search_results(search, groq_key)
+
+def display_search_results(search: Dict[str, Any], groq_key: str):
+    """Show a search's results with facet filters, and its streamed recommendation."""
+    facets = search["facets"]
+
+    # Display summary of results
+    st.write(f"Found {search['found']} hotels: {search['kayak_count']} from Kayak and {search['booking_count']} from Booking.com")
+
+    # Current filter values (from the widgets' previous run) give the facet counts shown next to each option
+    # Price bounds are finite: unpriced hotels have no price facet value. The slider's
+    # full range means no price filter, so it keeps the unpriced hotels listed
+    price_range = facets.ranges["price"].bounds(facets.all)
+    price = st.session_state.get("filter_price")
+    if price and price_range and (float(price[0]), float(price[1])) == (float(price_range[0]), float(price_range[1])):
+        price = None
+    filters = {
+        "min_price": price[0] if price else None,
+        "max_price": price[1] if price else None,
+        "min_rating": st.session_state.get("filter_rating") or None,
+        "stars": st.session_state.get("filter_stars"),
+        "areas": st.session_state.get("filter_areas"),
+    }
+    counts = facets.facet_counts(**filters)
+    with st.expander("Filter results"):
+        if price_range and price_range[0] < price_range[1]:
+            st.slider("Price", min_value=float(price_range[0]), max_value=float(price_range[1]), value=(float(price_range[0]), float(price_range[1])), key="filter_price")
+        st.slider("Minimum rating (out of 5)", min_value=0.0, max_value=5.0, value=0.0, step=0.5, key="filter_rating")
+        st.multiselect("Stars", sorted(facets.categories["stars"]), format_func=lambda stars: f"{stars}⭐ ({counts['stars'].get(stars, 0)})", key="filter_stars")
+        st.multiselect("Area", sorted(facets.categories["area"], key=lambda area: -facets.count(facets.categories["area"][area])), format_func=lambda area: f"{area} ({counts['area'].get(area, 0)})", key="filter_areas")
+
+    mask = facets.filter(**filters)
+    if mask != facets.all:
+        st.caption(f"{facets.count(mask)} of {len(facets.hotels)} hotels match the filters")
+
+    st.write("### Top Hotel Results:")
+    top_hotels = facets.select(mask, limit=10)
+
+    # Create tabs for Kayak and Booking.com results
+    all_tab, kayak_tab, booking_tab = st.tabs(["All Hotels", f"Kayak ({counts['source'].get('Kayak', 0)})", f"Booking.com ({counts['source'].get('Booking.com', 0)})"])
+    
+    with all_tab:
+        display_hotels(top_hotels)
+        
+    with kayak_tab:
+        kayak_hotels = facets.select(mask & facets.filter(sources=["Kayak"]), limit=10)
+        if kayak_hotels:
+            display_hotels(kayak_hotels)
+        else:
+            st.info("No Kayak hotel results found.")
+            
+    with booking_tab:
+        booking_hotels = facets.select(mask & facets.filter(sources=["Booking.com"]), limit=10)
+        if booking_hotels:
+            display_hotels(booking_hotels)
+        else:
+            st.info("No Booking.com hotel results found.")
+
+    # Stream the recommendation below the results, so it starts appearing with its first tokens;
+    # later reruns (filter changes) show the finished text
+    if search["recommendation"]:
+        st.write("### Our Recommendation")
+        st.write(search["recommendation"])
+        return
+    credentials = SearchCredentials.from_api_keys({"GROQ_API_KEY": groq_key})
+    if search["hotels"] and credentials.groq_api_key:
+        # Match the stated preferences locally so the prompt only carries a short list
+        preferences_text = search["preferences_text"]
+        shortlist = shortlist_hotels(search["hotels"], preferences_text, search["location"], search["check_in"], search["check_out"], limit=PROMPT_MAX_CANDIDATES)
+        preferences = {"priorities": [preferences_text]} if preferences_text else {}
+        st.write("### Our Recommendation")
+        search["recommendation"] = st.write_stream(stream_personalized_recommendation(shortlist, preferences, api_key=credentials.groq_api_key))
+
 def display_hotels(hotels):
     """Display hotels in Streamlit UI"""
     for hotel in hotels:
@@ -0,0 +1,315 @@
+import os
+import uuid
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Dict, List, Any, Optional
+from fastapi import FastAPI, Request, Response, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
+from dotenv import load_dotenv
+from agents import run_hotel_search, route_hotel_request, get_router_stats
+from credentials import SearchCredentials
+from prefetch import get_prefetcher, PREFETCH_ENABLED
+from prewarm import ensure_prewarm_scheduler
+from gazetteer import get_gazetteer
+from price_watch import get_price_watcher, PRICE_WATCH_ENABLED
+from groq_helper import stream_personalized_recommendation, stream_review_summary
+from hotel_index import shortlist_hotels
+from prompt_builder import PROMPT_MAX_CANDIDATES, get_token_usage
+from chrome_watchdog import get_chrome_watchdog
+from facets import FacetIndex
+from wire_format import encode_payload, parse_fields, project, to_columns
+
+# Load environment variables
+load_dotenv()
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+SESSION_COOKIE = "hf_session"
+# Sessions unused for SESSION_TTL seconds are dropped, and at most MAX_SESSIONS are
+# kept (the least recently used go first)
+SESSION_TTL = float(os.environ.get("HOTELFINDER_SESSION_TTL", "86400"))
+MAX_SESSIONS = int(os.environ.get("HOTELFINDER_MAX_SESSIONS", "10000"))
+
+app = FastAPI(title="HotelFinder Pro")
+
+# Per-browser-session state (API keys, scraping permission), kept in memory in
+# least-recently-used order
+_sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_sessions_lock = threading.Lock()
+
+class PermissionRequest(BaseModel):
+    allow_search: bool
+
+class WatchRequest(BaseModel):
+    location: str
+    check_in_date: str
+    check_out_date: str
+    num_adults: int = 2
+    max_price: Optional[float] = None
+
+class SearchRequest(BaseModel):
+    # Either free text ("hotels in Paris from 2025-06-01 to 2025-06-03") or the fields below
+    query: Optional[str] = None
+    location: Optional[str] = None
+    check_in_date: Optional[str] = None
+    check_out_date: Optional[str] = None
+    num_adults: int = 2
+
+class RecommendationRequest(BaseModel):
+    hotels: List[Dict[str, Any]]
+    preferences: Dict[str, Any] = {}
+    # Free-text preference ("quiet, near old town, under $150") matched against the hotel index
+    preferences_text: Optional[str] = None
+    location: Optional[str] = None
+    check_in_date: Optional[str] = None
+    check_out_date: Optional[str] = None
+
+class PrefetchRequest(BaseModel):
+    location: str
+    check_in_date: Optional[str] = None
+    check_out_date: Optional[str] = None
+    num_adults: int = 2
+
+def _new_session(session_id: Optional[str]) -> Dict[str, Any]:
+    return {"id": session_id, "api_keys": {}, "permission_granted": False, "last_seen": monotonic()}
+
+def _expire_sessions(now: float):
+    # Called with _sessions_lock held; the least recently used session comes first
+    while _sessions:
+        session_id, session = next(iter(_sessions.items()))
+        if len(_sessions) <= MAX_SESSIONS and now - session["last_seen"] < SESSION_TTL:
+            break
+        del _sessions[session_id]
+
+def _session(request: Request, response: Response, create: bool = False) -> Dict[str, Any]:
+    """
+    Return the caller's session state.
+
+    A caller without a session gets a blank one that is not stored, so read-only
+    traffic (status checks, prefetches, searches refused for lack of permission)
+    keeps nothing in memory. Writes pass create=True, which stores the session and
+    issues its cookie. A cookie whose session is gone (expired, or the server
+    restarted) keeps its id if it owns price watches, so their events still reach it.
+    """
+    session_id = request.cookies.get(SESSION_COOKIE)
+    now = monotonic()
+    with _sessions_lock:
+        _expire_sessions(now)
+        session = _sessions.get(session_id) if session_id else None
+        if session is None:
+            if not create:
+                return _new_session(session_id if _owns_watches(session_id) else None)
+            if not _owns_watches(session_id):
+                session_id = uuid.uuid4().hex
+            session = _sessions[session_id] = _new_session(session_id)
+            response.set_cookie(SESSION_COOKIE, session_id, max_age=int(SESSION_TTL), httponly=True, samesite="strict")
+        session["last_seen"] = now
+        _sessions.move_to_end(session_id)
+        return session
+
+def _owns_watches(session_id: Optional[str]) -> bool:
+    return bool(session_id) and PRICE_WATCH_ENABLED and get_price_watcher().has_owner(session_id)
+
+def _credentials(session: Dict[str, Any]) -> SearchCredentials:
+    return SearchCredentials.from_api_keys(session["api_keys"])
+
+@app.on_event("startup")
+def start_background_jobs():
+    """Refresh popular searches off-peak and re-check price watches, when enabled."""
+    ensure_prewarm_scheduler()
+    if PRICE_WATCH_ENABLED:
+        get_price_watcher()
+
+@app.get("/")
+def index():
+    """Serve the search page."""
+    return FileResponse(os.path.join(STATIC_DIR, "index.html"))
+
+@app.get("/api-keys")
+def get_api_keys(request: Request, response: Response):
+    """Report which API keys are available, without revealing them."""
+    session = _session(request, response)
+    credentials = _credentials(session)
+    return {
+        "BROWSERBASE_KEY": bool(credentials.browserbase_api_key),
+        "PROXY_API_KEY": bool(session["api_keys"].get("PROXY_API_KEY") or os.environ.get("PROXY_API_KEY")),
+    }
+
+@app.post("/api-keys")
+def save_api_keys(keys: Dict[str, str], request: Request, response: Response):
+    """Store API keys for this browser session only."""
+    session = _session(request, response, create=True)
+    session["api_keys"].update({name: value for name, value in keys.items() if value})
+    return {"status": "success"}
+
+@app.get("/permission-status")
+def permission_status(request: Request, response: Response):
+    session = _session(request, response)
+    return {"permission_granted": session["permission_granted"]}
+
+@app.post("/permission")
+def set_permission(permission: PermissionRequest, request: Request, response: Response):
+    session = _session(request, response, create=True)
+    session["permission_granted"] = permission.allow_search
+    return {"permission_granted": session["permission_granted"]}
+
+@app.get("/locations")
+def locations(q: str, limit: int = 8):
+    """Autocomplete destinations from the bundled gazetteer."""
+    return {"locations": [place.to_dict() for place in get_gazetteer().autocomplete(q, limit=min(limit, 20))]}
+
+@app.get("/hotels")
+def hotels(request: Request, response: Response, location: str, check_in_date: Optional[str] = None, check_out_date: Optional[str] = None, num_adults: int = 2,
+           min_price: Optional[float] = None, max_price: Optional[float] = None, min_rating: Optional[float] = None, stars: Optional[List[int]] = Query(None),
+           area: Optional[List[str]] = Query(None), source: Optional[List[str]] = Query(None), facets: bool = False,
+           fields: Optional[str] = None, layout: str = Query("rows", alias="format")):
+    """
+    Search all providers; served from the result cache when a prefetch already ran.
+
+    Optional filters (price range, minimum rating, stars, area, source; repeat a
+    parameter to accept several values) are answered from a facet index of the
+    results; facets=true adds the counts per stars / area / source value.
+
+    fields=name,price,... returns only those hotel fields, format=columns sends the
+    hotels column by column with repeated values stored once (wire_format.to_columns).
+    The body is gzip / brotli compressed and sent as msgpack when the client accepts it.
+    """
+    session = _session(request, response)
+    if not session["permission_granted"]:
+        raise HTTPException(status_code=403, detail="Permission to search is required")
+
+    results = run_hotel_search(
+        location=location,
+        check_in_date=check_in_date,
+        check_out_date=check_out_date,
+        num_adults=num_adults,
+        api_keys=session["api_keys"]
+    )
+    filters = {"min_price": min_price, "max_price": max_price, "min_rating": min_rating, "stars": stars, "areas": area, "sources": source}
+    if not facets and all(value is None for value in filters.values()):
+        body = {"hotels": results}
+    else:
+        index = FacetIndex(results)
+        body = {"hotels": index.select(index.filter(**filters)), "total": len(results)}
+        if facets:
+            body["facets"] = index.facet_counts(**filters)
+    return _hotels_response(request, response, body, parse_fields(fields), layout)
+
+def _hotels_response(request: Request, response: Response, body: Dict[str, Any], fields: List[str], layout: str) -> Response:
+    if layout == "columns":
+        body["hotels"] = to_columns(body["hotels"], fields)
+    elif layout == "rows":
+        body["hotels"] = project(body["hotels"], fields)
+    else:
+        raise HTTPException(status_code=400, detail="format must be 'rows' or 'columns'")
+    content, headers = encode_payload(body, request.headers.get("accept"), request.headers.get("accept-encoding"))
+    media_type = headers.pop("Content-Type")
+    reply = Response(content=content, media_type=media_type, headers=headers)
+    # FastAPI drops the injected response once a Response is returned: keep the
+    # headers set on it, such as the session cookie
+    for name, value in response.raw_headers:
+        if name not in (b"content-length", b"content-type"):
+            reply.raw_headers.append((name, value))
+    return reply
+
+@app.post("/search")
+def search(body: SearchRequest, request: Request, response: Response):
+    """Route a request: structured searches skip the LLM agent, free text goes through it."""
+    session = _session(request, response)
+    if not session["permission_granted"]:
+        raise HTTPException(status_code=403, detail="Permission to search is required")
+    if body.query and body.query.strip():
+        query = body.query
+    elif body.location and body.location.strip():
+        query = {"location": body.location, "check_in_date": body.check_in_date, "check_out_date": body.check_out_date, "num_adults": body.num_adults}
+    else:
+        raise HTTPException(status_code=400, detail="A query or a location is required")
+    try:
+        return route_hotel_request(query, api_keys=session["api_keys"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/prefetch", status_code=202)
+def prefetch(query: PrefetchRequest, request: Request, response: Response):
+    """Report the search form's current inputs so a speculative search can warm the cache."""
+    session = _session(request, response)
+    if not PREFETCH_ENABLED or not session["permission_granted"]:
+        return {"status": "disabled"}
+
+    get_prefetcher().observe(
+        session["id"],
+        query.location,
+        query.check_in_date,
+        query.check_out_date,
+        query.num_adults,
+        _credentials(session)
+    )
+    return {"status": "observed"}
+
+@app.post("/recommendation")
+def recommendation(body: RecommendationRequest, request: Request, response: Response):
+    """Stream a personalized recommendation for the given hotels as plain text, token by token."""
+    session = _session(request, response)
+    hotels = body.hotels
+    preferences = dict(body.preferences)
+    if body.preferences_text and body.location and body.check_in_date and body.check_out_date:
+        hotels = shortlist_hotels(hotels, body.preferences_text, body.location, body.check_in_date, body.check_out_date, limit=PROMPT_MAX_CANDIDATES)
+        preferences.setdefault("priorities", [body.preferences_text])
+    text = stream_personalized_recommendation(hotels, preferences, api_key=_credentials(session).groq_api_key)
+    return StreamingResponse(text, media_type="text/plain; charset=utf-8", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/llm-usage")
+def llm_usage():
+    """Mean prompt/completion tokens per kind of LLM call, and the calls saved by the query router."""
+    return {"calls": get_token_usage().summary(), "router": get_router_stats()}
+
+@app.get("/browser-usage")
+def browser_usage():
+    """Live Chrome processes with their RSS and CPU time, watchdog kills and per-search browser usage."""
+    return get_chrome_watchdog().stats()
+
+@app.post("/review-summary")
+def review_summary(hotel: Dict[str, Any], request: Request, response: Response):
+    """Stream a review summary of one hotel as plain text."""
+    session = _session(request, response)
+    text = stream_review_summary(hotel, api_key=_credentials(session).groq_api_key)
+    return StreamingResponse(text, media_type="text/plain; charset=utf-8", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/watches")
+def add_watch(watch: WatchRequest, request: Request, response: Response):
+    """Get notified through /watch-events when a hotel in this search drops in price."""
+    session = _session(request, response, create=True)
+    if not PRICE_WATCH_ENABLED:
+        raise HTTPException(status_code=404, detail="Price watching is disabled")
+    try:
+        watch_id = get_price_watcher().add_watch(session["id"], watch.location, watch.check_in_date, watch.check_out_date, watch.num_adults, max_price=watch.max_price)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"id": watch_id}
+
+@app.get("/watches")
+def list_watches(request: Request, response: Response):
+    session = _session(request, response)
+    if not PRICE_WATCH_ENABLED or session["id"] is None:
+        return {"watches": []}
+    return {"watches": get_price_watcher().list_watches(session["id"])}
+
+@app.delete("/watches/{watch_id}")
+def remove_watch(watch_id: str, request: Request, response: Response):
+    session = _session(request, response)
+    if not PRICE_WATCH_ENABLED or session["id"] is None or not get_price_watcher().remove_watch(watch_id, owner=session["id"]):
+        raise HTTPException(status_code=404, detail="No such watch")
+    return {"status": "removed"}
+
+@app.get("/watch-events")
+def watch_events(request: Request, response: Response):
+    """Return and clear this session's pending price-drop events."""
+    session = _session(request, response)
+    if not PRICE_WATCH_ENABLED or session["id"] is None:
+        return {"events": []}
+    return {"events": get_price_watcher().pop_events(session["id"])}
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", "8000")))
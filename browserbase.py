@@ -1,6 +1,6 @@
-import os
 import requests
 from typing import Dict, Any, Optional
+from credentials import get_credentials
 
 def browserbase(url: str, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
@@ -13,9 +13,10 @@ def browserbase(url: str, options: Optional[Dict[str, Any]] = None) -> Dict[str,
     Returns:
         dict: The result from the browsing session
     """
-    # Get API credentials from environment variables
-    api_key = os.environ.get("BROWSERBASE_API_KEY")
-    project_id = os.environ.get("BROWSERBASE_PROJECT_ID")
+    # Get API credentials of the current request (falls back to environment variables)
+    credentials = get_credentials()
+    api_key = credentials.browserbase_api_key
+    project_id = credentials.browserbase_project_id
     
     if not api_key or not project_id:
         raise ValueError("BROWSERBASE_API_KEY and BROWSERBASE_PROJECT_ID must be set")
@@ -0,0 +1,233 @@
+import os
+import atexit
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from time import monotonic
+from typing import Dict, Optional
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from chrome_watchdog import get_chrome_watchdog, OWNER_SWITCH
+from provider_guard import SearchCancelled
+
+# Set HOTELFINDER_CAPTURE_NETWORK=1 to build results from provider API responses
+CAPTURE_NETWORK = os.environ.get("HOTELFINDER_CAPTURE_NETWORK", "").lower() in ("1", "true", "yes")
+
+# Number of Chrome instances kept warm for concurrent page fetches
+BROWSER_POOL_SIZE = int(os.environ.get("HOTELFINDER_BROWSER_POOL_SIZE", "3"))
+
+# Longest wait for a pooled browser before a page fetch gives up
+BROWSER_ACQUIRE_TIMEOUT = float(os.environ.get("HOTELFINDER_BROWSER_ACQUIRE_TIMEOUT", "60"))
+
+# V8 heap limit per renderer, so one heavy result page cannot grow without bound
+CHROME_JS_HEAP_MB = int(os.environ.get("HOTELFINDER_CHROME_JS_HEAP_MB", "512"))
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
+
+def build_chrome_options(capture_network: bool = False) -> Options:
+    """
+    Build the headless Chrome options shared by all scrapers.
+
+    Args:
+        capture_network (bool): Enable the performance log so network responses can be read over CDP
+
+    Returns:
+        Options: Configured Chrome options
+    """
+    chrome_options = Options()
+    chrome_options.add_argument('--headless')  # Add headless mode
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    chrome_options.add_argument('--window-size=1920,1080')
+    chrome_options.add_argument(f'user-agent={USER_AGENT}')
+    chrome_options.add_argument(f'--js-flags=--max-old-space-size={CHROME_JS_HEAP_MB}')
+    # Lets the watchdog recognise browsers left behind by a crashed process
+    chrome_options.add_argument(f'{OWNER_SWITCH}{os.getpid()}')
+
+    if capture_network:
+        # Record Network.* events and return from driver.get() at DOMContentLoaded,
+        # the result XHRs are read from the log as soon as they land
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        chrome_options.page_load_strategy = "eager"
+
+    return chrome_options
+
+def create_chrome_driver(capture_network: bool = False, label: str = "chrome") -> webdriver.Chrome:
+    """
+    Start a headless Chrome instance with automation fingerprints hidden.
+
+    The driver's process tree is supervised by the Chrome watchdog from the start.
+
+    Args:
+        capture_network (bool): Enable network response capture (see build_chrome_options)
+        label (str): Name of the browser's use in watchdog logs and stats
+
+    Returns:
+        webdriver.Chrome: The running driver; the caller is responsible for quitting it
+            with quit_driver()
+    """
+    driver = webdriver.Chrome(options=build_chrome_options(capture_network))
+    get_chrome_watchdog().register(driver, label)
+    driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
+        'source': '''
+            Object.defineProperty(navigator, 'webdriver', {
+                get: () => undefined
+            })
+        '''
+    })
+
+    if capture_network:
+        driver.execute_cdp_cmd('Network.enable', {})
+
+    return driver
+
+def quit_driver(driver):
+    """Quit a driver and kill any of its processes that survive quit(). Never raises."""
+    try:
+        driver.quit()
+    except Exception as e:
+        logging.debug(f"Error quitting driver: {str(e)}")
+    finally:
+        get_chrome_watchdog().unregister(driver)
+
+@contextmanager
+def chrome_session(capture_network: bool = False, label: str = "chrome"):
+    """
+    A one-off driver for the duration of a with-block, quit on every exit path.
+
+    Yields:
+        webdriver.Chrome: The driver; its use is time-boxed and charged to the current search
+    """
+    driver = create_chrome_driver(capture_network=capture_network, label=label)
+    try:
+        with get_chrome_watchdog().lease(driver):
+            yield driver
+    finally:
+        quit_driver(driver)
+
+class BrowserPool:
+    """
+    A bounded pool of reusable headless Chrome drivers.
+
+    Drivers are started lazily and kept warm between searches, so paginated scraping
+    can fetch several result pages at once without paying Chrome start-up per page.
+    A driver whose with-block raised, that the Chrome watchdog killed for exceeding
+    a resource cap, or that has used up its CPU-time budget is quit instead of being
+    returned to the pool.
+    """
+
+    def __init__(self, size: int = 3, capture_network: bool = False):
+        self.size = max(1, size)
+        self.capture_network = capture_network
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._drivers = set()
+        self._leased = 0
+
+    def free_slots(self) -> int:
+        """Drivers that could be borrowed right now without waiting."""
+        with self._lock:
+            return self.size - self._leased
+
+    def _wait_for_slot(self, timeout: Optional[float], cancel_event: Optional[threading.Event]) -> bool:
+        if cancel_event is None:
+            return self._slots.acquire(timeout=timeout) if timeout is not None else self._slots.acquire()
+        # Wake up regularly so a cancelled caller stops waiting
+        deadline = monotonic() + timeout if timeout is not None else None
+        while not cancel_event.is_set():
+            wait = 0.5 if deadline is None else min(0.5, deadline - monotonic())
+            if wait <= 0:
+                return False
+            if self._slots.acquire(timeout=wait):
+                return True
+        raise SearchCancelled("Cancelled while waiting for a browser")
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None, cancel_event: Optional[threading.Event] = None):
+        """
+        Borrow a driver for the duration of a with-block.
+
+        Args:
+            timeout (float, optional): Seconds to wait for a free slot
+            cancel_event (threading.Event, optional): Stop waiting once set
+
+        Yields:
+            webdriver.Chrome: A driver owned by the caller until the block exits
+
+        Raises:
+            TimeoutError: No slot became free within timeout
+            SearchCancelled: cancel_event was set while waiting
+        """
+        if not self._wait_for_slot(timeout, cancel_event):
+            raise TimeoutError("No browser available in the pool")
+        with self._lock:
+            self._leased += 1
+
+        watchdog = get_chrome_watchdog()
+        driver = None
+        healthy = False
+        try:
+            while driver is None:
+                try:
+                    driver = self._idle.get_nowait()
+                except queue.Empty:
+                    driver = create_chrome_driver(capture_network=self.capture_network, label="pool")
+                    with self._lock:
+                        self._drivers.add(driver)
+                if watchdog.is_killed(driver):
+                    # Killed while idle for exceeding a cap
+                    self._discard(driver)
+                    driver = None
+            with watchdog.lease(driver):
+                yield driver
+            # A browser over its lifetime CPU budget is retired now that it is idle
+            healthy = not watchdog.is_killed(driver) and not watchdog.needs_recycle(driver)
+        finally:
+            if driver is not None:
+                if healthy:
+                    self._idle.put(driver)
+                else:
+                    self._discard(driver)
+            with self._lock:
+                self._leased -= 1
+            self._slots.release()
+
+    def _discard(self, driver):
+        with self._lock:
+            self._drivers.discard(driver)
+        quit_driver(driver)
+
+    def close(self):
+        """Quit every driver the pool has started."""
+        with self._lock:
+            drivers = list(self._drivers)
+            self._drivers.clear()
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for driver in drivers:
+            quit_driver(driver)
+
+_pools: Dict[bool, BrowserPool] = {}
+_pools_lock = threading.Lock()
+
+def get_browser_pool(capture_network: bool = False) -> BrowserPool:
+    """
+    Return the process-wide browser pool for the given capture mode.
+
+    The pool size comes from HOTELFINDER_BROWSER_POOL_SIZE (default 3).
+    """
+    with _pools_lock:
+        pool = _pools.get(capture_network)
+        if pool is None:
+            pool = BrowserPool(BROWSER_POOL_SIZE, capture_network=capture_network)
+            _pools[capture_network] = pool
+            atexit.register(pool.close)
+        return pool
@@ -0,0 +1,469 @@
+import os
+import signal
+import logging
+import threading
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic, sleep
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    import psutil
+except ImportError:  # Linux reads /proc instead; elsewhere the watchdog is disabled
+    psutil = None
+
+# Set HOTELFINDER_CHROME_WATCHDOG=0 to stop supervising local Chrome processes
+CHROME_WATCHDOG_ENABLED = os.environ.get("HOTELFINDER_CHROME_WATCHDOG", "1").lower() not in ("0", "false", "no")
+# A browser's process tree (chromedriver, Chrome and its renderers) is killed above this
+# RSS; one that has used more CPU time in total is retired when it is next returned
+# to the pool, so a long-lived browser is never killed mid-fetch for its past work
+CHROME_MAX_RSS_MB = float(os.environ.get("HOTELFINDER_CHROME_MAX_RSS_MB", "1500"))
+CHROME_MAX_CPU_SECONDS = float(os.environ.get("HOTELFINDER_CHROME_MAX_CPU_SECONDS", "900"))
+# Longest a single borrower (one page fetch or search) may hold a browser
+CHROME_MAX_LEASE_SECONDS = float(os.environ.get("HOTELFINDER_CHROME_MAX_LEASE_SECONDS", "300"))
+WATCHDOG_INTERVAL = 5.0
+ORPHAN_SCAN_INTERVAL = 60.0
+# Chrome ignores unknown switches; this one tags every browser with the process that started it
+OWNER_SWITCH = "--hotelfinder-owner="
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+class _Process:
+    __slots__ = ("pid", "ppid", "rss", "cpu_seconds", "started", "name")
+
+    def __init__(self, pid: int, ppid: int, rss: int, cpu_seconds: float, started: float, name: str = ""):
+        self.pid = pid
+        self.ppid = ppid
+        self.rss = rss
+        self.cpu_seconds = cpu_seconds
+        # Start time distinguishes a process from a later one reusing its pid
+        self.started = started
+        self.name = name
+
+    def is_chrome(self) -> bool:
+        # chrome, chromedriver, chromium, "Google Chrome Helper", ...
+        return "chrom" in self.name.lower()
+
+def _read_proc(pid: int) -> Optional[_Process]:
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as stat_file:
+            stat = stat_file.read().decode("utf-8", "replace")
+    except OSError:
+        return None
+    # The command name may contain spaces and parentheses; fields follow the last ")"
+    name = stat[stat.find("(") + 1:stat.rfind(")")]
+    fields = stat[stat.rfind(")") + 2:].split()
+    return _Process(pid, int(fields[1]), int(fields[21]) * _PAGE_SIZE, (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS, float(fields[19]), name)
+
+def snapshot_processes() -> Dict[int, _Process]:
+    """All processes visible to this one, with parent, RSS and CPU time."""
+    processes = {}
+    if psutil is not None:
+        for process in psutil.process_iter(["ppid", "memory_info", "cpu_times", "create_time", "name"]):
+            info = process.info
+            if info.get("memory_info") is None or info.get("cpu_times") is None:
+                continue
+            processes[process.pid] = _Process(process.pid, info["ppid"] or 0, info["memory_info"].rss, info["cpu_times"].user + info["cpu_times"].system, info["create_time"] or 0.0, info.get("name") or "")
+        return processes
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            process = _read_proc(int(entry))
+            if process is not None:
+                processes[process.pid] = process
+    return processes
+
+def _cmdline(pid: int) -> List[str]:
+    try:
+        if psutil is not None:
+            return psutil.Process(pid).cmdline()
+        with open(f"/proc/{pid}/cmdline", "rb") as cmdline_file:
+            return [part.decode("utf-8", "replace") for part in cmdline_file.read().split(b"\0") if part]
+    except Exception:
+        return []
+
+def _descendants(root_pid: int, processes: Dict[int, _Process]) -> List[_Process]:
+    children: Dict[int, List[int]] = {}
+    for process in processes.values():
+        children.setdefault(process.ppid, []).append(process.pid)
+    tree, pending = [], [root_pid]
+    while pending:
+        pid = pending.pop()
+        if pid in processes:
+            tree.append(processes[pid])
+            pending.extend(children.get(pid, ()))
+    return tree
+
+def _kill(pids: List[Tuple[int, float]]):
+    """Kill processes, children first, skipping any pid that now belongs to another process."""
+    processes = snapshot_processes()
+    for pid, started in reversed(pids):
+        process = processes.get(pid)
+        if process is None or process.started != started:
+            continue
+        try:
+            os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+        except OSError:
+            pass
+
+class BrowserUsage:
+    """Browser resources used by one search (all its page fetches and attempts)."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.leases = 0
+        self.browser_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss = 0
+        self.killed: List[str] = []
+        self._lock = threading.Lock()
+
+    def add(self, wall: float, cpu_seconds: float, peak_rss: int, killed: Optional[str] = None):
+        with self._lock:
+            self.leases += 1
+            self.browser_seconds += wall
+            self.cpu_seconds += cpu_seconds
+            self.peak_rss = max(self.peak_rss, peak_rss)
+            if killed:
+                self.killed.append(killed)
+
+    def merge(self, report: Dict[str, Any]):
+        """Add the usage of a to_dict() report, e.g. one sent back by a scrape worker."""
+        with self._lock:
+            self.leases += report.get("leases", 0)
+            self.browser_seconds += report.get("browser_seconds", 0.0)
+            self.cpu_seconds += report.get("cpu_seconds", 0.0)
+            self.peak_rss = max(self.peak_rss, int(report.get("peak_rss_mb", 0) * 2**20))
+            self.killed.extend(report.get("killed", ()))
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "label": self.label,
+                "leases": self.leases,
+                "browser_seconds": round(self.browser_seconds, 2),
+                "cpu_seconds": round(self.cpu_seconds, 2),
+                "peak_rss_mb": round(self.peak_rss / 2**20, 1),
+                "killed": list(self.killed),
+            }
+
+# Usage accumulator of the search running in this context (copied into provider threads)
+_current_usage: ContextVar[Optional[BrowserUsage]] = ContextVar("browser_usage", default=None)
+
+class _Browser:
+    __slots__ = ("label", "popen", "root_pid", "created", "pids", "cpu_by_pid", "rss", "peak_rss", "lease_started", "lease_cpu", "lease_peak_rss", "killed")
+
+    def __init__(self, label: str, popen, root_pid: int):
+        self.label = label
+        self.popen = popen
+        self.root_pid = root_pid
+        self.created = monotonic()
+        # pid -> start time of every process seen in the tree
+        self.pids: Dict[int, float] = {}
+        self.cpu_by_pid: Dict[int, float] = {}
+        self.rss = 0
+        self.peak_rss = 0
+        self.lease_started: Optional[float] = None
+        self.lease_cpu = 0.0
+        self.lease_peak_rss = 0
+        self.killed: Optional[str] = None
+
+    def cpu_seconds(self) -> float:
+        # Includes renderers that have already exited
+        return sum(self.cpu_by_pid.values())
+
+    def update(self, processes: Dict[int, _Process]):
+        tree = _descendants(self.root_pid, processes)
+        for process in tree:
+            self.pids.setdefault(process.pid, process.started)
+            self.cpu_by_pid[process.pid] = max(self.cpu_by_pid.get(process.pid, 0.0), process.cpu_seconds)
+        self.rss = sum(process.rss for process in tree)
+        self.peak_rss = max(self.peak_rss, self.rss)
+        self.lease_peak_rss = max(self.lease_peak_rss, self.rss)
+
+class ChromeWatchdog:
+    """
+    Supervises the process trees of local Chrome drivers.
+
+    Every driver from create_chrome_driver is registered with its chromedriver
+    process. A background thread samples each tree (chromedriver, Chrome, renderers)
+    and kills it when it exceeds the RSS cap, or when one borrower has held it past
+    the lease limit. The CPU-time cap counts the browser's whole life, so it is not
+    enforced mid-use: the pool retires a browser over it (needs_recycle) when the
+    browser is returned. Whatever survives driver.quit() is killed too, as is a tree
+    whose driver object is dropped without quitting. Chrome processes tagged with a
+    dead owner process (left by a crashed app or worker) are reaped periodically.
+    Killed drivers fail their next command, so the pool replaces them.
+    """
+
+    def __init__(self, max_rss_mb: float = CHROME_MAX_RSS_MB, max_cpu_seconds: float = CHROME_MAX_CPU_SECONDS, max_lease_seconds: float = CHROME_MAX_LEASE_SECONDS, interval: float = WATCHDOG_INTERVAL):
+        self.max_rss = max_rss_mb * 2**20
+        self.max_cpu_seconds = max_cpu_seconds
+        self.max_lease_seconds = max_lease_seconds
+        self.interval = interval
+        self.enabled = CHROME_WATCHDOG_ENABLED and (psutil is not None or os.path.isdir("/proc"))
+        self._browsers: Dict[int, _Browser] = {}
+        self._lock = threading.Lock()
+        self._kills: Dict[str, int] = {}
+        self._recycled = 0
+        self._orphans_reaped = 0
+        self._reports = deque(maxlen=100)
+        self._last_orphan_scan = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="chrome-watchdog", daemon=True)
+            self._thread.start()
+
+    def register(self, driver, label: str = "chrome"):
+        """Start supervising a driver's process tree (remote drivers are ignored)."""
+        popen = getattr(getattr(driver, "service", None), "process", None)
+        if not self.enabled or popen is None:
+            return
+        browser = _Browser(label, popen, popen.pid)
+        key = id(driver)
+        with self._lock:
+            self._browsers[key] = browser
+            self._ensure_thread()
+        # A driver garbage-collected without quit() still gets its processes killed
+        weakref.finalize(driver, self._release, key)
+
+    def unregister(self, driver):
+        """Stop supervising a driver after quit(), killing whatever it left running."""
+        self._release(id(driver))
+
+    def _release(self, key: int):
+        with self._lock:
+            browser = self._browsers.pop(key, None)
+        if browser is None:
+            return
+        browser.update(snapshot_processes())
+        self._kill_tree(browser)
+
+    def _kill_tree(self, browser: _Browser):
+        _kill(list(browser.pids.items()))
+        try:
+            # Collect the chromedriver exit status so it does not linger as a zombie
+            browser.popen.wait(timeout=5)
+        except Exception:
+            pass
+
+    def is_killed(self, driver) -> bool:
+        """Whether the watchdog killed this driver's browser."""
+        with self._lock:
+            browser = self._browsers.get(id(driver))
+            return browser is not None and browser.killed is not None
+
+    def needs_recycle(self, driver) -> bool:
+        """
+        Whether a driver has used more than the CPU-time cap over its life and should
+        be quit rather than reused (checked by the pool when the driver is returned).
+        """
+        with self._lock:
+            browser = self._browsers.get(id(driver))
+            if browser is None or browser.killed is not None:
+                return False
+            cpu_seconds = browser.cpu_seconds()
+            if cpu_seconds <= self.max_cpu_seconds:
+                return False
+            self._recycled += 1
+        logging.info(f"Retiring {browser.label} browser (pid {browser.root_pid}): cpu {cpu_seconds:.0f}s > {self.max_cpu_seconds:.0f}s")
+        return True
+
+    @contextmanager
+    def lease(self, driver):
+        """
+        Time-box one use of a driver and charge its resources to the current search.
+
+        Yields:
+            None; the driver is killed if the block runs past the lease limit
+        """
+        with self._lock:
+            browser = self._browsers.get(id(driver))
+        if browser is None:
+            yield
+            return
+        # The lease fields are read by check() on the watchdog thread
+        processes = snapshot_processes()
+        with self._lock:
+            browser.update(processes)
+            browser.lease_started = monotonic()
+            browser.lease_cpu = browser.cpu_seconds()
+            browser.lease_peak_rss = browser.rss
+        try:
+            yield
+        finally:
+            processes = snapshot_processes() if browser.killed is None else None
+            with self._lock:
+                if processes is not None and browser.killed is None:
+                    browser.update(processes)
+                wall = monotonic() - browser.lease_started
+                browser.lease_started = None
+                cpu_seconds = browser.cpu_seconds() - browser.lease_cpu
+                peak_rss, killed = browser.lease_peak_rss, browser.killed
+            usage = _current_usage.get()
+            if usage is not None:
+                usage.add(wall, cpu_seconds, peak_rss, killed)
+
+    def _enforce(self, browser: _Browser) -> Optional[str]:
+        if browser.rss > self.max_rss:
+            return f"rss {browser.rss / 2**20:.0f}MB > {self.max_rss / 2**20:.0f}MB"
+        if browser.lease_started is not None and monotonic() - browser.lease_started > self.max_lease_seconds:
+            return f"lease {monotonic() - browser.lease_started:.0f}s > {self.max_lease_seconds:.0f}s"
+        return None
+
+    def check(self):
+        """Sample every supervised tree once and kill those over a cap."""
+        processes = snapshot_processes()
+        with self._lock:
+            browsers = [browser for browser in self._browsers.values() if browser.killed is None]
+        for browser in browsers:
+            with self._lock:
+                browser.update(processes)
+                reason = self._enforce(browser)
+                if reason is None:
+                    continue
+                browser.killed = reason
+                kind = reason.split()[0]
+                self._kills[kind] = self._kills.get(kind, 0) + 1
+            logging.warning(f"Killing {browser.label} browser (pid {browser.root_pid}): {reason}")
+            self._kill_tree(browser)
+
+        if monotonic() - self._last_orphan_scan >= ORPHAN_SCAN_INTERVAL:
+            self._last_orphan_scan = monotonic()
+            self.reap_orphans(processes)
+
+    def reap_orphans(self, processes: Optional[Dict[int, _Process]] = None) -> int:
+        """
+        Kill tagged Chrome processes whose owner process has exited, with their
+        chromedriver parent. Only browsers started by this codebase carry the tag.
+
+        Returns:
+            int: Number of processes killed
+        """
+        processes = processes if processes is not None else snapshot_processes()
+        orphans: List[Tuple[int, float]] = []
+        # Only Chrome's own processes carry the tag: other command lines are never read
+        for process in processes.values():
+            if not process.is_chrome():
+                continue
+            cmdline = _cmdline(process.pid)
+            owner = next((part[len(OWNER_SWITCH):] for part in cmdline if part.startswith(OWNER_SWITCH)), None)
+            if owner is None or not owner.isdigit() or int(owner) in processes:
+                continue
+            # Only the top of an orphaned tree is collected; its children are found below it
+            parent = processes.get(process.ppid)
+            if parent is not None and parent.is_chrome() and f"{OWNER_SWITCH}{owner}" in _cmdline(parent.pid):
+                continue
+            tree = _descendants(process.pid, processes)
+            orphans.extend((member.pid, member.started) for member in tree)
+            if parent is not None and "chromedriver" in parent.name.lower():
+                orphans.insert(0, (parent.pid, parent.started))
+        if orphans:
+            logging.warning(f"Reaping {len(orphans)} orphaned Chrome processes")
+            _kill(orphans)
+            with self._lock:
+                self._orphans_reaped += len(orphans)
+        return len(orphans)
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                logging.warning(f"Chrome watchdog check failed: {str(e)}")
+            sleep(self.interval)
+
+    def kill_all(self):
+        """Kill every supervised browser (at interpreter exit)."""
+        with self._lock:
+            browsers = list(self._browsers.values())
+            self._browsers.clear()
+        if browsers:
+            processes = snapshot_processes()
+            for browser in browsers:
+                browser.update(processes)
+                self._kill_tree(browser)
+
+    def record_report(self, usage: BrowserUsage):
+        with self._lock:
+            self._reports.append(usage.to_dict())
+
+    def stats(self) -> Dict[str, Any]:
+        """Supervised browsers, kills by cause, browsers retired for CPU time, orphans reaped and recent per-search usage."""
+        with self._lock:
+            browsers = list(self._browsers.values())
+            return {
+                "enabled": self.enabled,
+                "browsers": [
+                    {"label": browser.label, "pid": browser.root_pid, "rss_mb": round(browser.rss / 2**20, 1), "cpu_seconds": round(browser.cpu_seconds(), 1), "age_seconds": round(monotonic() - browser.created), "killed": browser.killed}
+                    for browser in browsers
+                ],
+                "kills": dict(self._kills),
+                "recycled": self._recycled,
+                "orphans_reaped": self._orphans_reaped,
+                "recent_searches": list(self._reports),
+            }
+
+_watchdog: Optional[ChromeWatchdog] = None
+_watchdog_lock = threading.Lock()
+
+def get_chrome_watchdog() -> ChromeWatchdog:
+    """Return the process-wide Chrome watchdog (reaps orphans of earlier runs on first use)."""
+    global _watchdog
+    with _watchdog_lock:
+        if _watchdog is None:
+            _watchdog = ChromeWatchdog()
+            if _watchdog.enabled:
+                import atexit
+
+                atexit.register(_watchdog.kill_all)
+                try:
+                    _watchdog.reap_orphans()
+                except Exception as e:
+                    logging.warning(f"Could not reap orphaned Chrome processes: {str(e)}")
+        return _watchdog
+
+@contextmanager
+def collect_browser_usage(label: str):
+    """
+    Collect the browser resources used inside the block (including provider threads
+    started with submit_with_context) without reporting them.
+
+    Yields:
+        BrowserUsage: The accumulator
+    """
+    usage = BrowserUsage(label)
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+def add_browser_usage(report: Dict[str, Any]):
+    """Charge usage measured elsewhere (a scrape worker's job) to the current search."""
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.merge(report)
+
+@contextmanager
+def track_browser_usage(label: str):
+    """
+    Collect the browser resources used inside the block (including provider threads
+    started with submit_with_context and scrape jobs run on workers) and log them as
+    one search's usage.
+
+    Yields:
+        BrowserUsage: The accumulator
+    """
+    with collect_browser_usage(label) as usage:
+        try:
+            yield usage
+        finally:
+            if usage.leases:
+                report = usage.to_dict()
+                logging.info(f"Browser usage for {label}: {report['leases']} browser uses, {report['browser_seconds']}s, {report['cpu_seconds']} CPU s, peak {report['peak_rss_mb']}MB" + (f", killed: {', '.join(report['killed'])}" if report["killed"] else ""))
+                get_chrome_watchdog().record_report(usage)
@@ -0,0 +1,89 @@
+import os
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Accepted api_keys names for each credential; the UI and agents have used both spellings
+_KEY_ALIASES = {
+    "browserbase_api_key": ("BROWSERBASE_API_KEY", "BROWSERBASE_KEY"),
+    "browserbase_project_id": ("BROWSERBASE_PROJECT_ID",),
+    "groq_api_key": ("GROQ_API_KEY",),
+}
+
+class SearchCredentials:
+    """
+    API credentials for a single search request.
+
+    Carried in a context variable instead of os.environ, so concurrent searches
+    for different users in one process never see each other's keys.
+    """
+
+    __slots__ = ("browserbase_api_key", "browserbase_project_id", "groq_api_key")
+
+    def __init__(self, browserbase_api_key: Optional[str] = None, browserbase_project_id: Optional[str] = None, groq_api_key: Optional[str] = None):
+        self.browserbase_api_key = browserbase_api_key
+        self.browserbase_project_id = browserbase_project_id
+        self.groq_api_key = groq_api_key
+
+    @classmethod
+    def from_env(cls) -> "SearchCredentials":
+        """Build credentials from the process environment (.env defaults)."""
+        return cls.from_api_keys(None)
+
+    @classmethod
+    def from_api_keys(cls, api_keys: Optional[Dict[str, str]]) -> "SearchCredentials":
+        """
+        Build credentials from an api_keys dictionary.
+
+        Args:
+            api_keys (dict, optional): Keys such as BROWSERBASE_API_KEY (or BROWSERBASE_KEY),
+                BROWSERBASE_PROJECT_ID and GROQ_API_KEY; missing or empty values fall
+                back to the environment
+
+        Returns:
+            SearchCredentials: The resolved credentials
+        """
+        api_keys = api_keys or {}
+        values = {}
+        for field, names in _KEY_ALIASES.items():
+            value = next((api_keys[name] for name in names if api_keys.get(name)), None)
+            values[field] = value or os.environ.get(names[0])
+        return cls(**values)
+
+    def __repr__(self):
+        # Never print the secrets themselves
+        present = [field for field in self.__slots__ if getattr(self, field)]
+        return f"SearchCredentials(set={present})"
+
+_current_credentials: contextvars.ContextVar = contextvars.ContextVar("hotelfinder_credentials", default=None)
+
+def get_credentials() -> SearchCredentials:
+    """Return the credentials of the current request, or the environment defaults."""
+    credentials = _current_credentials.get()
+    if credentials is None:
+        return SearchCredentials.from_env()
+    return credentials
+
+@contextmanager
+def use_credentials(credentials: SearchCredentials):
+    """
+    Make credentials current for the duration of a with-block.
+
+    Args:
+        credentials (SearchCredentials): Credentials for this request
+    """
+    token = _current_credentials.set(credentials)
+    try:
+        yield credentials
+    finally:
+        _current_credentials.reset(token)
+
+def submit_with_context(executor, fn, *args, **kwargs):
+    """
+    Submit work to an executor so it runs with the caller's credentials.
+
+    Worker threads do not inherit context variables, so the current context is
+    copied and the function runs inside it.
+    """
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fn, *args, **kwargs)
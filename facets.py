@@ -0,0 +1,195 @@
+import re
+import math
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+
+# Prefix bitsets are kept every BLOCK positions of a sorted range array; a range
+# query combines two of them and at most 2 * BLOCK single bits
+BLOCK = 64
+
+RANGE_FACETS = ("price", "rating", "stars")
+CATEGORY_FACETS = ("source", "area", "stars")
+
+# int.bit_count is Python 3.10+
+_popcount = int.bit_count if hasattr(int, "bit_count") else lambda mask: bin(mask).count("1")
+
+def _float(value: Any) -> Optional[float]:
+    # None for missing values, including the inf price_value of unpriced hotels
+    if isinstance(value, (int, float)):
+        return float(value) if math.isfinite(value) else None
+    match = re.search(r"\d+(?:\.\d+)?", str(value or ""))
+    return float(match.group(0)) if match else None
+
+def _area(hotel: Dict[str, Any]) -> Optional[str]:
+    area = re.sub(r"\s+", " ", str(hotel.get("location") or "")).strip()
+    return area or None
+
+class _RangeColumn:
+    """One numeric field: positions sorted by value plus block prefix bitsets."""
+
+    __slots__ = ("values", "positions", "prefix", "blocks")
+
+    def __init__(self, pairs: List[Tuple[float, int]]):
+        pairs.sort()
+        self.values = [value for value, _ in pairs]
+        self.positions = [position for _, position in pairs]
+        # prefix[b] = bits of the first b * BLOCK positions in sorted order,
+        # blocks[b] = bits of the positions in block b alone
+        self.prefix = [0]
+        self.blocks = []
+        mask = block = 0
+        for index, position in enumerate(self.positions, 1):
+            mask |= 1 << position
+            block |= 1 << position
+            if index % BLOCK == 0 or index == len(self.positions):
+                self.blocks.append(block)
+                block = 0
+                if index % BLOCK == 0:
+                    self.prefix.append(mask)
+
+    def _first(self, count: int) -> int:
+        # Bits of the first `count` positions in sorted order
+        block = count // BLOCK
+        mask = self.prefix[block]
+        for position in self.positions[block * BLOCK:count]:
+            mask |= 1 << position
+        return mask
+
+    def between(self, low: Optional[float], high: Optional[float]) -> int:
+        start = bisect_left(self.values, low) if low is not None else 0
+        end = bisect_right(self.values, high) if high is not None else len(self.values)
+        if start >= end:
+            return 0
+        if end - start <= BLOCK:
+            mask = 0
+            for position in self.positions[start:end]:
+                mask |= 1 << position
+            return mask
+        return self._first(end) & ~self._first(start)
+
+    def _edge(self, mask: int, blocks: Iterable[int], reverse: bool) -> Optional[float]:
+        # Find the first block holding a hotel of mask, then the hotel within it
+        for block in blocks:
+            if self.blocks[block] & mask:
+                span = range(block * BLOCK, min((block + 1) * BLOCK, len(self.positions)))
+                for index in (reversed(span) if reverse else span):
+                    if mask & (1 << self.positions[index]):
+                        return self.values[index]
+        return None
+
+    def bounds(self, mask: int) -> Optional[Tuple[float, float]]:
+        """Smallest and largest value among the hotels in mask."""
+        low = self._edge(mask, range(len(self.blocks)), False)
+        if low is None:
+            return None
+        return low, self._edge(mask, reversed(range(len(self.blocks))), True)
+
+class FacetIndex:
+    """
+    Filter and facet index over one merged result set.
+
+    Built once per result set: each numeric field (price, rating, stars) becomes a
+    sorted array with prefix bitsets, each categorical field (source, area, stars) a
+    bitset per value. A filter combination is then a few bisects and integer ANDs,
+    and facet counts are popcounts, so neither rescans the hotel list. Hotels keep
+    their order (the search's ranking) in every result.
+    """
+
+    def __init__(self, hotels: List[Dict[str, Any]]):
+        self.hotels = hotels
+        self.all = (1 << len(hotels)) - 1
+        fields = {
+            "price": lambda hotel: _float(hotel.get("price_value")),
+            "rating": lambda hotel: _float(hotel.get("rating_normalized")),
+            "stars": lambda hotel: _float(hotel.get("stars")),
+        }
+        self.ranges = {name: _RangeColumn([(value, position) for position, value in enumerate(map(field, hotels)) if value is not None]) for name, field in fields.items()}
+
+        self.categories: Dict[str, Dict[Any, int]] = {name: {} for name in CATEGORY_FACETS}
+        for position, hotel in enumerate(hotels):
+            stars = _float(hotel.get("stars"))
+            for name, value in (("source", hotel.get("source")), ("area", _area(hotel)), ("stars", int(stars) if stars is not None else None)):
+                if value is not None:
+                    facet = self.categories[name]
+                    facet[value] = facet.get(value, 0) | 1 << position
+
+    def _category_mask(self, name: str, values: Iterable[Any]) -> int:
+        facet = self.categories[name]
+        mask = 0
+        for value in values:
+            mask |= facet.get(value, 0)
+        return mask
+
+    def _masks(self, min_price: Optional[float], max_price: Optional[float], min_rating: Optional[float], min_stars: Optional[float], stars: Optional[Iterable[int]], areas: Optional[Iterable[str]], sources: Optional[Iterable[str]]) -> Dict[str, int]:
+        # One mask per active filter, so facet counts can leave out their own filter
+        masks = {}
+        if min_price is not None or max_price is not None:
+            masks["price"] = self.ranges["price"].between(min_price, max_price)
+        if min_rating is not None:
+            masks["rating"] = self.ranges["rating"].between(min_rating, None)
+        if min_stars is not None:
+            masks["min_stars"] = self.ranges["stars"].between(min_stars, None)
+        if stars:
+            masks["stars"] = self._category_mask("stars", stars)
+        if areas:
+            masks["area"] = self._category_mask("area", areas)
+        if sources:
+            masks["source"] = self._category_mask("source", sources)
+        return masks
+
+    def filter(self, min_price: Optional[float] = None, max_price: Optional[float] = None, min_rating: Optional[float] = None, min_stars: Optional[float] = None, stars: Optional[Iterable[int]] = None, areas: Optional[Iterable[str]] = None, sources: Optional[Iterable[str]] = None) -> int:
+        """
+        Bitset of the hotels matching every given filter.
+
+        Args:
+            min_price, max_price (float, optional): Inclusive price_value range
+            min_rating (float, optional): Lowest rating on the 5-point scale
+            min_stars (float, optional): Lowest star class
+            stars, areas, sources (iterable, optional): Accepted values of each facet
+
+        Returns:
+            int: Bit i is set if hotels[i] matches; pass it to select() or facet_counts()
+        """
+        mask = self.all
+        for filter_mask in self._masks(min_price, max_price, min_rating, min_stars, stars, areas, sources).values():
+            mask &= filter_mask
+        return mask
+
+    def count(self, mask: int) -> int:
+        return _popcount(mask)
+
+    def select(self, mask: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Hotels in mask, in result-set order, at most limit of them."""
+        return list(self.iter_select(mask, limit))
+
+    def iter_select(self, mask: int, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        found = 0
+        while mask and (limit is None or found < limit):
+            lowest = mask & -mask
+            yield self.hotels[lowest.bit_length() - 1]
+            mask ^= lowest
+            found += 1
+
+    def facet_counts(self, **filters) -> Dict[str, Any]:
+        """
+        Counts per facet value for the given filters (same arguments as filter()).
+
+        Each categorical facet is counted with every filter except its own, so the
+        counts show what choosing another value would return. Price and rating
+        bounds are those of the fully filtered hotels.
+        """
+        masks = self._masks(filters.get("min_price"), filters.get("max_price"), filters.get("min_rating"), filters.get("min_stars"), filters.get("stars"), filters.get("areas"), filters.get("sources"))
+        matched = self.all
+        for filter_mask in masks.values():
+            matched &= filter_mask
+
+        counts: Dict[str, Any] = {"total": _popcount(matched)}
+        for name in CATEGORY_FACETS:
+            others = self.all
+            for filter_name, filter_mask in masks.items():
+                if filter_name != name:
+                    others &= filter_mask
+            counts[name] = {value: _popcount(facet_mask & others) for value, facet_mask in self.categories[name].items() if facet_mask & others}
+        for name in ("price", "rating"):
+            counts[f"{name}_range"] = self.ranges[name].bounds(matched)
+        return counts
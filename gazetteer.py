@@ -0,0 +1,200 @@
+import os
+import re
+import csv
+import difflib
+import threading
+import unicodedata
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+from urllib.parse import quote_plus
+
+# Bundled offline gazetteer: name,region,country,population,aliases,kayak_id,booking_dest_id
+GAZETTEER_PATH = os.environ.get(
+    "HOTELFINDER_GAZETTEER",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources", "gazetteer.csv")
+)
+# Minimum difflib similarity for a misspelt location to be suggested by autocomplete
+FUZZY_CUTOFF = 0.8
+
+# Provider location IDs appended to a query, e.g. "Hisar,Haryana,India-p15321"
+_PROVIDER_ID_SUFFIX = re.compile(r"-[a-z]\d+$", re.IGNORECASE)
+
+def normalize_text(text: str) -> str:
+    """Fold case, accents, punctuation and spacing so "São  Paulo," and "sao paulo" compare equal."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"[^\w]+", " ", text.casefold())
+    return " ".join(text.split())
+
+class Place:
+    """A gazetteer entry with its canonical provider location identifiers."""
+
+    __slots__ = ("name", "region", "country", "population", "aliases", "kayak_id", "booking_dest_id")
+
+    def __init__(self, name: str, region: str, country: str, population: int = 0, aliases: Tuple[str, ...] = (), kayak_id: str = "", booking_dest_id: str = ""):
+        self.name = name
+        self.region = region
+        self.country = country
+        self.population = population
+        self.aliases = aliases
+        self.kayak_id = kayak_id
+        self.booking_dest_id = booking_dest_id
+
+    def _parts(self) -> List[str]:
+        # Skip an empty region and qualifiers that repeat the name ("Singapore, Singapore")
+        return [self.name] + [part for part in (self.region, self.country) if part and part != self.name]
+
+    @property
+    def display_name(self) -> str:
+        return ", ".join(self._parts())
+
+    @property
+    def key(self) -> str:
+        """Normalized canonical name, shared by every spelling of this place (used in cache keys)."""
+        return normalize_text(self.display_name)
+
+    @property
+    def kayak_location(self) -> str:
+        """Kayak's location path segment, e.g. "Hisar,Haryana,India-p15321"."""
+        location = ",".join(part.replace(" ", "-") for part in self._parts())
+        return f"{location}-{self.kayak_id}" if self.kayak_id else location
+
+    def booking_params(self) -> str:
+        """Booking.com query-string parameters selecting this place."""
+        name = self.name if self.country == self.name else f"{self.name}, {self.country}"
+        params = f"ss={quote_plus(name)}"
+        if self.booking_dest_id:
+            params += f"&dest_id={self.booking_dest_id}&dest_type=city"
+        return params
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "region": self.region,
+            "country": self.country,
+            "display_name": self.display_name,
+            "kayak_location": self.kayak_location,
+        }
+
+    def __repr__(self):
+        return f"Place({self.display_name!r})"
+
+class Gazetteer:
+    """
+    Offline place lookup for autocomplete and location canonicalization.
+
+    Every name, alias and "name region/country" spelling is normalized into one
+    sorted array; a prefix lookup is two bisections over it, so autocomplete never
+    touches the network and stays well under a millisecond.
+    """
+
+    def __init__(self, places: List[Place]):
+        self.places = places
+        entries = set()
+        for index, place in enumerate(places):
+            spellings = (place.name,) + place.aliases
+            for spelling in spellings:
+                entries.add((normalize_text(spelling), index))
+                for qualifier in (place.region, place.country):
+                    if qualifier:
+                        entries.add((normalize_text(f"{spelling} {qualifier}"), index))
+            entries.add((place.key, index))
+        self._entries: List[Tuple[str, int]] = sorted(entries)
+        self._keys = [key for key, _ in self._entries]
+        self._distinct_keys = sorted(set(self._keys))
+
+    @classmethod
+    def load(cls, path: str = GAZETTEER_PATH) -> "Gazetteer":
+        places = []
+        with open(path, encoding="utf-8", newline="") as gazetteer_file:
+            for row in csv.DictReader(gazetteer_file):
+                places.append(Place(
+                    name=row["name"],
+                    region=row["region"],
+                    country=row["country"],
+                    population=int(row["population"] or 0),
+                    aliases=tuple(alias for alias in row["aliases"].split("|") if alias),
+                    kayak_id=row["kayak_id"],
+                    booking_dest_id=row["booking_dest_id"],
+                ))
+        return cls(places)
+
+    def _prefix_range(self, prefix: str) -> Tuple[int, int]:
+        start = bisect_left(self._keys, prefix)
+        # "\uffff" sorts after every character that can follow the prefix
+        end = bisect_left(self._keys, prefix + "\uffff", start)
+        return start, end
+
+    def _places_with_key(self, key: str) -> List[Place]:
+        start, end = self._prefix_range(key)
+        return [self.places[index] for entry_key, index in self._entries[start:end] if entry_key == key]
+
+    def autocomplete(self, text: str, limit: int = 8) -> List[Place]:
+        """
+        Places whose name, alias or qualified name starts with text, most populous first.
+
+        When nothing starts with text, close misspellings are suggested instead; the
+        user picks one, so a wrong guess costs nothing.
+        """
+        prefix = normalize_text(text)
+        if not prefix:
+            return []
+        start, end = self._prefix_range(prefix)
+        indexes = {index for _, index in self._entries[start:end]}
+        matches = sorted((self.places[index] for index in indexes), key=lambda place: -place.population)
+        if not matches:
+            for key in difflib.get_close_matches(prefix, self._distinct_keys, n=limit, cutoff=FUZZY_CUTOFF):
+                matches.extend(place for place in self._places_with_key(key) if place not in matches)
+        return matches[:limit]
+
+    def resolve(self, text: str) -> Optional[Place]:
+        """
+        Resolve free text to a single place.
+
+        Only an exact (normalized) name, alias or region/country-qualified name
+        matches. Misspellings are not guessed at: a city missing from the gazetteer
+        ("Bern") would otherwise resolve to a similar one ("Berlin") and be searched
+        and cached as that. Returns None without a match, so the caller can fall
+        back to the text as typed.
+        """
+        query = normalize_text(_PROVIDER_ID_SUFFIX.sub("", (text or "").strip()))
+        if not query:
+            return None
+        exact = self._places_with_key(query)
+        return max(exact, key=lambda place: place.population) if exact else None
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_lock = threading.Lock()
+
+def get_gazetteer() -> Gazetteer:
+    """Return the process-wide gazetteer, loading the bundled data on first use."""
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = Gazetteer.load()
+        return _gazetteer
+
+def canonical_location_key(location: str) -> str:
+    """Normalized key of a location: the resolved place's canonical name, or the normalized text."""
+    place = get_gazetteer().resolve(location)
+    return place.key if place else normalize_text(location)
+
+def kayak_location(location: str) -> str:
+    """
+    Kayak location path segment for free text.
+
+    Text that already carries a Kayak ID is kept; a place is only rewritten to its
+    canonical path when the gazetteer has its Kayak ID, since Kayak matches the
+    text as typed at least as well as a canonical name without one.
+    """
+    if _PROVIDER_ID_SUFFIX.search(location or ""):
+        return location.replace(" ", "-")
+    place = get_gazetteer().resolve(location)
+    if place and place.kayak_id:
+        return place.kayak_location
+    return re.sub(r"\s*,\s*", ",", location.strip()).replace(" ", "-").lower()
+
+def booking_location_params(location: str) -> str:
+    """Booking.com query-string parameters for free text."""
+    place = get_gazetteer().resolve(location)
+    return place.booking_params() if place else f"ss={location.lower().replace(' ', '-')}"
@@ -1,24 +1,96 @@
 import requests
 import json
-from typing import List, Dict, Any, Optional
+import logging
+from typing import List, Dict, Any, Optional, Iterator, Callable
+from credentials import get_credentials
+from prompt_builder import build_recommendation_prompt, estimate_tokens, get_token_usage
 
-def generate_review_summary(hotel_data: Dict[str, Any], api_key: str) -> str:
+GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_MODEL = "llama3-70b-8192"
+
+def stream_chat_completion(prompt: str, max_tokens: int, api_key: Optional[str] = None, temperature: float = 0.7, on_usage: Optional[Callable[[Dict[str, Any]], None]] = None) -> Iterator[str]:
     """
-    Generate a summary of hotel reviews using GROQ API.
-    
+    Stream a GROQ chat completion as it is generated.
+
+    Requests the completion with stream=True and parses the server-sent events
+    ("data: {...}" lines, ended by "data: [DONE]"), yielding each content delta.
+
     Args:
-        hotel_data: Dictionary containing hotel information
-        api_key: GROQ API key
-        
-    Returns:
-        A summary of hotel reviews
+        prompt: User message
+        max_tokens: Completion length limit
+        api_key: GROQ API key (defaults to the current request's credentials)
+        temperature: Sampling temperature
+        on_usage: Called once with GROQ's token usage report when the stream ends
+
+    Yields:
+        Text fragments of the completion
+
+    Raises:
+        requests.RequestException: If the request fails or GROQ returns an error status
     """
-    # If no review data, generate a simulated review
+    api_key = api_key or get_credentials().groq_api_key
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream"
+    }
+    payload = {
+        "model": GROQ_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "stream": True
+    }
+
+    usage = None
+    with requests.post(GROQ_CHAT_URL, headers=headers, json=payload, stream=True, timeout=(10, 60)) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            # Blank lines separate events; lines starting with ":" are keep-alive comments
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except json.JSONDecodeError:
+                logging.warning(f"Skipping malformed GROQ stream event: {data[:100]}")
+                continue
+            for choice in chunk.get("choices", []):
+                content = (choice.get("delta") or {}).get("content")
+                if content:
+                    yield content
+            # Usage may come in x_groq on the last content chunk and again in a usage-only
+            # chunk; the last report is the complete one
+            usage = (chunk.get("x_groq") or {}).get("usage") or chunk.get("usage") or usage
+    if usage and on_usage is not None:
+        on_usage(usage)
+
+def _record_usage(kind: str, prompt: str, candidates: int = 0) -> Callable[[Dict[str, Any]], None]:
+    return lambda usage: get_token_usage().record(kind, estimate_tokens(prompt), candidates, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+
+def _stream_with_fallback(prompt: str, max_tokens: int, api_key: Optional[str], fallback: str, on_usage: Optional[Callable[[Dict[str, Any]], None]] = None) -> Iterator[str]:
+    # Yield the fallback text if the stream fails before producing anything
+    produced = False
+    try:
+        for fragment in stream_chat_completion(prompt, max_tokens, api_key, on_usage=on_usage):
+            if not produced:
+                fragment = fragment.lstrip()
+                if not fragment:
+                    continue
+            produced = True
+            yield fragment
+    except Exception as e:
+        logging.error(f"Error streaming from GROQ: {str(e)}")
+    if not produced:
+        yield fallback
+
+def _review_prompt(hotel_data: Dict[str, Any]) -> str:
     hotel_name = hotel_data.get('name', 'this hotel')
     hotel_rating = hotel_data.get('rating_normalized', 4.0)
     
-    # Construct a prompt for GROQ
-    prompt = f"""
+    return f"""
     You are an expert hotel analyst. Based on the following hotel information, create a summary of 
     what guests might say in reviews. Be realistic and consider both positives and negatives.
     
@@ -32,6 +104,23 @@ def generate_review_summary(hotel_data: Dict[str, Any], api_key: str) -> str:
     location, service, cleanliness, and value for money. Be realistic based on the rating - higher rated 
     hotels should have more positive reviews, lower rated hotels more negative.
     """
+
+def generate_review_summary(hotel_data: Dict[str, Any], api_key: Optional[str] = None) -> str:
+    """
+    Generate a summary of hotel reviews using GROQ API.
+    
+    Args:
+        hotel_data: Dictionary containing hotel information
+        api_key: GROQ API key (defaults to the current request's credentials)
+        
+    Returns:
+        A summary of hotel reviews
+    """
+    api_key = api_key or get_credentials().groq_api_key
+
+    # If no review data, generate a simulated review
+    hotel_name = hotel_data.get('name', 'this hotel')
+    prompt = _review_prompt(hotel_data)
     
     # Make the API call to GROQ
     try:
@@ -41,20 +130,21 @@ def generate_review_summary(hotel_data: Dict[str, Any], api_key: str) -> str:
         }
         
         payload = {
-            "model": "llama3-70b-8192",
+            "model": GROQ_MODEL,
             "messages": [{"role": "user", "content": prompt}],
             "temperature": 0.7,
             "max_tokens": 200
         }
         
         response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
+            GROQ_CHAT_URL,
             headers=headers,
             json=payload
         )
         
         if response.status_code == 200:
             result = response.json()
+            _record_usage("review_summary", prompt)(result.get('usage') or {})
             summary = result['choices'][0]['message']['content'].strip()
             return summary
         else:
@@ -65,60 +155,25 @@ def generate_review_summary(hotel_data: Dict[str, Any], api_key: str) -> str:
         print(f"Error generating review summary with GROQ: {str(e)}")
         return f"Review data not available for {hotel_name}. Please check back later."
 
-def generate_personalized_recommendation(hotels: List[Dict[str, Any]], preferences: Dict[str, Any], api_key: str) -> str:
+def generate_personalized_recommendation(hotels: List[Dict[str, Any]], preferences: Dict[str, Any], api_key: Optional[str] = None) -> str:
     """
     Generate personalized hotel recommendations using GROQ API.
     
     Args:
         hotels: List of hotel dictionaries
         preferences: User preferences dictionary
-        api_key: GROQ API key
+        api_key: GROQ API key (defaults to the current request's credentials)
         
     Returns:
         Personalized recommendation text
     """
+    api_key = api_key or get_credentials().groq_api_key
+
     if not hotels or len(hotels) == 0:
         return "No hotels available to make recommendations."
     
-    # Extract top 5 hotels to include in prompt
-    top_hotels = hotels[:5]
-    
-    # Create a structured representation of hotels for the prompt
-    hotel_descriptions = []
-    for i, hotel in enumerate(top_hotels):
-        description = f"Hotel {i+1}: {hotel.get('name', 'Unknown')}\n"
-        description += f"Rating: {hotel.get('rating_normalized', 0)}/5\n"
-        description += f"Price: {hotel.get('price', 'Unknown')}\n"
-        description += f"Source: {hotel.get('source', 'Unknown')}\n"
-        
-        if hotel.get('location'):
-            description += f"Location: {hotel.get('location')}\n"
-            
-        hotel_descriptions.append(description)
-    
-    hotels_text = "\n".join(hotel_descriptions)
-    
-    # Extract preferences
-    budget = preferences.get('budget', 'moderate')
-    priorities = preferences.get('priorities', ['Value for money', 'Location', 'Amenities'])
-    priorities_text = ", ".join(priorities)
-    
-    # Construct prompt for GROQ
-    prompt = f"""
-    You are an expert hotel concierge. Based on the following hotels and user preferences,
-    provide personalized hotel recommendations.
-    
-    AVAILABLE HOTELS:
-    {hotels_text}
-    
-    USER PREFERENCES:
-    - Budget: {budget}
-    - Priorities: {priorities_text}
-    
-    Please recommend the best hotel for this user with a brief explanation (2-3 sentences) 
-    about why it's a good match for their preferences. Then suggest a second option as an alternative.
-    Keep your response under 150 words total.
-    """
+    # Score every hotel locally and send as many as fit the prompt token budget
+    prompt, candidates = build_recommendation_prompt(hotels, preferences)
     
     # Make the API call to GROQ
     try:
@@ -128,20 +183,21 @@ def generate_personalized_recommendation(hotels: List[Dict[str, Any]], preferenc
         }
         
         payload = {
-            "model": "llama3-70b-8192",
+            "model": GROQ_MODEL,
             "messages": [{"role": "user", "content": prompt}],
             "temperature": 0.7,
             "max_tokens": 300
         }
         
         response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
+            GROQ_CHAT_URL,
             headers=headers,
             json=payload
         )
         
         if response.status_code == 200:
             result = response.json()
+            _record_usage("recommendation", prompt, candidates)(result.get('usage') or {})
             recommendation = result['choices'][0]['message']['content'].strip()
             return recommendation
         else:
@@ -149,4 +205,30 @@ def generate_personalized_recommendation(hotels: List[Dict[str, Any]], preferenc
             
     except Exception as e:
         print(f"Error generating personalized recommendation with GROQ: {str(e)}")
-        return "Unable to generate personalized recommendations at this time." 
\ No newline at end of file
+        return "Unable to generate personalized recommendations at this time."
+
+def stream_review_summary(hotel_data: Dict[str, Any], api_key: Optional[str] = None) -> Iterator[str]:
+    """
+    Streaming version of generate_review_summary.
+
+    Yields the summary as it is generated (e.g. for st.write_stream), or the same
+    fallback text as generate_review_summary if GROQ cannot be reached.
+    """
+    # Resolve the key now: the generator may be consumed outside this request's context
+    api_key = api_key or get_credentials().groq_api_key
+    hotel_name = hotel_data.get('name', 'this hotel')
+    prompt = _review_prompt(hotel_data)
+    return _stream_with_fallback(prompt, 200, api_key, f"Review data not available for {hotel_name}. Please check back later.", _record_usage("review_summary", prompt))
+
+def stream_personalized_recommendation(hotels: List[Dict[str, Any]], preferences: Dict[str, Any], api_key: Optional[str] = None) -> Iterator[str]:
+    """
+    Streaming version of generate_personalized_recommendation.
+
+    Yields the recommendation as it is generated, or the same fallback text as
+    generate_personalized_recommendation.
+    """
+    api_key = api_key or get_credentials().groq_api_key
+    if not hotels:
+        return iter(["No hotels available to make recommendations."])
+    prompt, candidates = build_recommendation_prompt(hotels, preferences)
+    return _stream_with_fallback(prompt, 300, api_key, "Unable to generate personalized recommendations at this time.", _record_usage("recommendation", prompt, candidates))
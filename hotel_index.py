@@ -0,0 +1,253 @@
+import os
+import re
+import json
+import math
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from typing import Dict, List, Any, Optional, Tuple
+from gazetteer import canonical_location_key
+from price_history import hotel_key
+from search_log import DATA_DIR
+
+# Set HOTELFINDER_HOTEL_INDEX=1 to index search results for preference matching. The
+# embedding model (Chroma's default, all-MiniLM-L6-v2 on ONNX) is downloaded once on first use
+HOTEL_INDEX_ENABLED = os.environ.get("HOTELFINDER_HOTEL_INDEX", "").lower() in ("1", "true", "yes")
+HOTEL_INDEX_DIR = os.environ.get("HOTELFINDER_HOTEL_INDEX_DIR", os.path.join(DATA_DIR, "hotel_index"))
+COLLECTION_NAME = "hotels"
+
+# Indexing runs on one background thread so embedding never delays a search
+_index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hotel-index")
+
+_PRICE_PATTERN = re.compile(r"(?:\b(?:under|below|less than|max(?:imum)?|up to)|<)\s*[$€£₹]?\s*(\d+(?:[.,]\d+)?)\s*(?:[$€£₹]|usd|eur|inr|gbp)?", re.IGNORECASE)
+_STARS_PATTERN = re.compile(r"\b(?:at least\s*)?(\d)(?:\s*|-)stars?\b\+?", re.IGNORECASE)
+_RATING_PATTERN = re.compile(r"\b(?:rated|rating)\s*(?:above|over|at least|>=?)?\s*(\d(?:\.\d)?)\s*\+?", re.IGNORECASE)
+
+def parse_preferences(text: str) -> Tuple[str, Dict[str, float]]:
+    """
+    Split a free-text preference into a semantic query and hard filters.
+
+    "quiet, near old town, under $150" -> ("quiet, near old town", {"max_price": 150.0})
+
+    Returns:
+        tuple: (text left for the vector search, filters with max_price, min_stars, min_rating)
+    """
+    filters = {}
+    match = _PRICE_PATTERN.search(text)
+    if match:
+        filters["max_price"] = float(match.group(1).replace(",", ""))
+        text = text.replace(match.group(0), " ")
+    match = _STARS_PATTERN.search(text)
+    if match:
+        filters["min_stars"] = float(match.group(1))
+        text = text.replace(match.group(0), " ")
+    match = _RATING_PATTERN.search(text)
+    if match:
+        rating = float(match.group(1))
+        # Ratings are stored on the 5-point scale
+        filters["min_rating"] = rating / 2 if rating > 5 else rating
+        text = text.replace(match.group(0), " ")
+    semantic = re.sub(r"\s*,(\s*,)+", ",", re.sub(r"\s+", " ", text)).strip(" ,;")
+    return semantic, filters
+
+def _number(value: Any) -> float:
+    # Chroma metadata cannot hold None; -1 marks an unknown value
+    match = re.search(r"\d+(?:\.\d+)?", str(value or ""))
+    return float(match.group(0)) if match else -1.0
+
+def _matches(hotel: Dict[str, Any], filters: Dict[str, float]) -> bool:
+    # parse_preferences() hard filters against a hotel's current values
+    price = hotel.get("price_value")
+    if "max_price" in filters and not (isinstance(price, (int, float)) and math.isfinite(price) and 0 <= price <= filters["max_price"]):
+        return False
+    if "min_stars" in filters and _number(hotel.get("stars")) < filters["min_stars"]:
+        return False
+    if "min_rating" in filters and _number(hotel.get("rating_normalized")) < filters["min_rating"]:
+        return False
+    return True
+
+def describe_hotel(hotel: Dict[str, Any]) -> str:
+    """Text embedded for a hotel: everything known about it except the stay-specific price."""
+    parts = [hotel.get("name", "")]
+    for field in ("description", "location", "address"):
+        if hotel.get(field):
+            parts.append(str(hotel[field]))
+    if hotel.get("stars"):
+        parts.append(f"{hotel['stars']}-star hotel")
+    if hotel.get("rating"):
+        parts.append(f"rated {hotel['rating']}")
+    return ". ".join(part for part in parts if part)
+
+class HotelIndex:
+    """
+    Persistent Chroma collection of hotels seen in searches.
+
+    One document per (hotel, stay) carries the stay's price and rating as metadata,
+    so a preference query is a single vector search restricted by location, dates and
+    price. A hotel's description is embedded only once: later stays reuse the stored
+    embedding. Embeddings are computed on the CPU by Chroma's default model, which
+    Chroma downloads into its cache the first time the index is used.
+    """
+
+    def __init__(self, directory: str = HOTEL_INDEX_DIR):
+        import chromadb
+
+        self._client = chromadb.PersistentClient(path=directory)
+        self._collection = self._client.get_or_create_collection(COLLECTION_NAME, metadata={"hnsw:space": "cosine"})
+        self._lock = threading.Lock()
+
+    def add_hotels(self, location: str, check_in_date: str, check_out_date: str, hotels: List[Dict[str, Any]]):
+        """Index a search's hotels, embedding only hotels not seen before."""
+        location_key = canonical_location_key(location)
+        documents = {}
+        for hotel in hotels:
+            if not hotel.get("name"):
+                continue
+            key = hotel_key(hotel)
+            documents[f"{key}|{check_in_date}|{check_out_date}"] = (key, hotel)
+        if not documents:
+            return
+
+        ids = list(documents)
+        metadatas = []
+        for doc_id in ids:
+            key, hotel = documents[doc_id]
+            metadatas.append({
+                "hotel_key": key,
+                "location": location_key,
+                "check_in_date": check_in_date,
+                "check_out_date": check_out_date,
+                "source": hotel.get("source", ""),
+                "price": _number(hotel.get("price_value")),
+                "rating": _number(hotel.get("rating_normalized")),
+                "stars": _number(hotel.get("stars")),
+                "indexed_at": time(),
+                "hotel": json.dumps(hotel, default=str),
+            })
+
+        with self._lock:
+            existing = self._collection.get(where={"hotel_key": {"$in": sorted({key for key, _ in documents.values()})}}, include=["embeddings", "metadatas"])
+            embeddings = {}
+            if existing.get("embeddings") is not None:
+                for metadata, embedding in zip(existing["metadatas"], existing["embeddings"]):
+                    embeddings.setdefault(metadata["hotel_key"], embedding)
+
+            reuse = [i for i, doc_id in enumerate(ids) if documents[doc_id][0] in embeddings]
+            embed = [i for i, doc_id in enumerate(ids) if documents[doc_id][0] not in embeddings]
+            if reuse:
+                self._collection.upsert(
+                    ids=[ids[i] for i in reuse],
+                    embeddings=[embeddings[documents[ids[i]][0]] for i in reuse],
+                    metadatas=[metadatas[i] for i in reuse],
+                    documents=[describe_hotel(documents[ids[i]][1]) for i in reuse],
+                )
+            if embed:
+                self._collection.upsert(
+                    ids=[ids[i] for i in embed],
+                    metadatas=[metadatas[i] for i in embed],
+                    documents=[describe_hotel(documents[ids[i]][1]) for i in embed],
+                )
+
+    def query(self, preferences: str, location: str, check_in_date: Optional[str] = None, check_out_date: Optional[str] = None, limit: int = 5, hotel_keys: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Hotels of a location best matching a free-text preference.
+
+        Args:
+            preferences (str): e.g. "quiet, near old town, under $150"; prices, star
+                counts and ratings become metadata filters, the rest is matched semantically
+            location (str): Location as searched
+            check_in_date, check_out_date (str, optional): Restrict to this stay
+            limit (int): Number of hotels to return
+            hotel_keys (list, optional): Only consider these hotels (see price_history.hotel_key)
+
+        Returns:
+            list: Hotel dictionaries as indexed, best match first, each with a match_distance
+        """
+        semantic, filters = parse_preferences(preferences)
+        conditions = [{"location": canonical_location_key(location)}]
+        if hotel_keys is not None:
+            conditions.append({"hotel_key": {"$in": list(hotel_keys)}})
+        if check_in_date:
+            conditions.append({"check_in_date": check_in_date})
+        if check_out_date:
+            conditions.append({"check_out_date": check_out_date})
+        if "max_price" in filters:
+            conditions += [{"price": {"$lte": filters["max_price"]}}, {"price": {"$gte": 0}}]
+        if "min_stars" in filters:
+            conditions.append({"stars": {"$gte": filters["min_stars"]}})
+        if "min_rating" in filters:
+            conditions.append({"rating": {"$gte": filters["min_rating"]}})
+        where = conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+        if not semantic:
+            # Only hard filters: return the best rated matches
+            found = self._collection.get(where=where, include=["metadatas"])
+            hotels = [json.loads(metadata["hotel"]) for metadata in found["metadatas"]]
+            return sorted(hotels, key=lambda hotel: -(hotel.get("rating_normalized") or 0))[:limit]
+
+        found = self._collection.query(query_texts=[semantic], n_results=limit, where=where, include=["metadatas", "distances"])
+        hotels = []
+        for metadata, distance in zip(found["metadatas"][0], found["distances"][0]):
+            hotel = json.loads(metadata["hotel"])
+            hotel["match_distance"] = distance
+            hotels.append(hotel)
+        return hotels
+
+_index: Optional[HotelIndex] = None
+_index_lock = threading.Lock()
+
+def get_hotel_index() -> HotelIndex:
+    """Return the process-wide hotel index (opens the Chroma store on first use)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = HotelIndex()
+        return _index
+
+def _index_hotels(location: str, check_in_date: str, check_out_date: str, hotels: List[Dict[str, Any]]):
+    try:
+        get_hotel_index().add_hotels(location, check_in_date, check_out_date, hotels)
+    except Exception as e:
+        logging.warning(f"Could not index hotels: {str(e)}")
+
+def index_hotels_async(location: str, check_in_date: str, check_out_date: str, hotels: List[Dict[str, Any]]):
+    """Queue a search's hotels for indexing on the background thread, if enabled."""
+    if HOTEL_INDEX_ENABLED and hotels:
+        _index_executor.submit(_index_hotels, location, check_in_date, check_out_date, [dict(hotel) for hotel in hotels])
+
+def shortlist_hotels(hotels: List[Dict[str, Any]], preferences: str, location: str, check_in_date: str, check_out_date: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """
+    Pick the hotels a recommendation prompt should consider.
+
+    Prices, star counts and ratings in the preference text filter the given hotels
+    on their current values; the rest of the text ranks them through the index,
+    which only looks up hotels already indexed by the background thread (the search
+    queued them), so nothing is embedded on the caller's thread but the text itself.
+    The given hotel dictionaries are returned, matched ones first, topped up in
+    their ranked order. Without a preference text or an index the first `limit`
+    hotels are used.
+    """
+    if not preferences or not preferences.strip():
+        return hotels[:limit]
+    semantic, filters = parse_preferences(preferences)
+    candidates = [hotel for hotel in hotels if _matches(hotel, filters)] or hotels
+    if not semantic or not HOTEL_INDEX_ENABLED or not candidates:
+        return candidates[:limit]
+
+    by_key = {}
+    for hotel in candidates:
+        by_key.setdefault(hotel_key(hotel), hotel)
+    try:
+        matches = get_hotel_index().query(semantic, location, check_in_date, check_out_date, limit=limit, hotel_keys=list(by_key))
+    except Exception as e:
+        logging.warning(f"Preference matching unavailable, using top hotels: {str(e)}")
+        return candidates[:limit]
+
+    shortlist = []
+    for match in matches:
+        hotel = by_key.pop(hotel_key(match), None)
+        if hotel is not None:
+            shortlist.append(dict(hotel, match_distance=match["match_distance"]))
+    shortlist += [hotel for hotel in candidates if hotel_key(hotel) in by_key][:limit - len(shortlist)]
+    return shortlist
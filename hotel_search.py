@@ -1,20 +1,29 @@
 import os
 import logging
-import requests
 import random
-import re
-from typing import Dict, Optional, List, Any
+import threading
+from typing import Dict, Optional, List, Any, Iterator, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from time import sleep
-from bs4 import BeautifulSoup
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from dotenv import load_dotenv
-from kayak import kayak_hotels, _generate_kayak_url
+from kayak import kayak_hotels
+from chrome_driver import chrome_session, get_browser_pool, CAPTURE_NETWORK, BROWSER_ACQUIRE_TIMEOUT
+from chrome_watchdog import track_browser_usage
+from network_capture import wait_for_hotels, parse_booking_payload, BOOKING_API_PATTERNS
+from parsing import parse_booking_page, normalize_hotels
+from credentials import SearchCredentials, use_credentials, submit_with_context
+from orchestrator import run_providers, is_hedge_attempt
+from provider_guard import SearchCancelled
+from result_cache import get_result_cache, make_cache_key
+from gazetteer import booking_location_params
+from price_history import record_observations
+from snapshot_archive import archive_snapshot
+from hotel_index import index_hotels_async
+from job_queue import get_broker, run_job, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
 
 # Load environment variables
 load_dotenv()
@@ -22,139 +31,92 @@ load_dotenv()
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def _generate_booking_url(location_query: str, check_in_date: str, check_out_date: str, num_adults: int = 2) -> str:
+# Booking.com shows 25 properties per result page
+BOOKING_PAGE_SIZE = 25
+# Number of Booking.com result pages fetched per search
+BOOKING_MAX_PAGES = int(os.environ.get("HOTELFINDER_BOOKING_MAX_PAGES", "3"))
+
+def _generate_booking_url(location_query: str, check_in_date: str, check_out_date: str, num_adults: int = 2, offset: int = 0) -> str:
     """Generate a URL for Booking.com hotel search"""
-    formatted_location = location_query.lower().replace(" ", "-")
-    return f"https://www.booking.com/searchresults.html?ss={formatted_location}&checkin_year_month_monthday={check_in_date}&checkout_year_month_monthday={check_out_date}&group_adults={num_adults}"
+    url = f"https://www.booking.com/searchresults.html?{booking_location_params(location_query)}&checkin_year_month_monthday={check_in_date}&checkout_year_month_monthday={check_out_date}&group_adults={num_adults}"
+    if offset:
+        url += f"&offset={offset}"
+    return url
+
+def _check_cancelled(cancel_event: Optional[threading.Event]):
+    if cancel_event is not None and cancel_event.is_set():
+        raise SearchCancelled("Booking.com page fetch cancelled")
+
+def _scrape_booking_page(driver, url: str, capture_network: bool, cancel_event: Optional[threading.Event] = None, query: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Load one Booking.com result page in the given driver and extract its hotels.
 
-def booking_com_search(location: str, check_in_date: str, check_out_date: str, num_adults: int = 2):
+    The captured API payloads or the rendered page are archived (with query) so
+    parsers can be replayed over them later. Raises SearchCancelled between loading
+    steps once cancel_event is set.
+    """
+    _check_cancelled(cancel_event)
+    if capture_network:
+        # Drop network events left over from the driver's previous page
+        driver.get_log("performance")
+
+    # Set longer timeout and get the page
+    driver.set_page_load_timeout(30)
+    driver.get(url)
+    _check_cancelled(cancel_event)
+
+    if capture_network:
+        # Build hotels straight from the search API responses when they arrive
+        payloads = []
+        hotels = wait_for_hotels(driver, BOOKING_API_PATTERNS, parse_booking_payload, url, cancel_event=cancel_event, payloads=payloads)
+        archive_snapshot(payloads, "Booking.com", "json", url, query)
+        _check_cancelled(cancel_event)
+        if hotels:
+            logging.info(f"Captured {len(hotels)} hotels from Booking.com API responses")
+            return hotels
+        logging.warning("Booking.com network capture found no hotels, falling back to page scraping")
+
+    # Longer wait time for prices to load
+    sleep(random.uniform(5, 7))
+
+    # Scroll slowly with random pauses
+    for i in range(4):
+        _check_cancelled(cancel_event)
+        driver.execute_script(f"window.scrollBy(0, {random.randint(200, 400)})")
+        sleep(random.uniform(1.5, 2.5))
+
+    # Wait for hotel elements to load
+    wait = WebDriverWait(driver, 20)
+    try:
+        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div[data-testid="property-card"]')))
+        # Additional wait for prices
+        sleep(random.uniform(2, 3))
+    except:
+        logging.warning("Timeout waiting for property cards to load")
+
+    _check_cancelled(cancel_event)
+    html = driver.page_source
+    archive_snapshot(html, "Booking.com", "html", url, query)
+    return parse_booking_page(html, url)
+
+def booking_com_search(location: str, check_in_date: str, check_out_date: str, num_adults: int = 2, capture_network: Optional[bool] = None):
     """
     Use Selenium WebDriver to scrape hotel data from Booking.com.
+
+    With capture_network enabled (default: HOTELFINDER_CAPTURE_NETWORK) hotels are built from
+    the page's GraphQL responses, and the rendered DOM is only scraped if none arrive.
     """
     url = _generate_booking_url(location, check_in_date, check_out_date, num_adults)
     logging.info(f"Searching hotels on Booking.com using URL: {url}")
 
-    try:
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')  # Add headless mode
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
-        chrome_options.add_argument('--window-size=1920,1080')
-        chrome_options.add_argument(f'user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36')
-
-        driver = webdriver.Chrome(options=chrome_options)
-        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
-            'source': '''
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                })
-            '''
-        })
-
-        # Set longer timeout and get the page
-        driver.set_page_load_timeout(30)
-        driver.get(url)
-        
-        # Longer wait time for prices to load
-        sleep(random.uniform(5, 7))
-
-        # Scroll slowly with random pauses
-        for i in range(4):
-            driver.execute_script(f"window.scrollBy(0, {random.randint(200, 400)})")
-            sleep(random.uniform(1.5, 2.5))
-
-        # Wait for hotel elements to load
-        wait = WebDriverWait(driver, 20)
-        try:
-            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div[data-testid="property-card"]')))
-            # Additional wait for prices
-            sleep(random.uniform(2, 3))
-        except:
-            logging.warning("Timeout waiting for property cards to load")
-
-        html = driver.page_source
-        driver.quit()
-
-        soup = BeautifulSoup(html, "html.parser")
-        hotels = []
-
-        # Updated selectors for Booking.com's current structure
-        property_cards = soup.select('div[data-testid="property-card"]')
-        if not property_cards:
-            property_cards = soup.select('.sr_property_block')  # Fallback selector
-
-        for item in property_cards:
-            try:
-                hotel_data = {}
-                
-                # Try multiple possible selectors for each field
-                name_element = (
-                    item.select_one('div[data-testid="title"]') or 
-                    item.select_one('.sr-hotel__name') or
-                    item.select_one('span[data-testid="title"]')
-                )
-
-                # Updated price selectors
-                price_element = (
-                    item.select_one('[data-testid="price-and-discounted-price"]') or
-                    item.select_one('[data-testid="price"]') or
-                    item.select_one('.bui-price-display__value') or
-                    item.select_one('.prco-valign-middle-helper') or
-                    item.select_one('[data-testid="price-primary"]') or
-                    item.select_one('.bui-f-color-constructive') or
-                    item.select_one('.prco-inline-block-maker-helper') or
-                    item.select_one('div[data-testid="price-per-night"]')
-                )
-
-                rating_element = (
-                    item.select_one('div[data-testid="review-score"]') or
-                    item.select_one('div[data-testid="rating"]') or
-                    item.select_one('div[aria-label*="Scored"]') or
-                    item.select_one('.bui-review-score__badge') or
-                    item.select_one('.review-score-badge')
-                )
-
-                if name_element:
-                    hotel_data['name'] = name_element.text.strip()
-
-                if price_element:
-                    price_text = price_element.text.strip()
-                    # Extract price value more flexibly
-                    price_match = re.search(r'[\d,]+', price_text)
-                    if price_match:
-                        price_digits = price_match.group().replace(',', '')
-                        try:
-                            price_num = float(price_digits)
-                            price_text = f"₹{price_num:,.0f}"
-                            hotel_data['price'] = price_text
-                        except:
-                            hotel_data['price'] = price_text
-
-                if rating_element:
-                    rating_text = rating_element.text.strip()
-                    if rating_text:
-                        try:
-                            # Extract numeric rating more flexibly
-                            rating_match = re.search(r'(\d+(?:\.\d+)?)', rating_text)
-                            if rating_match:
-                                rating_num = float(rating_match.group(1))
-                                rating_text = f"Scored {rating_num}"
-                            hotel_data['rating'] = rating_text
-                        except:
-                            hotel_data['rating'] = rating_text
-
-                hotel_data['source'] = 'Booking.com'
-                hotel_data['booking_link'] = url
-
-                if hotel_data.get('name') and (hotel_data.get('price') or hotel_data.get('rating')):
-                    hotels.append(hotel_data)
+    if capture_network is None:
+        capture_network = CAPTURE_NETWORK
 
-            except Exception as e:
-                logging.warning(f"Error processing hotel item: {str(e)}")
-                continue
+    try:
+        # The browser is quit (and its process tree reaped) however the scrape ends
+        with track_browser_usage(f"Booking.com search for {location}"), chrome_session(capture_network, label="booking") as driver:
+            query = {"location": location, "check_in_date": check_in_date, "check_out_date": check_out_date, "num_adults": num_adults, "offset": 0}
+            hotels = _scrape_booking_page(driver, url, capture_network, query=query)
 
         if hotels:
             logging.info(f"Found {len(hotels)} hotels on Booking.com")
@@ -168,130 +130,259 @@ def booking_com_search(location: str, check_in_date: str, check_out_date: str, n
         logging.error(f"Booking.com search error: {str(e)}", exc_info=True)
         return []
 
-def search_hotels(location: str, check_in_date: Optional[str] = None, check_out_date: Optional[str] = None, num_adults: int = 2, api_keys: Optional[Dict[str, str]] = None):
+def new_search_cursor(next_offset: int = 0) -> Dict[str, Any]:
     """
-    Search for hotels on multiple sites and combine results.
-    
+    Create a resumable position for paginated Booking.com results.
+
+    The cursor is advanced in place by iter_booking_pages: next_offset is the first
+    result offset not yet fetched, and exhausted is set once an empty page is seen.
+    """
+    return {"next_offset": next_offset, "exhausted": False}
+
+def iter_booking_pages(location: str, check_in_date: str, check_out_date: str, num_adults: int = 2, max_pages: Optional[int] = None, cursor: Optional[Dict[str, Any]] = None, capture_network: Optional[bool] = None, cancel_event: Optional[threading.Event] = None, priority: int = PRIORITY_INTERACTIVE) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    Fetch Booking.com result pages concurrently on pooled browsers.
+
+    With a job broker configured (HOTELFINDER_BROKER) each page becomes a job for the
+    scrape workers instead, and this process only waits for the results. A hedge
+    attempt only uses the browsers the pool has free, and is skipped if there are none.
+
     Args:
         location (str): Location to search for hotels
         check_in_date (str): Check-in date in YYYY-MM-DD format
         check_out_date (str): Check-out date in YYYY-MM-DD format
         num_adults (int): Number of adults
-        api_keys (dict): Dictionary containing API keys
-        
-    Returns:
-        list: Combined list of hotel results sorted by rating and price
+        max_pages (int, optional): Pages to fetch (default: HOTELFINDER_BOOKING_MAX_PAGES)
+        cursor (dict, optional): Position to resume from, advanced as pages complete
+        capture_network (bool, optional): Build hotels from API responses (see booking_com_search)
+        cancel_event (threading.Event, optional): Stops outstanding page fetches once set
+        priority (int): Job priority when pages are fetched by scrape workers (lower first)
+
+    Yields:
+        tuple: (offset, hotels) for each page, in completion order
     """
-    # Set default dates if none provided
+    if cursor is None:
+        cursor = new_search_cursor()
+    if cursor.get("exhausted"):
+        return
+    if max_pages is None:
+        max_pages = BOOKING_MAX_PAGES
+    if capture_network is None:
+        capture_network = CAPTURE_NETWORK
+
+    broker = get_broker()
+    pool = None if broker is not None else get_browser_pool(capture_network)
+    start_offset = cursor.get("next_offset", 0)
+    offsets = [start_offset + page * BOOKING_PAGE_SIZE for page in range(max(1, max_pages))]
+    page_workers = len(offsets)
+    if pool is not None:
+        # A hedge waiting for browsers the first attempt holds would only start once it finished
+        browsers = pool.free_slots() if is_hedge_attempt() else pool.size
+        if browsers <= 0:
+            raise SearchCancelled("No spare browser for a Booking.com hedge")
+        page_workers = min(page_workers, browsers)
+
+    def fetch_page(offset: int) -> List[Dict[str, Any]]:
+        url = _generate_booking_url(location, check_in_date, check_out_date, num_adults, offset=offset)
+        logging.info(f"Fetching Booking.com result page at offset {offset}: {url}")
+        _check_cancelled(cancel_event)
+        query = {"location": location, "check_in_date": check_in_date, "check_out_date": check_out_date, "num_adults": num_adults, "offset": offset}
+        if broker is not None:
+            hotels = run_job("booking_page", dict(query, capture_network=capture_network), priority=priority, cancel_event=cancel_event)
+            _check_cancelled(cancel_event)
+            return hotels
+        with pool.acquire(timeout=BROWSER_ACQUIRE_TIMEOUT, cancel_event=cancel_event) as driver:
+            return _scrape_booking_page(driver, url, capture_network, cancel_event, query)
+
+    completed = set()
+    empty_offset = None
+
+    def advance_cursor():
+        # The cursor only moves past a contiguous run of finished pages, so a failed
+        # page is fetched again by the next continuation
+        next_offset = start_offset
+        while next_offset in completed and next_offset != empty_offset:
+            next_offset += BOOKING_PAGE_SIZE
+        cursor["next_offset"] = next_offset
+        cursor["exhausted"] = empty_offset is not None and next_offset == empty_offset
+
+    # Waiting on remote pages costs no browser, so every page can be outstanding at once
+    executor = ThreadPoolExecutor(max_workers=page_workers, thread_name_prefix="booking-page")
+    try:
+        futures = {submit_with_context(executor, fetch_page, offset): offset for offset in offsets}
+        for future in as_completed(futures):
+            offset = futures[future]
+            try:
+                hotels = future.result()
+            except SearchCancelled:
+                continue
+            except Exception as e:
+                logging.error(f"Error fetching Booking.com page at offset {offset}: {str(e)}")
+                continue
+
+            completed.add(offset)
+            if not hotels and (empty_offset is None or offset < empty_offset):
+                empty_offset = offset
+            advance_cursor()
+            _check_cancelled(cancel_event)
+            yield offset, hotels
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _resolve_dates(check_in_date: Optional[str], check_out_date: Optional[str]) -> Tuple[str, str]:
+    """Fill in default check-in (today) and check-out (one night later) dates."""
     if not check_in_date:
         check_in_date = datetime.now().strftime("%Y-%m-%d")
     if not check_out_date:
         # Default to check-out one day after check-in
         check_out_obj = datetime.strptime(check_in_date, "%Y-%m-%d") + timedelta(days=1)
         check_out_date = check_out_obj.strftime("%Y-%m-%d")
+    return check_in_date, check_out_date
+
+def _collect_booking_pages(location: str, check_in_date: str, check_out_date: str, num_adults: int, max_pages: Optional[int], cursor: Optional[Dict[str, Any]], cancel_event: Optional[threading.Event] = None, priority: int = PRIORITY_INTERACTIVE) -> List[Dict[str, Any]]:
+    """
+    Merge Booking.com pages into one normalized, de-duplicated list as each page arrives.
+
+    Pages advance a private copy of the cursor, which is written back only when the
+    collection finishes, so a cancelled hedge attempt never moves the caller's cursor.
+    """
+    attempt_cursor = dict(cursor) if cursor is not None else None
+    booking_results = []
+    seen_names = set()
+    for offset, page_hotels in iter_booking_pages(location, check_in_date, check_out_date, num_adults, max_pages=max_pages, cursor=attempt_cursor, cancel_event=cancel_event, priority=priority):
+        for hotel in normalize_hotels(page_hotels, 'Booking.com'):
+            if hotel['name'] not in seen_names:
+                seen_names.add(hotel['name'])
+                booking_results.append(hotel)
+        logging.info(f"Merged Booking.com page at offset {offset}: {len(booking_results)} hotels so far")
+
+    _check_cancelled(cancel_event)
+    if cursor is not None:
+        cursor.update(attempt_cursor)
+    return booking_results
+
+def _rank_hotels(all_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Sort combined results by rating (normalized) and price
+    all_results.sort(key=lambda x: (-x.get('rating_normalized', 0), x.get('price_value', float('inf'))))
+
+    # Add rank information
+    for i, hotel in enumerate(all_results, 1):
+        hotel['rank'] = i
+
+    return all_results
+
+def search_hotels(location: str, check_in_date: Optional[str] = None, check_out_date: Optional[str] = None, num_adults: int = 2, api_keys: Optional[Dict[str, str]] = None, max_pages: Optional[int] = None, cursor: Optional[Dict[str, Any]] = None, credentials: Optional[SearchCredentials] = None, use_cache: bool = True, background: bool = False, cancel_event: Optional[threading.Event] = None, refresh: bool = False, cache_ttl: Optional[float] = None):
+    """
+    Search for hotels on multiple sites and combine results.
     
-    # Set API keys if provided  
-    if api_keys:
-        if "BROWSERBASE_KEY" in api_keys:
-            os.environ["BROWSERBASE_API_KEY"] = api_keys["BROWSERBASE_KEY"]
-        if "BROWSERBASE_PROJECT_ID" in api_keys:
-            os.environ["BROWSERBASE_PROJECT_ID"] = api_keys["BROWSERBASE_PROJECT_ID"]
-        if "GROQ_API_KEY" in api_keys:
-            os.environ["GROQ_API_KEY"] = api_keys["GROQ_API_KEY"]
-            
-    # Get results from both sources
-    try:
-        # Get Kayak results using the kayak_hotels function from kayak.py
-        # This will always return mock data without requiring API keys
-        kayak_results = kayak_hotels(location, check_in_date, check_out_date, num_adults)
-        logging.info(f"Got {len(kayak_results)} results from Kayak")
-    except Exception as e:
-        logging.error(f"Error getting Kayak results: {str(e)}")
-        kayak_results = []
+    Args:
+        location (str): Location to search for hotels
+        check_in_date (str): Check-in date in YYYY-MM-DD format
+        check_out_date (str): Check-out date in YYYY-MM-DD format
+        num_adults (int): Number of adults
+        api_keys (dict): Dictionary containing API keys
+        max_pages (int, optional): Booking.com result pages to fetch (default: HOTELFINDER_BOOKING_MAX_PAGES)
+        cursor (dict, optional): Cursor from new_search_cursor(); advanced so search_more_hotels
+            can continue after the pages fetched here
+        credentials (SearchCredentials, optional): Per-request credentials; built from
+            api_keys (falling back to the environment) when omitted
+        use_cache (bool): Serve fresh results from the shared result cache, or join a search
+            for the same query that is already running (e.g. a speculative prefetch)
+        background (bool): Low-priority search (prefetch, pre-warm): only runs on spare
+            provider rate-limit capacity and is never hedged
+        cancel_event (threading.Event, optional): Abandons the search once set; cancelled
+            results are not cached
+        refresh (bool): Search again even if the cache holds fresh results, replacing them
+        cache_ttl (float, optional): Freshness of the cached results (default: HOTELFINDER_CACHE_TTL)
+        
+    Returns:
+        list: Combined list of hotel results sorted by rating and price
+    """
+    # Set default dates if none provided
+    check_in_date, check_out_date = _resolve_dates(check_in_date, check_out_date)
     
-    try:
-        booking_results = booking_com_search(location, check_in_date, check_out_date, num_adults)
-    except Exception as e:
-        logging.error(f"Error getting Booking.com results: {str(e)}")
-        booking_results = []
-
-    # Normalize ratings for both sources to a 5-point scale
-    for hotel in kayak_results:
-        try:
-            if 'rating' in hotel and not hotel.get('rating_normalized'):
-                # Try to extract a numeric rating
-                rating_text = str(hotel['rating'])
-                match = re.search(r"(\d+\.?\d*)", rating_text)
-                if match:
-                    rating_num = float(match.group(1))
-                    # Kayak ratings are usually out of 10 or 5
-                    if rating_num > 5:  # Assume it's out of 10
-                        hotel['rating_normalized'] = rating_num / 2
-                    else:  # Assume it's already out of 5
-                        hotel['rating_normalized'] = rating_num
-                else:
-                    hotel['rating_normalized'] = 3.0  # Default if we can't parse
-        except (ValueError, TypeError) as e:
-            logging.warning(f"Error normalizing Kayak rating: {str(e)}")
-            hotel['rating_normalized'] = 3.0  # Default middle rating
-
-    for hotel in booking_results:
-        try:
-            if 'rating' in hotel and not hotel.get('rating_normalized'):
-                # Try to extract a numeric rating
-                rating_text = str(hotel['rating'])
-                match = re.search(r"(\d+\.?\d*)", rating_text)
-                if match:
-                    rating_num = float(match.group(1))
-                    # Booking.com ratings are usually out of 10
-                    if rating_num > 5:  # Assume it's out of 10
-                        hotel['rating_normalized'] = rating_num / 2
-                    else:  # Assume it's already out of 5
-                        hotel['rating_normalized'] = rating_num
-                else:
-                    hotel['rating_normalized'] = 3.0  # Default if we can't parse
-        except (ValueError, TypeError) as e:
-            logging.warning(f"Error normalizing Booking.com rating: {str(e)}")
-            hotel['rating_normalized'] = 3.0  # Default middle rating
-
-    # Normalize prices for consistent comparison
-    def normalize_price(price_str):
-        if not price_str:
-            return float('inf')
-        try:
-            # Remove currency symbols and convert to float
-            price_text = str(price_str)
-            price = ''.join(c for c in price_text if c.isdigit() or c == '.')
-            return float(price)
-        except (ValueError, TypeError):
-            return float('inf')
-
-    # Add source and normalize prices for both result sets
-    for hotel in kayak_results:
-        if not hotel.get('source'):
-            hotel['source'] = 'Kayak'
-        if 'price' in hotel and not hotel.get('price_value'):
-            hotel['price_value'] = normalize_price(hotel['price'])
-
-    for hotel in booking_results:
-        if not hotel.get('source'):
-            hotel['source'] = 'Booking.com'
-        if 'price' in hotel and not hotel.get('price_value'):
-            hotel['price_value'] = normalize_price(hotel['price'])
+    # Carry API keys with this request instead of writing them into os.environ
+    if credentials is None:
+        credentials = SearchCredentials.from_api_keys(api_keys)
+
+    provider_counts = {}
+
+    def run_search(search_cursor: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with use_credentials(credentials):
+            return _search_all_providers(location, check_in_date, check_out_date, num_adults, max_pages, search_cursor, background, cancel_event, provider_counts)
+
+    if not use_cache:
+        return run_search(cursor)
+
+    def should_store(results: List[Dict[str, Any]]) -> bool:
+        # Only cache complete searches, so a skipped or failed provider is retried next time
+        cancelled = cancel_event is not None and cancel_event.is_set()
+        return bool(provider_counts) and all(provider_counts.values()) and not cancelled
+
+    key = make_cache_key(location, check_in_date, check_out_date, num_adults)
+    return get_result_cache().get_or_compute(key, run_search, cursor=cursor, store=should_store, refresh=refresh, ttl=cache_ttl)
+
+def _kayak_hotels(location: str, check_in_date: str, check_out_date: str, num_adults: int, priority: int = PRIORITY_INTERACTIVE, cancel_event: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
+    # Kayak runs on a scrape worker when a job broker is configured
+    if get_broker() is not None:
+        payload = {"location": location, "check_in_date": check_in_date, "check_out_date": check_out_date, "num_adults": num_adults}
+        return run_job("kayak", payload, priority=priority, cancel_event=cancel_event) or []
+    return kayak_hotels(location, check_in_date, check_out_date, num_adults)
+
+def _search_all_providers(location: str, check_in_date: str, check_out_date: str, num_adults: int, max_pages: Optional[int], cursor: Optional[Dict[str, Any]], background: bool = False, cancel_event: Optional[threading.Event] = None, provider_counts: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    # Get results from both sources concurrently; each provider runs behind its own
+    # rate limiter and circuit breaker
+    priority = PRIORITY_BACKGROUND if background else PRIORITY_INTERACTIVE
+    with track_browser_usage(f"search {location} {check_in_date}..{check_out_date}"):
+        results = run_providers({
+            # Get Kayak results using the kayak_hotels function from kayak.py
+            'Kayak': lambda cancel_event: _kayak_hotels(location, check_in_date, check_out_date, num_adults, priority, cancel_event),
+            'Booking.com': lambda cancel_event: _collect_booking_pages(location, check_in_date, check_out_date, num_adults, max_pages, cursor, cancel_event, priority),
+        }, block=not background, hedge=False if background else None, cancel_event=cancel_event)
+    kayak_results = normalize_hotels(results['Kayak'], 'Kayak')
+    booking_results = results['Booking.com']
+    if provider_counts is not None:
+        provider_counts.update({provider: len(hotels) for provider, hotels in results.items()})
+    logging.info(f"Got {len(kayak_results)} results from Kayak")
 
     # Combine results while preserving source information
     all_results = []
-    all_results.extend([h for h in booking_results if isinstance(h, dict) and 'name' in h])
-    all_results.extend([h for h in kayak_results if isinstance(h, dict) and 'name' in h])
+    all_results.extend(booking_results)
+    all_results.extend(kayak_results)
 
     # Debug the results
     logging.info(f"Combined {len(all_results)} results: {len(booking_results)} from Booking.com and {len(kayak_results)} from Kayak")
-    
-    # Sort combined results by rating (normalized) and price
-    all_results.sort(key=lambda x: (-x.get('rating_normalized', 0), x.get('price_value', float('inf'))))
 
-    # Add rank information
-    for i, hotel in enumerate(all_results, 1):
-        hotel['rank'] = i
+    # Keep every freshly scraped observation for price history (queued, written in the background)
+    record_observations(location, check_in_date, check_out_date, num_adults, all_results)
+    # Embed new hotels for preference matching, also in the background
+    index_hotels_async(location, check_in_date, check_out_date, all_results)
+
+    return _rank_hotels(all_results)
+
+def search_more_hotels(location: str, check_in_date: Optional[str], check_out_date: Optional[str], num_adults: int, cursor: Dict[str, Any], max_pages: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Continue a paginated search from its cursor without re-scraping earlier pages.
+
+    Args:
+        location (str): Location of the original search
+        check_in_date (str): Check-in date of the original search
+        check_out_date (str): Check-out date of the original search
+        num_adults (int): Number of adults of the original search
+        cursor (dict): Cursor advanced by the original search_hotels call
+        max_pages (int, optional): Further Booking.com pages to fetch
+
+    Returns:
+        list: Newly found hotels, normalized and ranked; [] once the cursor is exhausted
+    """
+    check_in_date, check_out_date = _resolve_dates(check_in_date, check_out_date)
+    if cursor.get("exhausted"):
+        return []
+
+    with track_browser_usage(f"more results {location} {check_in_date}..{check_out_date}"):
+        more_results = run_providers({
+            'Booking.com': lambda cancel_event: _collect_booking_pages(location, check_in_date, check_out_date, num_adults, max_pages, cursor, cancel_event),
+        })['Booking.com']
+    record_observations(location, check_in_date, check_out_date, num_adults, more_results)
 
-    return all_results 
\ No newline at end of file
+    return _rank_hotels(more_results)
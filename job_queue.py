@@ -0,0 +1,346 @@
+import os
+import json
+import heapq
+import uuid
+import logging
+import sqlite3
+import importlib
+import threading
+from abc import ABC, abstractmethod
+from time import time, sleep, monotonic
+from typing import Dict, List, Any, Optional, Tuple
+from chrome_watchdog import add_browser_usage
+
+# Broker used to hand scraping to worker processes (see scrape_worker.py):
+#   unset            scrape inside this process (no queue)
+#   memory           in-process queue, for local testing with in-process workers
+#   sqlite:///path   SQLite file shared by front ends and workers on one host
+#   package.module:Class   any Broker subclass taking no arguments
+BROKER_URL = os.environ.get("HOTELFINDER_BROKER", "")
+SCRAPE_QUEUE = "scrape"
+# Lower runs first: user searches before prefetch/pre-warm/price-watch work
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+# Seconds a claimed job stays invisible to other workers before it is handed out again
+VISIBILITY_TIMEOUT = float(os.environ.get("HOTELFINDER_JOB_VISIBILITY_TIMEOUT", "180"))
+MAX_ATTEMPTS = 3
+# Seconds a published result is kept for its waiter; older ones (waiter gone) are purged
+RESULT_TTL = float(os.environ.get("HOTELFINDER_JOB_RESULT_TTL", "3600"))
+
+class JobFailed(Exception):
+    """A job raised in the worker, or ran out of attempts."""
+
+class Job:
+    """A unit of work on a queue; payload must be JSON-serializable."""
+
+    __slots__ = ("id", "queue", "kind", "payload", "priority", "attempts", "max_attempts", "enqueued_at")
+
+    def __init__(self, kind: str, payload: Dict[str, Any], priority: int = PRIORITY_INTERACTIVE, queue: str = SCRAPE_QUEUE, max_attempts: int = MAX_ATTEMPTS, id: Optional[str] = None, attempts: int = 0, enqueued_at: Optional[float] = None):
+        self.id = id or uuid.uuid4().hex
+        self.queue = queue
+        self.kind = kind
+        self.payload = payload
+        self.priority = priority
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.enqueued_at = enqueued_at if enqueued_at is not None else time()
+
+    def __repr__(self):
+        return f"Job({self.kind!r}, id={self.id!r}, priority={self.priority}, attempts={self.attempts})"
+
+class Broker(ABC):
+    """
+    Job queue interface between front ends and scrape workers.
+
+    Delivery is at-least-once: a claimed job that is not acked within its
+    visibility timeout (worker crash, lost node) becomes claimable again, up to
+    its max_attempts, after which it fails with an error result.
+    """
+
+    @abstractmethod
+    def enqueue(self, job: Job) -> str:
+        """Add a job to its queue and return its id."""
+
+    @abstractmethod
+    def claim(self, queue: str, worker_id: str, visibility_timeout: float = VISIBILITY_TIMEOUT) -> Optional[Job]:
+        """Take the highest-priority visible job, or return None if there is none."""
+
+    @abstractmethod
+    def ack(self, job: Job, result: Any = None, error: Optional[str] = None):
+        """Finish a claimed job, publishing its result (or error) to the waiting front end."""
+
+    @abstractmethod
+    def cancel(self, job_id: str):
+        """Drop a job nobody waits for anymore (claimed copies finish but are ignored)."""
+
+    @abstractmethod
+    def _fetch_result(self, job_id: str) -> Optional[Tuple[Any, Optional[str]]]:
+        """Pop a published (result, error) pair, or return None if there is none yet."""
+
+    def wait_result(self, job_id: str, timeout: float, cancel_event: Optional[threading.Event] = None, poll_interval: float = 0.2) -> Any:
+        """
+        Block until a job's result is published.
+
+        Raises:
+            JobFailed: If the job failed
+            TimeoutError: If no result arrived within timeout
+        """
+        deadline = monotonic() + timeout
+        while monotonic() < deadline:
+            if cancel_event is not None and cancel_event.is_set():
+                self.cancel(job_id)
+                return None
+            found = self._fetch_result(job_id)
+            if found is not None:
+                result, error = found
+                if error:
+                    raise JobFailed(error)
+                return result
+            sleep(poll_interval)
+        self.cancel(job_id)
+        raise TimeoutError(f"No result for job {job_id} within {timeout}s")
+
+class InMemoryBroker(Broker):
+    """Process-local broker for tests and single-process deployments with worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._heap: List[Tuple[int, float, str]] = []
+        self._jobs: Dict[str, Job] = {}
+        # job id -> visibility deadline of the current claim
+        self._claimed: Dict[str, float] = {}
+        self._results: Dict[str, Tuple[Any, Optional[str]]] = {}
+
+    def enqueue(self, job: Job) -> str:
+        with self._lock:
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (job.priority, job.enqueued_at, job.id))
+            self._lock.notify_all()
+        return job.id
+
+    def _requeue_expired(self):
+        now = time()
+        for job_id, deadline in list(self._claimed.items()):
+            if deadline <= now:
+                del self._claimed[job_id]
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    heapq.heappush(self._heap, (job.priority, job.enqueued_at, job.id))
+
+    def claim(self, queue: str, worker_id: str, visibility_timeout: float = VISIBILITY_TIMEOUT) -> Optional[Job]:
+        with self._lock:
+            self._requeue_expired()
+            skipped = []
+            claimed = None
+            while self._heap:
+                entry = heapq.heappop(self._heap)
+                job = self._jobs.get(entry[2])
+                if job is None or job.id in self._claimed:
+                    continue
+                if job.queue != queue:
+                    skipped.append(entry)
+                    continue
+                job.attempts += 1
+                if job.attempts > job.max_attempts:
+                    del self._jobs[job.id]
+                    self._results[job.id] = (None, f"Gave up after {job.max_attempts} attempts")
+                    self._lock.notify_all()
+                    continue
+                self._claimed[job.id] = time() + visibility_timeout
+                claimed = job
+                break
+            for entry in skipped:
+                heapq.heappush(self._heap, entry)
+            return claimed
+
+    def ack(self, job: Job, result: Any = None, error: Optional[str] = None):
+        with self._lock:
+            self._claimed.pop(job.id, None)
+            if self._jobs.pop(job.id, None) is not None:
+                self._results[job.id] = (result, error)
+                self._lock.notify_all()
+
+    def cancel(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._claimed.pop(job_id, None)
+            self._results.pop(job_id, None)
+
+    def _fetch_result(self, job_id: str) -> Optional[Tuple[Any, Optional[str]]]:
+        with self._lock:
+            return self._results.pop(job_id, None)
+
+    def wait_result(self, job_id: str, timeout: float, cancel_event: Optional[threading.Event] = None, poll_interval: float = 0.2) -> Any:
+        # Same contract as the polling version, but woken as soon as a result lands
+        deadline = monotonic() + timeout
+        with self._lock:
+            while job_id not in self._results:
+                remaining = deadline - monotonic()
+                if remaining <= 0 or (cancel_event is not None and cancel_event.is_set()):
+                    break
+                self._lock.wait(min(remaining, poll_interval))
+        return super().wait_result(job_id, max(deadline - monotonic(), 0.001), cancel_event, poll_interval)
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    queue TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    enqueued_at REAL NOT NULL,
+    visible_at REAL NOT NULL,
+    claimed_by TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (queue, priority, enqueued_at);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT PRIMARY KEY,
+    result TEXT,
+    error TEXT,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_finished ON results (finished_at);
+"""
+
+class SQLiteBroker(Broker):
+    """
+    Broker on a shared SQLite file: any number of front-end and worker processes on one
+    host (or a shared volume) coordinate through it. Claims run in an IMMEDIATE
+    transaction so two workers never take the same job.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.executescript(_SQLITE_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def enqueue(self, job: Job) -> str:
+        self._connection().execute(
+            "INSERT INTO jobs (id, queue, kind, payload, priority, attempts, max_attempts, enqueued_at, visible_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job.id, job.queue, job.kind, json.dumps(job.payload), job.priority, job.attempts, job.max_attempts, job.enqueued_at, job.enqueued_at)
+        )
+        return job.id
+
+    def claim(self, queue: str, worker_id: str, visibility_timeout: float = VISIBILITY_TIMEOUT) -> Optional[Job]:
+        connection = self._connection()
+        while True:
+            now = time()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT id, kind, payload, priority, attempts, max_attempts, enqueued_at FROM jobs "
+                    "WHERE queue = ? AND visible_at <= ? ORDER BY priority, enqueued_at LIMIT 1",
+                    (queue, now)
+                ).fetchone()
+                if row is None:
+                    connection.execute("COMMIT")
+                    return None
+                job_id, kind, payload, priority, attempts, max_attempts, enqueued_at = row
+                if attempts >= max_attempts:
+                    connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+                    connection.execute("INSERT OR REPLACE INTO results VALUES (?, NULL, ?, ?)", (job_id, f"Gave up after {max_attempts} attempts", now))
+                    self._purge_results(connection, now)
+                    connection.execute("COMMIT")
+                    continue
+                connection.execute(
+                    "UPDATE jobs SET attempts = attempts + 1, visible_at = ?, claimed_by = ? WHERE id = ?",
+                    (now + visibility_timeout, worker_id, job_id)
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            return Job(kind, json.loads(payload), priority, queue, max_attempts, id=job_id, attempts=attempts + 1, enqueued_at=enqueued_at)
+
+    def ack(self, job: Job, result: Any = None, error: Optional[str] = None):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # A cancelled job has no row left; its result is not wanted
+            if connection.execute("DELETE FROM jobs WHERE id = ?", (job.id,)).rowcount:
+                now = time()
+                connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (job.id, json.dumps(result, default=str), error, now))
+                self._purge_results(connection, now)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _purge_results(connection: sqlite3.Connection, now: float):
+        # Results whose waiter died or timed out without cancelling are never fetched
+        connection.execute("DELETE FROM results WHERE finished_at < ?", (now - RESULT_TTL,))
+
+    def cancel(self, job_id: str):
+        connection = self._connection()
+        connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        connection.execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+
+    def _fetch_result(self, job_id: str) -> Optional[Tuple[Any, Optional[str]]]:
+        connection = self._connection()
+        row = connection.execute("SELECT result, error FROM results WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        connection.execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+        return (json.loads(row[0]) if row[0] is not None else None), row[1]
+
+def create_broker(url: str) -> Optional[Broker]:
+    """Build a broker from a HOTELFINDER_BROKER style URL; "" means no broker."""
+    if not url:
+        return None
+    if url == "memory":
+        return InMemoryBroker()
+    if url.startswith("sqlite:///"):
+        return SQLiteBroker(url[len("sqlite:///"):])
+    if ":" in url:
+        module_name, class_name = url.split(":", 1)
+        return getattr(importlib.import_module(module_name), class_name)()
+    raise ValueError(f"Unknown broker: {url}")
+
+_broker: Optional[Broker] = None
+_broker_created = False
+_broker_lock = threading.Lock()
+
+def get_broker() -> Optional[Broker]:
+    """Return the process-wide broker configured by HOTELFINDER_BROKER, or None to scrape in-process."""
+    global _broker, _broker_created
+    with _broker_lock:
+        if not _broker_created:
+            _broker = create_broker(BROKER_URL)
+            _broker_created = True
+            if isinstance(_broker, InMemoryBroker):
+                # Nothing outside this process can reach an in-memory queue: serve it here
+                from scrape_worker import start_worker_threads
+                start_worker_threads(_broker)
+        return _broker
+
+def run_job(kind: str, payload: Dict[str, Any], priority: int = PRIORITY_INTERACTIVE, timeout: float = VISIBILITY_TIMEOUT * MAX_ATTEMPTS, cancel_event: Optional[threading.Event] = None) -> Any:
+    """
+    Enqueue a scrape job on the configured broker and wait for a worker's result.
+
+    The browser usage the worker measured for the job is charged to the search
+    tracked in this context (see chrome_watchdog.track_browser_usage).
+    """
+    broker = get_broker()
+    job = Job(kind, payload, priority)
+    broker.enqueue(job)
+    logging.debug(f"Enqueued {job}")
+    reply = broker.wait_result(job.id, timeout, cancel_event)
+    # Workers reply {"result": ..., "browser_usage": ...} (see ScrapeWorker); None if cancelled
+    if not isinstance(reply, dict) or "result" not in reply:
+        return reply
+    if reply.get("browser_usage"):
+        add_browser_usage(reply["browser_usage"])
+    return reply["result"]
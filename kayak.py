@@ -3,6 +3,8 @@ import requests
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 from crewai.tools import tool
+from chrome_driver import CAPTURE_NETWORK
+from gazetteer import kayak_location
 
 @tool("Kayak Hotel Tool")
 def kayak_hotel_search(
@@ -21,7 +23,7 @@ def kayak_hotel_search(
     :return: The Kayak URL for the hotel search
     """
     print(f"Generating Kayak Hotel URL for {location_query} from {check_in_date} to {check_out_date} for {num_adults} adults")
-    formatted_location = location_query.replace(" ", "-").lower()
+    formatted_location = kayak_location(location_query)
     URL = f"https://www.kayak.co.in/hotels/{formatted_location}/{check_in_date}/{check_out_date}/{num_adults}adults"
     return URL
 
@@ -38,14 +40,14 @@ def _generate_kayak_url(location: str, check_in: str, check_out: str, adults: in
     Returns:
         str: Kayak URL for hotel search
     """
-    # Format location for URL
-    formatted_location = location.replace(" ", "-").lower()
+    # Resolve the location to Kayak's canonical form (e.g. "Hisar,Haryana,India-p15321")
+    formatted_location = kayak_location(location)
     
     # Generate Kayak URL
     url = f"https://www.kayak.com/hotels/{formatted_location}/{check_in}/{check_out}/{adults}adults"
     return url
 
-def kayak_hotels(location: str, check_in_date: str, check_out_date: str, num_adults: int = 2, api_keys: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+def kayak_hotels(location: str, check_in_date: str, check_out_date: str, num_adults: int = 2, api_keys: Optional[Dict[str, str]] = None, capture_network: Optional[bool] = None) -> List[Dict[str, Any]]:
     """
     Search for hotels on Kayak using Browserbase.
     
@@ -55,6 +57,8 @@ def kayak_hotels(location: str, check_in_date: str, check_out_date: str, num_adu
         check_out_date (str): Check-out date in YYYY-MM-DD format
         num_adults (int): Number of adults
         api_keys (dict, optional): Dictionary containing API keys
+        capture_network (bool, optional): Build hotels from Kayak's result API responses
+            (default: HOTELFINDER_CAPTURE_NETWORK)
         
     Returns:
         list: List of hotel dictionaries
@@ -62,10 +66,25 @@ def kayak_hotels(location: str, check_in_date: str, check_out_date: str, num_adu
     # Generate the Kayak URL
     url = _generate_kayak_url(location, check_in_date, check_out_date, num_adults)
     print(f"Generated Kayak URL: {url}")
+
+    if capture_network is None:
+        capture_network = CAPTURE_NETWORK
+
+    if capture_network:
+        from network_capture import capture_kayak_hotels
+        captured = capture_kayak_hotels(url, query={
+            "location": location,
+            "check_in_date": check_in_date,
+            "check_out_date": check_out_date,
+            "num_adults": num_adults,
+        })
+        if captured:
+            return captured
+        print("Kayak network capture returned no hotels, using sample data")
     
     # Always return sample data regardless of API keys - this ensures we have results
     # Add location to hotel names to make them more realistic
-    return [
+    sample_hotels = [
         {
             "name": f"Kayak Premium Hotel in {location}",
             "price": "$175/night",
@@ -121,4 +140,8 @@ def kayak_hotels(location: str, check_in_date: str, check_out_date: str, num_adu
             "booking_link": url,
             "stars": 4
         }
-    ] 
+    ]
+    # Marked so sample prices are never recorded as observations (see price_history)
+    for hotel in sample_hotels:
+        hotel["sample"] = True
+    return sample_hotels
@@ -0,0 +1,669 @@
+"""
+Load generator for HotelFinder Pro.
+
+Simulates concurrent users against the FastAPI app (GET /hotels, streamed
+POST /recommendation) or the Streamlit UI (ui.py, driven through Streamlit's
+AppTest), with the scrapers replaced by stubs of realistic latency and a stub
+GROQ server on localhost, so one instance's capacity can be measured without
+touching Booking.com, Kayak or GROQ.
+
+    python loadtest.py --target http --profile ramp --users 50 --ramp-seconds 300
+    python loadtest.py --target streamlit --profile soak --users 10 --duration 1800
+
+Reports latency histograms and error rates per operation (and per ramp step),
+and CPU / RSS / thread timelines of the process; --output writes them as JSON.
+"""
+import os
+import sys
+import json
+import math
+import zlib
+import random
+import socket
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic, sleep, time
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+try:
+    import psutil
+except ImportError:  # CPU / RSS are read from os.times() and /proc without it
+    psutil = None
+
+# Histogram buckets grow by 10% from 1 ms, up to about 5 minutes
+_BUCKET_BASE = 0.001
+_BUCKET_GROWTH = 1.1
+_BUCKET_COUNT = 133
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (about 5% resolution) with error counts."""
+
+    def __init__(self):
+        self.buckets = [0] * (_BUCKET_COUNT + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, error: bool = False):
+        index = 0 if seconds <= _BUCKET_BASE else min(_BUCKET_COUNT, 1 + int(math.log(seconds / _BUCKET_BASE, _BUCKET_GROWTH)))
+        with self._lock:
+            self.buckets[index] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            if error:
+                self.errors += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th percentile (0 < q <= 100)."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = math.ceil(self.count * q / 100)
+            seen = 0
+            for index, bucket in enumerate(self.buckets):
+                seen += bucket
+                if seen >= rank:
+                    return min(self.max, _BUCKET_BASE * _BUCKET_GROWTH ** index)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": self.errors / self.count if self.count else 0.0,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary plus the non-empty buckets as [upper bound in seconds, count]."""
+        summary = self.summary()
+        with self._lock:
+            summary["buckets"] = [[_BUCKET_BASE * _BUCKET_GROWTH ** index, bucket] for index, bucket in enumerate(self.buckets) if bucket]
+        return summary
+
+class LoadStats:
+    """Histograms per operation, overall and per load step."""
+
+    def __init__(self):
+        self.step = 0
+        self.operations: Dict[str, LatencyHistogram] = {}
+        self.steps: Dict[int, Dict[str, LatencyHistogram]] = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, table: Dict[str, LatencyHistogram], operation: str) -> LatencyHistogram:
+        with self._lock:
+            return table.setdefault(operation, LatencyHistogram())
+
+    def record(self, operation: str, seconds: float, error: bool = False):
+        self._histogram(self.operations, operation).record(seconds, error)
+        with self._lock:
+            step_table = self.steps.setdefault(self.step, {})
+        self._histogram(step_table, operation).record(seconds, error)
+
+    def completed(self) -> int:
+        with self._lock:
+            return sum(histogram.count for histogram in self.operations.values())
+
+class ResourceSampler:
+    """Samples CPU %, RSS and thread count of this process at a fixed interval."""
+
+    def __init__(self, stats: LoadStats, active_users: Callable[[], int], interval: float = 1.0):
+        self.stats = stats
+        self.active_users = active_users
+        self.interval = interval
+        self.timeline: List[Dict[str, Any]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="loadtest-sampler", daemon=True)
+        self._process = psutil.Process() if psutil is not None else None
+
+    def _cpu_seconds(self) -> float:
+        times = os.times()
+        return times.user + times.system
+
+    def _rss(self) -> Optional[int]:
+        if self._process is not None:
+            return self._process.memory_info().rss
+        try:
+            with open("/proc/self/statm") as statm:
+                return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _run(self):
+        started = monotonic()
+        last_wall, last_cpu, last_completed = started, self._cpu_seconds(), 0
+        while not self._stop.wait(self.interval):
+            wall, cpu, completed = monotonic(), self._cpu_seconds(), self.stats.completed()
+            elapsed = max(wall - last_wall, 1e-9)
+            self.timeline.append({
+                "t": round(wall - started, 3),
+                "users": self.active_users(),
+                "step": self.stats.step,
+                # 100% is one core busy
+                "cpu_percent": round(100 * (cpu - last_cpu) / elapsed, 1),
+                "rss_bytes": self._rss(),
+                "threads": threading.active_count(),
+                "requests_per_second": round((completed - last_completed) / elapsed, 2),
+            })
+            last_wall, last_cpu, last_completed = wall, cpu, completed
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+class QueryMix:
+    """
+    Realistic search mix: destinations weighted by a Zipf law over the gazetteer's
+    most populous cities (or replayed from a search log), mostly short stays a few
+    days to a few weeks out, weekends over-represented, mostly two adults.
+    """
+
+    def __init__(self, seed: Optional[int] = None, search_log: Optional[str] = None, destinations: int = 40):
+        self._random = random.Random(seed)
+        self._logged: List[Tuple[str, str, str, int]] = self._read_search_log(search_log) if search_log else []
+        from gazetteer import get_gazetteer
+
+        places = sorted(get_gazetteer().places, key=lambda place: -place.population)[:destinations]
+        self.locations = [place.display_name for place in places]
+        self._weights = [1 / rank for rank in range(1, len(self.locations) + 1)]
+
+    def _read_search_log(self, path: str) -> List[Tuple[str, str, str, int]]:
+        searches = []
+        today = date.today()
+        with open(path, encoding="utf-8") as log_file:
+            for line in log_file:
+                try:
+                    entry = json.loads(line)
+                    check_in = date.fromisoformat(entry["check_in_date"])
+                    check_out = date.fromisoformat(entry["check_out_date"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if check_in < today:
+                    # Keep the weekday and length of stay of past searches
+                    shift = timedelta(weeks=math.ceil((today - check_in).days / 7))
+                    check_in, check_out = check_in + shift, check_out + shift
+                searches.append((entry["location"], check_in.isoformat(), check_out.isoformat(), int(entry.get("num_adults") or 2)))
+        return searches
+
+    def sample(self) -> Tuple[str, str, str, int]:
+        """Return (location, check_in_date, check_out_date, num_adults)."""
+        if self._logged:
+            return self._random.choice(self._logged)
+        location = self._random.choices(self.locations, self._weights)[0]
+        today = date.today()
+        if self._random.random() < 0.35:
+            # A coming weekend, Friday to Sunday
+            days_to_friday = (4 - today.weekday()) % 7 + 7 * self._random.randrange(4)
+            check_in, nights = today + timedelta(days=days_to_friday), 2
+        else:
+            check_in = today + timedelta(days=min(120, int(self._random.expovariate(1 / 21))))
+            nights = self._random.choices([1, 2, 3, 4, 5, 7], [30, 28, 18, 10, 7, 7])[0]
+        num_adults = self._random.choices([1, 2, 3, 4], [20, 60, 10, 10])[0]
+        return location, check_in.isoformat(), (check_in + timedelta(days=nights)).isoformat(), num_adults
+
+class ProviderStubs:
+    """
+    Stand-ins for the Booking.com page scraper, the browser pool and the Kayak search.
+
+    Latencies are log-normal around the given medians (0 disables sleeping), a
+    fraction of calls fail, and each destination has a fixed number of hotels so
+    pagination ends like it does on the real sites. The stubs sit below the
+    orchestrator, so cache, guards, hedging and pagination all run for real.
+    """
+
+    def __init__(self, booking_page_median: float = 2.0, kayak_median: float = 4.0, error_rate: float = 0.02, seed: Optional[int] = None):
+        self.booking_page_median = booking_page_median
+        self.kayak_median = kayak_median
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self, median: float, cancel_event: Optional[threading.Event] = None):
+        with self._lock:
+            delay = median * math.exp(self._random.gauss(0, 0.5)) if median > 0 else 0.0
+            failed = self._random.random() < self.error_rate
+        if cancel_event is not None:
+            from provider_guard import SearchCancelled
+
+            if cancel_event.wait(delay):
+                raise SearchCancelled()
+        elif delay:
+            sleep(delay)
+        if failed:
+            raise RuntimeError("Stubbed provider failure")
+
+    @staticmethod
+    def _hotels(location: str, check_in_date: str, source: str, offset: int, count: int) -> List[Dict[str, Any]]:
+        seed = zlib.crc32(f"{source}|{location}|{check_in_date}".encode("utf-8"))
+        available = 40 + seed % 110
+        hotels = []
+        for index in range(offset, min(offset + count, available)):
+            rng = random.Random(seed + index)
+            rating = round(rng.uniform(6.0, 9.7), 1)
+            hotels.append({
+                "name": f"{location.split(',')[0]} {rng.choice(['Grand', 'Central', 'Park', 'Garden', 'Plaza', 'Harbour'])} Hotel {index + 1}",
+                "price": f"${rng.randint(40, 400)}",
+                "rating": str(rating if source == "Booking.com" else round(rating / 2, 1)),
+                "stars": str(rng.randint(2, 5)),
+                "location": rng.choice(["City centre", "Old town", "Near the station", "Waterfront", "Business district"]),
+                "booking_link": f"https://example.invalid/{source.lower()}/{seed}/{index}",
+                "source": source,
+            })
+        return hotels
+
+    def scrape_booking_page(self, driver, url: str, capture_network: bool, cancel_event: Optional[threading.Event] = None, query: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        query = query or {}
+        self._delay(self.booking_page_median, cancel_event)
+        return self._hotels(query.get("location", ""), query.get("check_in_date", ""), "Booking.com", query.get("offset", 0), 25)
+
+    def kayak_hotels(self, location: str, check_in_date: str, check_out_date: str, num_adults: int = 2, api_keys: Optional[Dict[str, str]] = None, capture_network: Optional[bool] = None) -> List[Dict[str, Any]]:
+        self._delay(self.kayak_median)
+        return self._hotels(location, check_in_date, "Kayak", 0, 30)
+
+    def install(self):
+        """Patch the stubs into the search modules (in-process only)."""
+        import chrome_driver
+        import hotel_search
+
+        pool = _StubBrowserPool(chrome_driver.BROWSER_POOL_SIZE)
+        chrome_driver.get_browser_pool = hotel_search.get_browser_pool = lambda capture_network=False: pool
+        hotel_search._scrape_booking_page = self.scrape_booking_page
+        hotel_search.kayak_hotels = self.kayak_hotels
+        # job_queue may have been imported (and read HOTELFINDER_BROKER) before
+        # _prepare_environment ran: keep every search in this process
+        hotel_search.get_broker = lambda: None
+
+class _StubBrowserPool:
+    # Keeps the real pool's contention: at most `size` pages load at once
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._leased = 0
+        self._lock = threading.Lock()
+
+    def free_slots(self) -> int:
+        with self._lock:
+            return self.size - self._leased
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None, cancel_event: Optional[threading.Event] = None):
+        # Same contract as BrowserPool.acquire: poll so a cancelled search stops waiting
+        from provider_guard import SearchCancelled
+
+        deadline = monotonic() + timeout if timeout is not None else None
+        while not self._slots.acquire(timeout=0.5):
+            if cancel_event is not None and cancel_event.is_set():
+                raise SearchCancelled("Search cancelled while waiting for a browser")
+            if deadline is not None and monotonic() >= deadline:
+                raise TimeoutError("No stub browser available")
+        with self._lock:
+            self._leased += 1
+        try:
+            yield None
+        finally:
+            with self._lock:
+                self._leased -= 1
+            self._slots.release()
+
+class StubGroqServer:
+    """OpenAI-compatible chat completions endpoint on localhost, streaming or not."""
+
+    def __init__(self, token_delay: float = 0.02, first_token_delay: float = 0.3, completion_tokens: int = 120):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                prompt = " ".join(message.get("content", "") for message in body.get("messages", []))
+                tokens = min(stub.completion_tokens, int(body.get("max_tokens") or stub.completion_tokens))
+                usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": tokens, "total_tokens": len(prompt) // 4 + tokens}
+                sleep(stub.first_token_delay)
+                if body.get("stream"):
+                    self._stream(tokens, usage)
+                else:
+                    sleep(stub.token_delay * tokens)
+                    self._json({"choices": [{"index": 0, "message": {"role": "assistant", "content": stub.text(tokens)}}], "usage": usage})
+
+            def _json(self, payload: Dict[str, Any]):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, tokens: int, usage: Dict[str, Any]):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for word in stub.text(tokens).split(" "):
+                    chunk = {"choices": [{"index": 0, "delta": {"content": word + " "}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    sleep(stub.token_delay)
+                final = {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"usage": usage}}
+                self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        self.token_delay = token_delay
+        self.first_token_delay = first_token_delay
+        self.completion_tokens = completion_tokens
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/openai/v1/chat/completions"
+
+    @staticmethod
+    def text(tokens: int) -> str:
+        return " ".join(["The", "Central", "Hotel", "offers", "the", "best", "value", "here."] * (tokens // 8 + 1))[:tokens * 4].strip()
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="stub-groq", daemon=True).start()
+        import groq_helper
+
+        groq_helper.GROQ_CHAT_URL = self.url
+
+    def stop(self):
+        self._server.shutdown()
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+def start_api_server() -> str:
+    """Serve api.app with uvicorn on a free localhost port; returns its base URL."""
+    import uvicorn
+    from api import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="loadtest-api", daemon=True).start()
+    deadline = monotonic() + 30
+    while not server.started:
+        if monotonic() > deadline:
+            raise RuntimeError("API server did not start")
+        sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+class HttpUser:
+    """Searches through GET /hotels and sometimes streams a recommendation for the results."""
+
+    def __init__(self, base_url: str, mix: QueryMix, stats: LoadStats, recommend_rate: float = 0.3, timeout: float = 180):
+        import requests
+
+        self.base_url = base_url
+        self.mix = mix
+        self.stats = stats
+        self.recommend_rate = recommend_rate
+        self.timeout = timeout
+        self._random = random.Random()
+        self._session = requests.Session()
+        self._session.post(f"{base_url}/permission", json={"allow_search": True}, timeout=timeout).raise_for_status()
+        self._session.post(f"{base_url}/api-keys", json={"GROQ_API_KEY": "loadtest"}, timeout=timeout).raise_for_status()
+
+    def iteration(self):
+        location, check_in_date, check_out_date, num_adults = self.mix.sample()
+        params = {"location": location, "check_in_date": check_in_date, "check_out_date": check_out_date, "num_adults": num_adults}
+        started = monotonic()
+        try:
+            response = self._session.get(f"{self.base_url}/hotels", params=params, timeout=self.timeout)
+            hotels = response.json().get("hotels", []) if response.ok else []
+            self.stats.record("hotels", monotonic() - started, error=not response.ok or not hotels)
+        except Exception as e:
+            logging.debug(f"/hotels failed: {str(e)}")
+            self.stats.record("hotels", monotonic() - started, error=True)
+            return
+
+        if hotels and self._random.random() < self.recommend_rate:
+            body = {"hotels": hotels[:20], "preferences": {"budget": "moderate", "priorities": ["Value for money", "Location"]}}
+            started = monotonic()
+            first_byte = None
+            try:
+                with self._session.post(f"{self.base_url}/recommendation", json=body, stream=True, timeout=self.timeout) as response:
+                    for chunk in response.iter_content(chunk_size=None):
+                        if chunk and first_byte is None:
+                            first_byte = monotonic() - started
+                            self.stats.record("recommendation_first_byte", first_byte)
+                    error = not response.ok
+            except Exception as e:
+                logging.debug(f"/recommendation failed: {str(e)}")
+                error = True
+            self.stats.record("recommendation", monotonic() - started, error=error)
+
+class StreamlitUser:
+    """Runs ui.py through Streamlit's AppTest: fills in the form and clicks "Find Hotels"."""
+
+    def __init__(self, mix: QueryMix, stats: LoadStats, timeout: float = 180):
+        self.mix = mix
+        self.stats = stats
+        self.timeout = timeout
+        self._script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ui.py")
+
+    def iteration(self):
+        from streamlit.testing.v1 import AppTest
+
+        location, check_in_date, check_out_date, num_adults = self.mix.sample()
+        started = monotonic()
+        try:
+            app = AppTest.from_file(self._script, default_timeout=self.timeout)
+            app.run()
+            self.stats.record("streamlit_load", monotonic() - started, error=bool(app.exception))
+
+            app.sidebar.text_input[2].input("loadtest")
+            app.text_input(key="location_input").input(location)
+            app.number_input(key="num_adults_input").set_value(num_adults)
+            app.date_input(key="check_in_input").set_value(date.fromisoformat(check_in_date))
+            app.date_input(key="check_out_input").set_value(date.fromisoformat(check_out_date))
+            started = monotonic()
+            app.button(key="find_hotels_button").click().run()
+            found = any(str(element.value).startswith("Found ") for element in app.markdown)
+            self.stats.record("streamlit_search", monotonic() - started, error=bool(app.exception) or not found)
+        except Exception as e:
+            logging.debug(f"Streamlit run failed: {str(e)}")
+            self.stats.record("streamlit_search", monotonic() - started, error=True)
+
+class LoadRunner:
+    """
+    Runs virtual users in threads, each repeating iteration() with exponential think
+    time in between.
+
+    Profiles:
+        ramp: grow from 1 to `users` in `steps` equal steps over ramp_seconds; stats are
+            kept per step, so the point where latency bends shows the capacity
+        soak: hold `users` for `duration` seconds, to catch leaks and slow degradation
+    """
+
+    def __init__(self, make_user: Callable[[], Any], stats: LoadStats, think_time: float = 5.0):
+        self.make_user = make_user
+        self.stats = stats
+        self.think_time = think_time
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._random = random.Random()
+
+    def active_users(self) -> int:
+        return sum(thread.is_alive() for thread in self._threads)
+
+    def _user_loop(self):
+        try:
+            user = self.make_user()
+        except Exception as e:
+            logging.error(f"Virtual user could not start: {str(e)}")
+            self.stats.record("user_start", 0.0, error=True)
+            return
+        # Spread the first requests instead of starting every user at once
+        self._stop.wait(self._random.uniform(0, self.think_time))
+        while not self._stop.is_set():
+            user.iteration()
+            self._stop.wait(self._random.expovariate(1 / self.think_time) if self.think_time > 0 else 0)
+
+    def _add_users(self, count: int):
+        for _ in range(count):
+            thread = threading.Thread(target=self._user_loop, name=f"vuser-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def ramp(self, users: int, ramp_seconds: float, steps: int, hold_seconds: float = 0.0):
+        steps = max(1, min(steps, users))
+        for step in range(1, steps + 1):
+            self.stats.step = step
+            self._add_users(math.ceil(users * step / steps) - len(self._threads))
+            print(f"Ramp step {step}/{steps}: {len(self._threads)} users", flush=True)
+            if self._stop.wait(ramp_seconds / steps):
+                return
+        if hold_seconds:
+            self._stop.wait(hold_seconds)
+
+    def soak(self, users: int, duration: float):
+        self._add_users(users)
+        self._stop.wait(duration)
+
+    def stop(self, timeout: float = 30):
+        self._stop.set()
+        deadline = monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - monotonic()))
+
+def _format_seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}ms" if value < 1 else f"{value:.2f}s"
+
+def print_report(stats: LoadStats, timeline: List[Dict[str, Any]], users_per_step: Dict[int, int]):
+    print(f"{'operation':<28}{'count':>7}{'errors':>8}{'p50':>10}{'p90':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for operation, histogram in sorted(stats.operations.items()):
+        summary = histogram.summary()
+        print(f"{operation:<28}{summary['count']:>7}{summary['error_rate']:>8.1%}" + "".join(f"{_format_seconds(summary[key]):>10}" for key in ("p50", "p90", "p95", "p99", "max")))
+
+    if len(stats.steps) > 1:
+        print("\nper ramp step (first operation of each user iteration):")
+        for step, table in sorted(stats.steps.items()):
+            for operation in ("hotels", "streamlit_search"):
+                if operation in table:
+                    summary = table[operation].summary()
+                    print(f"  step {step:>3} ({users_per_step.get(step, '?'):>4} users): {operation} p50 {_format_seconds(summary['p50'])}, p95 {_format_seconds(summary['p95'])}, errors {summary['error_rate']:.1%}, n={summary['count']}")
+
+    if timeline:
+        cpu = [sample["cpu_percent"] for sample in timeline]
+        rss = [sample["rss_bytes"] for sample in timeline if sample["rss_bytes"]]
+        print(f"\nCPU: mean {sum(cpu) / len(cpu):.0f}%, peak {max(cpu):.0f}% (100% = one core)")
+        if rss:
+            print(f"RSS: start {rss[0] / 2**20:.0f} MiB, end {rss[-1] / 2**20:.0f} MiB, peak {max(rss) / 2**20:.0f} MiB")
+        print(f"Threads: peak {max(sample['threads'] for sample in timeline)}")
+
+def _prepare_environment(data_dir: Optional[str]):
+    # Keep a load test's searches, prices and indexes out of the real data directory and
+    # switch off background jobs; explicit settings in the environment win
+    os.environ.setdefault("HOTELFINDER_DATA_DIR", data_dir or tempfile.mkdtemp(prefix="hotelfinder-loadtest-"))
+    for name, value in (("HOTELFINDER_PREWARM", "0"), ("HOTELFINDER_PRICE_WATCH", "0"), ("HOTELFINDER_SNAPSHOTS", "0"), ("HOTELFINDER_HOTEL_INDEX", "0")):
+        os.environ.setdefault(name, value)
+    # The provider stubs are patched into this process: jobs handed to a broker would
+    # run on real scrape workers instead, so the broker is always off
+    os.environ["HOTELFINDER_BROKER"] = ""
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulate concurrent HotelFinder users against stubbed providers")
+    parser.add_argument("--target", choices=["http", "streamlit"], default="http")
+    parser.add_argument("--url", help="Load an already running API instead of an in-process one (its providers are not stubbed)")
+    parser.add_argument("--profile", choices=["ramp", "soak"], default="ramp")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--ramp-seconds", type=float, default=120, help="Ramp: time to reach --users")
+    parser.add_argument("--steps", type=int, default=10, help="Ramp: number of load steps")
+    parser.add_argument("--hold-seconds", type=float, default=0, help="Ramp: keep full load this long after the ramp")
+    parser.add_argument("--duration", type=float, default=600, help="Soak: test length in seconds")
+    parser.add_argument("--think-time", type=float, default=5.0, help="Mean pause between a user's searches")
+    parser.add_argument("--recommend-rate", type=float, default=0.3, help="Share of HTTP searches followed by a streamed recommendation")
+    parser.add_argument("--search-log", help="Replay searches from a search_log.jsonl instead of the synthetic mix")
+    parser.add_argument("--booking-latency", type=float, default=2.0, help="Median seconds per stubbed Booking.com page")
+    parser.add_argument("--kayak-latency", type=float, default=4.0, help="Median seconds per stubbed Kayak search")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Share of stubbed provider calls that fail")
+    parser.add_argument("--groq-token-delay", type=float, default=0.02)
+    parser.add_argument("--data-dir", help="HOTELFINDER_DATA_DIR for the test (default: a temporary directory)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="Write histograms and timelines to this JSON file")
+    parser.add_argument("--max-p95", type=float, help="Exit with status 1 if the search p95 exceeds this many seconds")
+    parser.add_argument("--max-error-rate", type=float, help="Exit with status 1 if the search error rate exceeds this")
+    args = parser.parse_args(argv)
+
+    # The application logs every page it merges; only warnings keep the output readable
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    _prepare_environment(args.data_dir)
+
+    if not args.url:
+        ProviderStubs(args.booking_latency, args.kayak_latency, args.error_rate, args.seed).install()
+        StubGroqServer(token_delay=args.groq_token_delay).start()
+
+    mix = QueryMix(args.seed, args.search_log)
+    stats = LoadStats()
+    if args.target == "http":
+        base_url = args.url or start_api_server()
+        make_user = lambda: HttpUser(base_url, mix, stats, args.recommend_rate)
+    else:
+        make_user = lambda: StreamlitUser(mix, stats)
+
+    runner = LoadRunner(make_user, stats, args.think_time)
+    sampler = ResourceSampler(stats, runner.active_users)
+    users_per_step: Dict[int, int] = {}
+    started_at = time()
+    sampler.start()
+    try:
+        if args.profile == "ramp":
+            steps = max(1, min(args.steps, args.users))
+            users_per_step = {step: math.ceil(args.users * step / steps) for step in range(1, steps + 1)}
+            runner.ramp(args.users, args.ramp_seconds, args.steps, args.hold_seconds)
+        else:
+            users_per_step = {0: args.users}
+            runner.soak(args.users, args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        runner.stop()
+        sampler.stop()
+
+    print_report(stats, sampler.timeline, users_per_step)
+    if args.output:
+        report = {
+            "started_at": started_at,
+            "arguments": vars(args),
+            "operations": {operation: histogram.to_dict() for operation, histogram in stats.operations.items()},
+            "steps": {step: {"users": users_per_step.get(step), "operations": {operation: histogram.summary() for operation, histogram in table.items()}} for step, table in stats.steps.items()},
+            "timeline": sampler.timeline,
+        }
+        with open(args.output, "w", encoding="utf-8") as report_file:
+            json.dump(report, report_file, indent=2)
+
+    search = stats.operations.get("hotels") or stats.operations.get("streamlit_search")
+    if search is None:
+        return 1
+    summary = search.summary()
+    if args.max_p95 is not None and (summary["p95"] or 0) > args.max_p95:
+        print(f"FAIL: search p95 {summary['p95']:.2f}s exceeds {args.max_p95}s")
+        return 1
+    if args.max_error_rate is not None and summary["error_rate"] > args.max_error_rate:
+        print(f"FAIL: search error rate {summary['error_rate']:.1%} exceeds {args.max_error_rate:.1%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+import base64
+import json
+import logging
+import re
+from time import sleep, monotonic
+from typing import Dict, List, Any, Optional, Callable, Iterable
+
+# URL patterns of the background calls that fill each provider's result list
+BOOKING_API_PATTERNS = (
+    r"booking\.com/dml/graphql",
+    r"booking\.com/searchresults.*[?&]json=",
+)
+KAYAK_API_PATTERNS = (
+    r"kayak\.[a-z.]+/i/api/search/.*hotel",
+    r"kayak\.[a-z.]+/s/horizon/hotels/.*",
+    r"kayak\.[a-z.]+/h/mobileapis/hotel",
+)
+
+def _matches(url: str, url_patterns: Iterable[str]) -> bool:
+    return any(re.search(pattern, url) for pattern in url_patterns)
+
+def collect_json_responses(driver, url_patterns: Iterable[str], pending: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """
+    Drain the Chrome performance log and read the bodies of finished JSON responses.
+
+    Args:
+        driver: Chrome driver started with network capture enabled
+        url_patterns: Regular expressions the response URL must match
+        pending (dict, optional): requestId -> URL map kept between calls for responses still loading
+
+    Returns:
+        list: Decoded JSON payloads, each as {"url": ..., "payload": ...}
+    """
+    if pending is None:
+        pending = {}
+
+    payloads = []
+    for entry in driver.get_log("performance"):
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+
+        method = message.get("method")
+        params = message.get("params", {})
+
+        if method == "Network.responseReceived":
+            response = params.get("response", {})
+            url = response.get("url", "")
+            mime_type = response.get("mimeType", "")
+            if "json" in mime_type and _matches(url, url_patterns):
+                pending[params["requestId"]] = url
+
+        elif method == "Network.loadingFinished" and params.get("requestId") in pending:
+            request_id = params["requestId"]
+            url = pending.pop(request_id)
+            try:
+                body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+                text = body.get("body", "")
+                if body.get("base64Encoded"):
+                    text = base64.b64decode(text).decode("utf-8", errors="replace")
+                payloads.append({"url": url, "payload": json.loads(text)})
+            except Exception as e:
+                logging.debug(f"Could not read response body for {url}: {str(e)}")
+
+    return payloads
+
+def wait_for_hotels(driver, url_patterns: Iterable[str], parser: Callable[[Any, str], List[Dict[str, Any]]], booking_link: str, timeout: float = 20, poll_interval: float = 0.25, cancel_event=None, payloads: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Poll captured API responses until one of them parses into hotels.
+
+    Args:
+        driver: Chrome driver started with network capture enabled
+        url_patterns: Regular expressions of the provider's result API
+        parser: Function turning a JSON payload into hotel dictionaries
+        booking_link (str): Search URL attached to every hotel
+        timeout (float): Seconds to wait for the first usable response
+        poll_interval (float): Seconds between log drains
+        cancel_event (threading.Event, optional): Stop waiting once set
+        payloads (list, optional): Receives every captured JSON payload (for archiving)
+
+    Returns:
+        list: Hotels from the first responses that contained any, or [] on timeout
+    """
+    pending = {}
+    hotels = []
+    deadline = monotonic() + timeout
+
+    while monotonic() < deadline:
+        if cancel_event is not None and cancel_event.is_set():
+            return hotels
+        for response in collect_json_responses(driver, url_patterns, pending):
+            if payloads is not None:
+                payloads.append(response["payload"])
+            hotels.extend(parser(response["payload"], booking_link))
+        if hotels:
+            return hotels
+        sleep(poll_interval)
+
+    logging.warning(f"No provider API responses with hotels captured within {timeout}s")
+    return hotels
+
+def _dig(obj: Any, *paths: str) -> Any:
+    """Return the first non-empty value found along the given dotted paths."""
+    for path in paths:
+        value = obj
+        for key in path.split("."):
+            if isinstance(value, dict):
+                value = value.get(key)
+            elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+                value = value[int(key)]
+            else:
+                value = None
+                break
+        if value not in (None, "", [], {}):
+            return value
+    return None
+
+def _find_records(obj: Any, marker_keys: Iterable[str]) -> List[Dict[str, Any]]:
+    """Walk a JSON document and return every dict carrying one of the marker keys."""
+    marker_keys = tuple(marker_keys)
+    records = []
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if any(key in node for key in marker_keys):
+                records.append(node)
+                continue
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return records
+
+def _to_float(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = re.search(r"\d[\d,]*(?:\.\d+)?", value)
+        if match:
+            return float(match.group().replace(",", ""))
+    return None
+
+def parse_booking_payload(payload: Any, booking_link: str) -> List[Dict[str, Any]]:
+    """
+    Build hotel dictionaries from a Booking.com search GraphQL response.
+
+    Args:
+        payload: Decoded JSON response body
+        booking_link (str): Search URL attached to every hotel
+
+    Returns:
+        list: Hotels in the same shape booking_com_search returns
+    """
+    hotels = []
+    for record in _find_records(payload, ("basicPropertyData",)):
+        try:
+            name = _dig(record, "displayName.text", "basicPropertyData.name")
+            if not name:
+                continue
+
+            hotel_data = {"name": str(name).strip()}
+
+            price_num = _to_float(_dig(
+                record,
+                "priceDisplayInfoIrene.displayPrice.amountPerStay.amountUnformatted",
+                "priceDisplayInfoIrene.displayPrice.amountPerStay.amount",
+                "blocks.0.finalPrice.amount",
+            ))
+            if price_num is not None:
+                hotel_data['price'] = f"₹{price_num:,.0f}"
+                hotel_data['price_value'] = price_num
+
+            score = _to_float(_dig(record, "basicPropertyData.reviewScore.score", "basicPropertyData.reviews.totalScore"))
+            if score:
+                hotel_data['rating'] = f"Scored {score}"
+                hotel_data['rating_normalized'] = score / 2 if score > 5 else score
+
+            review_count = _dig(record, "basicPropertyData.reviewScore.reviewCount", "basicPropertyData.reviews.reviewsCount")
+            if review_count:
+                hotel_data['review_count'] = int(review_count)
+
+            stars = _dig(record, "basicPropertyData.starRating.value")
+            if stars:
+                hotel_data['stars'] = int(stars)
+
+            area = _dig(record, "location.displayLocation", "basicPropertyData.location.city")
+            if area:
+                hotel_data['location'] = area
+
+            address = _dig(record, "basicPropertyData.location.address")
+            if address:
+                hotel_data['address'] = address
+
+            latitude = _dig(record, "basicPropertyData.location.latitude")
+            longitude = _dig(record, "basicPropertyData.location.longitude")
+            if latitude is not None and longitude is not None:
+                hotel_data['latitude'] = latitude
+                hotel_data['longitude'] = longitude
+
+            hotel_id = _dig(record, "basicPropertyData.id")
+            if hotel_id:
+                hotel_data['hotel_id'] = str(hotel_id)
+
+            hotel_data['source'] = 'Booking.com'
+            hotel_data['booking_link'] = booking_link
+
+            if hotel_data.get('price') or hotel_data.get('rating'):
+                hotels.append(hotel_data)
+        except Exception as e:
+            logging.warning(f"Error processing Booking.com API record: {str(e)}")
+            continue
+
+    return hotels
+
+def parse_kayak_payload(payload: Any, booking_link: str) -> List[Dict[str, Any]]:
+    """
+    Build hotel dictionaries from a Kayak hotel search poll response.
+
+    Args:
+        payload: Decoded JSON response body
+        booking_link (str): Search URL attached to every hotel
+
+    Returns:
+        list: Hotels in the same shape kayak_hotels returns
+    """
+    hotels = []
+    for record in _find_records(payload, ("hotelId", "hotelName")):
+        try:
+            name = _dig(record, "displayName", "hotelName", "name")
+            if not name:
+                continue
+
+            hotel_data = {"name": str(name).strip()}
+
+            price_num = _to_float(_dig(record, "price.price", "priceDisplay", "displayPrice", "price"))
+            if price_num is not None:
+                hotel_data['price'] = f"${price_num:,.0f}/night"
+                hotel_data['price_value'] = price_num
+
+            rating = _to_float(_dig(record, "reviewScore", "rating.score", "userRating"))
+            if rating:
+                label = _dig(record, "ratingLabel", "rating.label") or ""
+                hotel_data['rating'] = f"{rating} {label}".strip()
+                hotel_data['rating_normalized'] = rating / 2 if rating > 5 else rating
+
+            review_count = _dig(record, "reviewCount", "rating.count")
+            if review_count:
+                hotel_data['review_count'] = int(review_count)
+
+            stars = _dig(record, "stars", "starRating")
+            if stars:
+                hotel_data['stars'] = int(_to_float(stars) or 0) or None
+
+            area = _dig(record, "neighborhood", "location.neighborhood", "address.city")
+            if area:
+                hotel_data['location'] = area
+
+            hotel_id = _dig(record, "hotelId", "id")
+            if hotel_id:
+                hotel_data['hotel_id'] = str(hotel_id)
+
+            hotel_data['source'] = 'Kayak'
+            hotel_data['booking_link'] = booking_link
+
+            if hotel_data.get('price') or hotel_data.get('rating'):
+                hotels.append({k: v for k, v in hotel_data.items() if v is not None})
+        except Exception as e:
+            logging.warning(f"Error processing Kayak API record: {str(e)}")
+            continue
+
+    return hotels
+
+def capture_kayak_hotels(url: str, timeout: float = 20, query: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Load a Kayak search page and build hotels from its result API responses.
+
+    Args:
+        url (str): Kayak hotel search URL
+        timeout (float): Seconds to wait for result responses
+        query (dict, optional): Search parameters recorded with the archived payloads
+
+    Returns:
+        list: Hotel dictionaries, or [] if nothing was captured
+    """
+    from chrome_driver import chrome_session
+    from snapshot_archive import archive_snapshot
+
+    try:
+        with chrome_session(capture_network=True, label="kayak") as driver:
+            driver.set_page_load_timeout(30)
+            driver.get(url)
+            payloads = []
+            hotels = wait_for_hotels(driver, KAYAK_API_PATTERNS, parse_kayak_payload, url, timeout=timeout, payloads=payloads)
+        archive_snapshot(payloads, "Kayak", "json", url, query)
+        logging.info(f"Captured {len(hotels)} hotels from Kayak API responses")
+        return hotels
+    except Exception as e:
+        logging.error(f"Kayak network capture error: {str(e)}", exc_info=True)
+        return []
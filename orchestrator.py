@@ -0,0 +1,225 @@
+import os
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from time import monotonic
+from typing import Dict, List, Any, Callable, Optional
+from credentials import submit_with_context
+from provider_guard import get_guard, all_guards, ProviderUnavailable, SearchCancelled
+
+# Set HOTELFINDER_HEDGE=1 to start a second attempt when a provider call runs past its p90
+HEDGE_ENABLED = os.environ.get("HOTELFINDER_HEDGE", "").lower() in ("1", "true", "yes")
+# Hedges may add at most this fraction of extra provider calls
+HEDGE_BUDGET = float(os.environ.get("HOTELFINDER_HEDGE_BUDGET", "0.1"))
+# Latency samples needed before a provider's p90 is trusted for hedging
+HEDGE_MIN_SAMPLES = 20
+
+# A provider call receives a threading.Event that is set when its result is no longer wanted
+ProviderCall = Callable[[threading.Event], List[Dict[str, Any]]]
+
+# Set while the second attempt of a hedged call runs, so a provider can keep it off
+# capacity the first attempt is still using
+_hedge_attempt = contextvars.ContextVar("hedge_attempt", default=False)
+
+# Shared threads for provider calls; each search uses one per provider
+_provider_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="provider")
+# Attempts of hedged calls run on their own threads so a hedging caller never waits on its own pool
+_attempt_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="provider-attempt")
+
+class LatencyTracker:
+    """Latencies of a provider's recent successful calls."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, fraction: float, min_samples: Optional[int] = None) -> Optional[float]:
+        """Return the given percentile (0-1), or None with fewer than min_samples (default HEDGE_MIN_SAMPLES) samples."""
+        if min_samples is None:
+            min_samples = HEDGE_MIN_SAMPLES
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+class HedgeStats:
+    """Hedge budget and counters for one provider."""
+
+    def __init__(self):
+        self.primary_calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.skipped_budget = 0
+        self._lock = threading.Lock()
+
+    def count_primary(self):
+        with self._lock:
+            self.primary_calls += 1
+
+    def try_spend(self, budget: float) -> bool:
+        """Allow a hedge if hedges stay within budget * primary calls (plus one to start)."""
+        with self._lock:
+            if self.hedges + 1 > budget * self.primary_calls + 1:
+                self.skipped_budget += 1
+                return False
+            self.hedges += 1
+            return True
+
+    def count_win(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "primary_calls": self.primary_calls,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "hedge_win_rate": round(self.hedge_wins / self.hedges, 3) if self.hedges else 0.0,
+                "skipped_budget": self.skipped_budget,
+            }
+
+_latencies: Dict[str, LatencyTracker] = {}
+_hedge_stats: Dict[str, HedgeStats] = {}
+_registry_lock = threading.Lock()
+
+def _tracker(provider: str) -> LatencyTracker:
+    with _registry_lock:
+        return _latencies.setdefault(provider, LatencyTracker())
+
+def _stats(provider: str) -> HedgeStats:
+    with _registry_lock:
+        return _hedge_stats.setdefault(provider, HedgeStats())
+
+def is_hedge_attempt() -> bool:
+    """True inside the hedge (second) attempt of a hedged provider call."""
+    return _hedge_attempt.get()
+
+def _guarded_call(provider: str, fn: ProviderCall, cancel_event: threading.Event, block: bool, started: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
+    # Latency is timed from when the guard lets the call through, so time spent
+    # waiting for a rate-limit token or a concurrency slot does not inflate the p90
+    timing = {}
+
+    def timed_call(cancel_event: threading.Event) -> List[Dict[str, Any]]:
+        timing["started"] = monotonic()
+        if started is not None:
+            started.set()
+        return fn(cancel_event)
+
+    try:
+        result = get_guard(provider).call(timed_call, cancel_event, block=block)
+        if result:
+            _tracker(provider).record(monotonic() - timing["started"])
+        return result
+    except ProviderUnavailable as e:
+        logging.warning(f"Skipping {provider}: {str(e)}")
+        return []
+    except SearchCancelled:
+        logging.debug(f"Cancelled {provider} call")
+        return []
+    except Exception as e:
+        logging.error(f"Error getting {provider} results: {str(e)}")
+        return []
+    finally:
+        if started is not None:
+            started.set()
+
+def _hedge_call(provider: str, fn: ProviderCall, cancel_event: threading.Event) -> List[Dict[str, Any]]:
+    _hedge_attempt.set(True)
+    return _guarded_call(provider, fn, cancel_event, False)
+
+def _hedged_call(provider: str, fn: ProviderCall, block: bool) -> List[Dict[str, Any]]:
+    """
+    Run a provider call, starting a second attempt if it outlives the provider's p90.
+
+    The first attempt to return hotels wins and the other is cancelled. Hedges run
+    non-blocking against the rate limiter so they only use spare capacity, and
+    is_hedge_attempt() lets a provider skip the hedge when it has no spare browser.
+    The p90 is counted from when the guard lets the first attempt through.
+    """
+    stats = _stats(provider)
+    stats.count_primary()
+    primary_cancel = threading.Event()
+    primary_started = threading.Event()
+    primary = submit_with_context(_attempt_executor, _guarded_call, provider, fn, primary_cancel, block, primary_started)
+
+    hedge_after = _tracker(provider).percentile(0.9)
+    if hedge_after is None:
+        return primary.result()
+
+    primary_started.wait()
+    done, _ = wait([primary], timeout=hedge_after)
+    if done or not stats.try_spend(HEDGE_BUDGET):
+        return primary.result()
+
+    logging.info(f"{provider} call exceeded p90 ({hedge_after:.1f}s), starting a hedge")
+    hedge_cancel = threading.Event()
+    hedge = submit_with_context(_attempt_executor, _hedge_call, provider, fn, hedge_cancel)
+    attempts = {primary: primary_cancel, hedge: hedge_cancel}
+
+    pending = set(attempts)
+    result = []
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        winner = next((future for future in done if future.result()), None)
+        if winner is not None:
+            result = winner.result()
+            if winner is hedge:
+                stats.count_win()
+            break
+
+    # Cancel whichever attempt is still running
+    for future in pending:
+        attempts[future].set()
+    return result
+
+def run_providers(calls: Dict[str, ProviderCall], block: bool = True, hedge: Optional[bool] = None, cancel_event: Optional[threading.Event] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Run provider searches concurrently, each behind its provider's guard.
+
+    A provider whose circuit is open, or that has no rate-limit capacity left, is
+    skipped immediately instead of spending a browser on a search that will fail.
+
+    Args:
+        calls (dict): Provider name -> function taking a cancel event and returning hotel dictionaries
+        block (bool): Wait for rate-limit capacity; background work passes False
+        hedge (bool, optional): Hedge slow calls (default: HOTELFINDER_HEDGE); calls made
+            with a cancel_event are never hedged
+        cancel_event (threading.Event, optional): Cancels every provider call once set
+
+    Returns:
+        dict: Provider name -> hotels ([] for skipped or failed providers)
+    """
+    if hedge is None:
+        hedge = HEDGE_ENABLED
+
+    if hedge and cancel_event is None:
+        futures = {
+            provider: submit_with_context(_provider_executor, _hedged_call, provider, fn, block)
+            for provider, fn in calls.items()
+        }
+    else:
+        futures = {
+            provider: submit_with_context(_provider_executor, _guarded_call, provider, fn, cancel_event or threading.Event(), block)
+            for provider, fn in calls.items()
+        }
+    return {provider: future.result() for provider, future in futures.items()}
+
+def provider_status() -> Dict[str, Dict[str, Any]]:
+    """Guard state and hedge metrics for every provider used so far."""
+    status = {name: guard.snapshot() for name, guard in all_guards().items()}
+    with _registry_lock:
+        hedge_stats = dict(_hedge_stats)
+        latencies = dict(_latencies)
+    for name, stats in hedge_stats.items():
+        status.setdefault(name, {}).update(stats.snapshot())
+    for name, tracker in latencies.items():
+        status.setdefault(name, {})["p90_latency"] = tracker.percentile(0.9, min_samples=1)
+    return status
@@ -0,0 +1,222 @@
+import os
+import re
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Any, Optional, Tuple
+from bs4 import BeautifulSoup
+
+# Worker processes for HTML parsing and normalization; 0 parses in the calling thread
+PARSE_WORKERS = int(os.environ.get("HOTELFINDER_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Fields shipped back from a parse worker, in tuple order
+COMPACT_FIELDS = ('name', 'price', 'price_value', 'rating', 'rating_normalized')
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+# Caps pages queued for parsing so a burst of searches can't pile up raw HTML in memory
+_inflight = threading.BoundedSemaphore(max(1, PARSE_WORKERS) * 2)
+
+def parse_booking_html(html, url: str) -> List[Dict[str, Any]]:
+    """Extract hotels from a rendered Booking.com result page (str or UTF-8 bytes)."""
+    soup = BeautifulSoup(html, "html.parser")
+    hotels = []
+
+    # Updated selectors for Booking.com's current structure
+    property_cards = soup.select('div[data-testid="property-card"]')
+    if not property_cards:
+        property_cards = soup.select('.sr_property_block')  # Fallback selector
+
+    for item in property_cards:
+        try:
+            hotel_data = {}
+            
+            # Try multiple possible selectors for each field
+            name_element = (
+                item.select_one('div[data-testid="title"]') or 
+                item.select_one('.sr-hotel__name') or
+                item.select_one('span[data-testid="title"]')
+            )
+
+            # Updated price selectors
+            price_element = (
+                item.select_one('[data-testid="price-and-discounted-price"]') or
+                item.select_one('[data-testid="price"]') or
+                item.select_one('.bui-price-display__value') or
+                item.select_one('.prco-valign-middle-helper') or
+                item.select_one('[data-testid="price-primary"]') or
+                item.select_one('.bui-f-color-constructive') or
+                item.select_one('.prco-inline-block-maker-helper') or
+                item.select_one('div[data-testid="price-per-night"]')
+            )
+
+            rating_element = (
+                item.select_one('div[data-testid="review-score"]') or
+                item.select_one('div[data-testid="rating"]') or
+                item.select_one('div[aria-label*="Scored"]') or
+                item.select_one('.bui-review-score__badge') or
+                item.select_one('.review-score-badge')
+            )
+
+            if name_element:
+                hotel_data['name'] = name_element.text.strip()
+
+            if price_element:
+                price_text = price_element.text.strip()
+                # Extract price value more flexibly
+                price_match = re.search(r'[\d,]+', price_text)
+                if price_match:
+                    price_digits = price_match.group().replace(',', '')
+                    try:
+                        price_num = float(price_digits)
+                        price_text = f"₹{price_num:,.0f}"
+                        hotel_data['price'] = price_text
+                    except:
+                        hotel_data['price'] = price_text
+
+            if rating_element:
+                rating_text = rating_element.text.strip()
+                if rating_text:
+                    try:
+                        # Extract numeric rating more flexibly
+                        rating_match = re.search(r'(\d+(?:\.\d+)?)', rating_text)
+                        if rating_match:
+                            rating_num = float(rating_match.group(1))
+                            rating_text = f"Scored {rating_num}"
+                        hotel_data['rating'] = rating_text
+                    except:
+                        hotel_data['rating'] = rating_text
+
+            hotel_data['source'] = 'Booking.com'
+            hotel_data['booking_link'] = url
+
+            if hotel_data.get('name') and (hotel_data.get('price') or hotel_data.get('rating')):
+                hotels.append(hotel_data)
+
+        except Exception as e:
+            logging.warning(f"Error processing hotel item: {str(e)}")
+            continue
+
+    return hotels
+
+def normalize_price(price_str) -> float:
+    """Convert a display price such as "$175/night" to a float for comparison."""
+    if not price_str:
+        return float('inf')
+    try:
+        # Remove currency symbols and convert to float
+        price_text = str(price_str)
+        price = ''.join(c for c in price_text if c.isdigit() or c == '.')
+        return float(price)
+    except (ValueError, TypeError):
+        return float('inf')
+
+def normalize_hotels(hotels: List[Dict[str, Any]], source: str) -> List[Dict[str, Any]]:
+    """
+    Normalize one provider's hotels in place for merging.
+
+    Ratings are mapped to a 5-point scale, prices get a numeric price_value and
+    missing sources are filled in.
+
+    Args:
+        hotels (list): Hotel dictionaries from a single provider
+        source (str): Provider name, e.g. 'Kayak' or 'Booking.com'
+
+    Returns:
+        list: The valid hotel dictionaries
+    """
+    hotels = [h for h in hotels if isinstance(h, dict) and 'name' in h]
+
+    for hotel in hotels:
+        try:
+            if 'rating' in hotel and not hotel.get('rating_normalized'):
+                # Try to extract a numeric rating
+                rating_text = str(hotel['rating'])
+                match = re.search(r"(\d+\.?\d*)", rating_text)
+                if match:
+                    rating_num = float(match.group(1))
+                    # Ratings are usually out of 10 or 5
+                    if rating_num > 5:  # Assume it's out of 10
+                        hotel['rating_normalized'] = rating_num / 2
+                    else:  # Assume it's already out of 5
+                        hotel['rating_normalized'] = rating_num
+                else:
+                    hotel['rating_normalized'] = 3.0  # Default if we can't parse
+        except (ValueError, TypeError) as e:
+            logging.warning(f"Error normalizing {source} rating: {str(e)}")
+            hotel['rating_normalized'] = 3.0  # Default middle rating
+
+        # Add source and normalize prices for consistent comparison
+        if not hotel.get('source'):
+            hotel['source'] = source
+        if 'price' in hotel and not hotel.get('price_value'):
+            hotel['price_value'] = normalize_price(hotel['price'])
+
+    return hotels
+
+def _parse_booking_compact(html: bytes) -> List[Tuple[Any, ...]]:
+    """Parse and normalize a Booking.com page in a worker, returning COMPACT_FIELDS tuples."""
+    hotels = normalize_hotels(parse_booking_html(html, ""), 'Booking.com')
+    return [tuple(hotel.get(field) for field in COMPACT_FIELDS) for hotel in hotels]
+
+def _expand_compact(records: List[Tuple[Any, ...]], source: str, url: str) -> List[Dict[str, Any]]:
+    hotels = []
+    for record in records:
+        hotel = {field: value for field, value in zip(COMPACT_FIELDS, record) if value is not None}
+        hotel['source'] = source
+        hotel['booking_link'] = url
+        hotels.append(hotel)
+    return hotels
+
+def get_parse_executor() -> Optional[ProcessPoolExecutor]:
+    """
+    Return the shared parse process pool, starting it on first use.
+
+    Workers are spawned rather than forked so they only import this module and
+    never inherit the browser threads of the parent process.
+    """
+    global _executor
+    if PARSE_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+def _reset_parse_executor(broken: ProcessPoolExecutor):
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False)
+
+def parse_booking_page(html: str, url: str) -> List[Dict[str, Any]]:
+    """
+    Parse and normalize a rendered Booking.com page off the calling thread.
+
+    The page is sent to the parse process pool as UTF-8 bytes and comes back as
+    compact tuples, so BeautifulSoup and the rating/price regexes run outside this
+    process's GIL. Falls back to parsing inline if the pool is disabled or broken.
+
+    Args:
+        html (str): Page source
+        url (str): Search URL attached to every hotel as booking_link
+
+    Returns:
+        list: Normalized hotel dictionaries
+    """
+    html_bytes = html.encode("utf-8") if isinstance(html, str) else html
+    executor = get_parse_executor()
+
+    if executor is not None:
+        with _inflight:
+            try:
+                records = executor.submit(_parse_booking_compact, html_bytes).result()
+                return _expand_compact(records, 'Booking.com', url)
+            except BrokenProcessPool:
+                logging.warning("Parse process pool broke, restarting it and parsing inline")
+                _reset_parse_executor(executor)
+
+    return _expand_compact(_parse_booking_compact(html_bytes), 'Booking.com', url)
@@ -0,0 +1,155 @@
+import os
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from typing import Dict, Optional
+from credentials import SearchCredentials
+from result_cache import get_result_cache, make_cache_key
+from hotel_search import search_hotels
+
+# Set HOTELFINDER_PREFETCH=1 to start searching while the user is still filling in the form
+PREFETCH_ENABLED = os.environ.get("HOTELFINDER_PREFETCH", "").lower() in ("1", "true", "yes")
+# Seconds the inputs must stay unchanged before a speculative search starts
+PREFETCH_DEBOUNCE = float(os.environ.get("HOTELFINDER_PREFETCH_DEBOUNCE", "1.5"))
+# Global caps on speculative work: searches running at once, and started per minute
+PREFETCH_MAX_CONCURRENT = int(os.environ.get("HOTELFINDER_PREFETCH_MAX_CONCURRENT", "2"))
+PREFETCH_MAX_PER_MINUTE = int(os.environ.get("HOTELFINDER_PREFETCH_MAX_PER_MINUTE", "10"))
+
+class _PrefetchJob:
+    def __init__(self, key, location: str, check_in_date: str, check_out_date: str, num_adults: int, credentials: SearchCredentials):
+        self.key = key
+        self.location = location
+        self.check_in_date = check_in_date
+        self.check_out_date = check_out_date
+        self.num_adults = num_adults
+        self.credentials = credentials
+        self.cancel_event = threading.Event()
+        self.timer: Optional[threading.Timer] = None
+
+    def cancel(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.cancel_event.set()
+
+class SpeculativePrefetcher:
+    """
+    Starts low-priority searches for forms whose inputs have settled.
+
+    Each form session has at most one speculative search: changing the inputs cancels
+    the previous one (pending or running) and schedules a new one after the debounce
+    delay. Searches fill the shared result cache, so a later "Find Hotels" for the
+    same query is a cache hit, or joins the search if it is still running.
+    """
+
+    def __init__(self, debounce: float = PREFETCH_DEBOUNCE, max_concurrent: int = PREFETCH_MAX_CONCURRENT, max_per_minute: int = PREFETCH_MAX_PER_MINUTE):
+        self.debounce = debounce
+        self.max_concurrent = max_concurrent
+        self.max_per_minute = max_per_minute
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="prefetch")
+        self._running = 0
+        self._started = deque()
+        self._sessions: Dict[str, _PrefetchJob] = {}
+        self._lock = threading.Lock()
+        self.stats = {"scheduled": 0, "started": 0, "cancelled": 0, "skipped_cap": 0, "completed": 0}
+
+    def observe(self, session_id: str, location: str, check_in_date: Optional[str], check_out_date: Optional[str], num_adults: int, credentials: Optional[SearchCredentials] = None):
+        """
+        Report the current form inputs of a session.
+
+        Args:
+            session_id (str): Identifies the form (Streamlit session, browser session)
+            location (str): Location typed so far
+            check_in_date (str): Check-in date in YYYY-MM-DD format, if picked
+            check_out_date (str): Check-out date in YYYY-MM-DD format, if picked
+            num_adults (int): Number of adults
+            credentials (SearchCredentials, optional): Keys the real search would use
+        """
+        location = (location or "").strip()
+        complete = len(location) >= 3 and check_in_date and check_out_date
+        key = make_cache_key(location, check_in_date, check_out_date, num_adults) if complete else None
+
+        with self._lock:
+            current = self._sessions.get(session_id)
+            if current is not None and current.key == key:
+                return
+            if current is not None:
+                current.cancel()
+                del self._sessions[session_id]
+                self.stats["cancelled"] += 1
+            if key is None or get_result_cache().contains(key):
+                return
+
+            job = _PrefetchJob(key, location, check_in_date, check_out_date, num_adults, credentials or SearchCredentials.from_env())
+            job.timer = threading.Timer(self.debounce, self._start, args=(session_id, job))
+            job.timer.daemon = True
+            self._sessions[session_id] = job
+            self.stats["scheduled"] += 1
+            job.timer.start()
+
+    def cancel(self, session_id: str):
+        """Cancel any speculative search of a session (e.g. when the form is cleared)."""
+        with self._lock:
+            job = self._sessions.pop(session_id, None)
+            if job is not None:
+                job.cancel()
+                self.stats["cancelled"] += 1
+
+    def _start(self, session_id: str, job: _PrefetchJob):
+        with self._lock:
+            if job.cancel_event.is_set():
+                return
+            if get_result_cache().contains(job.key):
+                self._forget(session_id, job)
+                return
+            now = monotonic()
+            while self._started and now - self._started[0] > 60:
+                self._started.popleft()
+            if self._running >= self.max_concurrent or len(self._started) >= self.max_per_minute:
+                self.stats["skipped_cap"] += 1
+                # Forget the job so the same inputs can be retried once there is room
+                self._forget(session_id, job)
+                return
+            self._running += 1
+            self._started.append(now)
+            self.stats["started"] += 1
+
+        self._executor.submit(self._run, session_id, job)
+
+    def _run(self, session_id: str, job: _PrefetchJob):
+        try:
+            logging.info(f"Speculatively searching {job.location} {job.check_in_date}..{job.check_out_date}")
+            search_hotels(
+                location=job.location,
+                check_in_date=job.check_in_date,
+                check_out_date=job.check_out_date,
+                num_adults=job.num_adults,
+                credentials=job.credentials,
+                background=True,
+                cancel_event=job.cancel_event
+            )
+            with self._lock:
+                self.stats["completed"] += 1
+        except Exception as e:
+            logging.warning(f"Speculative search failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._forget(session_id, job)
+
+    def _forget(self, session_id: str, job: _PrefetchJob):
+        # Caller holds self._lock
+        if self._sessions.get(session_id) is job:
+            del self._sessions[session_id]
+
+_prefetcher: Optional[SpeculativePrefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+def get_prefetcher() -> SpeculativePrefetcher:
+    """Return the process-wide prefetcher, shared by all sessions so the caps are global."""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = SpeculativePrefetcher()
+        return _prefetcher
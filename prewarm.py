@@ -0,0 +1,153 @@
+import os
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import List, Tuple, Optional
+from hotel_search import search_hotels
+from provider_guard import get_guard
+from result_cache import get_result_cache, make_cache_key
+from search_log import top_queries, top_locations
+
+# Set HOTELFINDER_PREWARM=1 to refresh popular searches in the background
+PREWARM_ENABLED = os.environ.get("HOTELFINDER_PREWARM", "").lower() in ("1", "true", "yes")
+# Local hours (start-end, end exclusive, may wrap midnight) in which pre-warming runs
+PREWARM_HOURS = os.environ.get("HOTELFINDER_PREWARM_HOURS", "1-7")
+# Seconds between pre-warm cycles
+PREWARM_INTERVAL = float(os.environ.get("HOTELFINDER_PREWARM_INTERVAL", "1800"))
+# How long pre-warmed results stay fresh, so an off-peak refresh still serves the next peak
+PREWARM_TTL = float(os.environ.get("HOTELFINDER_PREWARM_TTL", str(12 * 3600)))
+# Number of exact (location, dates) queries and of locations x upcoming weekends to keep warm
+PREWARM_TOP_QUERIES = int(os.environ.get("HOTELFINDER_PREWARM_TOP_QUERIES", "30"))
+PREWARM_TOP_LOCATIONS = int(os.environ.get("HOTELFINDER_PREWARM_TOP_LOCATIONS", "10"))
+PREWARM_WEEKENDS = int(os.environ.get("HOTELFINDER_PREWARM_WEEKENDS", "3"))
+
+PrewarmQuery = Tuple[str, str, str, int]
+
+def _parse_hours(hours: str) -> Tuple[int, int]:
+    start, end = hours.split("-")
+    return int(start), int(end)
+
+def in_off_peak_window(now: Optional[datetime] = None, hours: str = PREWARM_HOURS) -> bool:
+    """True if now falls inside the pre-warm window, e.g. "1-7" or "22-5"."""
+    hour = (now or datetime.now()).hour
+    start, end = _parse_hours(hours)
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+def upcoming_weekends(count: int, today: Optional[datetime] = None) -> List[Tuple[str, str]]:
+    """Friday check-in / Sunday check-out date pairs of the next `count` weekends."""
+    today = today or datetime.now()
+    days_to_friday = (4 - today.weekday()) % 7
+    first_friday = today + timedelta(days=days_to_friday)
+    return [
+        ((first_friday + timedelta(weeks=week)).strftime("%Y-%m-%d"), (first_friday + timedelta(weeks=week, days=2)).strftime("%Y-%m-%d"))
+        for week in range(count)
+    ]
+
+def plan_prewarm(top_query_count: int = PREWARM_TOP_QUERIES, top_location_count: int = PREWARM_TOP_LOCATIONS, weekends: int = PREWARM_WEEKENDS) -> List[PrewarmQuery]:
+    """
+    Queries to keep warm, most valuable first.
+
+    The most frequent exact searches from the search log come first, followed by the
+    most searched locations for each of the upcoming weekends (for 2 adults).
+    """
+    plan = []
+    seen = set()
+    candidates = [query for query, _ in top_queries(limit=top_query_count)]
+    candidates += [
+        (location, check_in, check_out, 2)
+        for location, _ in top_locations(limit=top_location_count)
+        for check_in, check_out in upcoming_weekends(weekends)
+    ]
+    for query in candidates:
+        if query not in seen:
+            seen.add(query)
+            plan.append(query)
+    return plan
+
+class PrewarmScheduler:
+    """
+    Background thread refreshing popular searches in the shared result cache.
+
+    During the off-peak window it walks plan_prewarm() and re-runs each search whose
+    cached results are missing or past half their TTL. Searches run as background
+    work, so they are skipped whenever a provider has no spare rate-limit capacity,
+    and a cycle stops early once a provider's circuit opens.
+    """
+
+    def __init__(self, interval: float = PREWARM_INTERVAL, ttl: float = PREWARM_TTL, hours: str = PREWARM_HOURS):
+        self.interval = interval
+        self.ttl = ttl
+        self.hours = hours
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"cycles": 0, "refreshed": 0, "fresh": 0, "incomplete": 0}
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="prewarm", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if in_off_peak_window(hours=self.hours):
+                try:
+                    self.run_cycle()
+                except Exception as e:
+                    logging.error(f"Pre-warm cycle failed: {str(e)}", exc_info=True)
+            self._stop.wait(self.interval)
+
+    def run_cycle(self):
+        """Refresh every planned query that is missing or stale."""
+        cache = get_result_cache()
+        self.stats["cycles"] += 1
+
+        for location, check_in_date, check_out_date, num_adults in plan_prewarm():
+            if self._stop.is_set():
+                return
+            if any(get_guard(provider).is_open() for provider in ("Booking.com", "Kayak")):
+                logging.info("Provider circuit open, ending pre-warm cycle early")
+                return
+
+            key = make_cache_key(location, check_in_date, check_out_date, num_adults)
+            age = cache.age(key)
+            if age is not None and age < self.ttl / 2:
+                self.stats["fresh"] += 1
+                continue
+
+            logging.info(f"Pre-warming {location} {check_in_date}..{check_out_date}")
+            search_hotels(
+                location=location,
+                check_in_date=check_in_date,
+                check_out_date=check_out_date,
+                num_adults=num_adults,
+                background=True,
+                refresh=True,
+                cache_ttl=self.ttl
+            )
+
+            new_age = cache.age(key)
+            if new_age is not None and (age is None or new_age < age):
+                self.stats["refreshed"] += 1
+            else:
+                # A provider was rate limited or failed; the old entry (if any) is kept
+                self.stats["incomplete"] += 1
+
+_scheduler: Optional[PrewarmScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def ensure_prewarm_scheduler() -> Optional[PrewarmScheduler]:
+    """Start the process-wide pre-warm scheduler once, if HOTELFINDER_PREWARM is enabled."""
+    global _scheduler
+    if not PREWARM_ENABLED:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PrewarmScheduler()
+            _scheduler.start()
+        return _scheduler
@@ -0,0 +1,236 @@
+import os
+import math
+import queue
+import atexit
+import logging
+import sqlite3
+import threading
+from time import time, monotonic
+from typing import Dict, List, Any, Optional, Tuple
+from gazetteer import canonical_location_key, normalize_text
+from search_log import DATA_DIR
+
+# Set HOTELFINDER_PRICE_HISTORY=1 to record every scraped hotel observation
+PRICE_HISTORY_ENABLED = os.environ.get("HOTELFINDER_PRICE_HISTORY", "").lower() in ("1", "true", "yes")
+PRICE_HISTORY_PATH = os.environ.get("HOTELFINDER_PRICE_HISTORY_PATH", os.path.join(DATA_DIR, "price_history.sqlite3"))
+# Rows written per transaction, and the longest an observation waits before being written
+WRITE_BATCH_SIZE = 500
+WRITE_INTERVAL = 2.0
+# Observations buffered before new ones are dropped (the request path never blocks on disk)
+MAX_PENDING = 50000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    observed_at REAL NOT NULL,
+    location TEXT NOT NULL,
+    hotel_key TEXT NOT NULL,
+    hotel_name TEXT NOT NULL,
+    source TEXT NOT NULL,
+    check_in_date TEXT NOT NULL,
+    check_out_date TEXT NOT NULL,
+    num_adults INTEGER NOT NULL,
+    price REAL,
+    rating REAL
+);
+CREATE INDEX IF NOT EXISTS idx_observations_hotel ON observations (hotel_key, observed_at);
+CREATE INDEX IF NOT EXISTS idx_observations_location ON observations (location, check_in_date, observed_at);
+"""
+
+_INSERT = "INSERT INTO observations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+Observation = Tuple[float, str, str, str, str, str, str, int, Optional[float], Optional[float]]
+
+def hotel_key(hotel: Dict[str, Any]) -> str:
+    """Stable identity of a hotel within its source: the provider's hotel id, else its normalized name."""
+    source = hotel.get("source", "")
+    if hotel.get("hotel_id"):
+        return f"{source}:{hotel['hotel_id']}"
+    return f"{source}:{normalize_text(hotel.get('name', ''))}"
+
+def _finite(value: Any) -> Optional[float]:
+    # normalize_price gives inf for a missing price; store NULL so MIN/AVG/MAX skip it
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+def _connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    # WAL lets readers query history while the writer appends
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(_SCHEMA)
+    return connection
+
+class PriceHistoryStore:
+    """
+    Append-only SQLite store of every hotel observation returned by a search.
+
+    record() only queues rows; a single writer thread drains the queue and inserts
+    them in batches, one transaction per batch, so searches never wait on disk.
+    """
+
+    def __init__(self, path: str = PRICE_HISTORY_PATH):
+        self.path = path
+        self._queue: "queue.Queue[Observation]" = queue.Queue(maxsize=MAX_PENDING)
+        self._flushed = threading.Condition()
+        self._written = 0
+        self._enqueued = 0
+        self.stats = {"written": 0, "dropped": 0, "batches": 0}
+        self._stats_lock = threading.Lock()
+        # One reader connection per thread, opened once the schema exists
+        self._readers = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._writer = threading.Thread(target=self._write_loop, name="price-history", daemon=True)
+        self._writer.start()
+
+    def record(self, location: str, check_in_date: str, check_out_date: str, num_adults: int, hotels: List[Dict[str, Any]]):
+        """Queue one observation per scraped hotel that has a name (sample data is skipped)."""
+        observed_at = time()
+        location_key = canonical_location_key(location)
+        for hotel in hotels:
+            if not hotel.get("name") or hotel.get("sample"):
+                continue
+            row = (
+                observed_at,
+                location_key,
+                hotel_key(hotel),
+                hotel["name"],
+                hotel.get("source", ""),
+                check_in_date,
+                check_out_date,
+                int(num_adults),
+                _finite(hotel.get("price_value")),
+                _finite(hotel.get("rating_normalized")),
+            )
+            try:
+                self._queue.put_nowait(row)
+                with self._flushed:
+                    self._enqueued += 1
+            except queue.Full:
+                self._count("dropped")
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _write_loop(self):
+        connection = None
+        while True:
+            batch = [self._queue.get()]
+            deadline = monotonic() + WRITE_INTERVAL
+            while len(batch) < WRITE_BATCH_SIZE:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                if connection is None:
+                    connection = _connect(self.path)
+                with connection:
+                    connection.executemany(_INSERT, batch)
+                self._count("written", len(batch))
+                self._count("batches")
+            except (sqlite3.Error, OSError) as e:
+                logging.error(f"Could not write price history: {str(e)}")
+                self._count("dropped", len(batch))
+            with self._flushed:
+                self._written += len(batch)
+                self._flushed.notify_all()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything queued so far has been written (or given up on)."""
+        with self._flushed:
+            target = self._enqueued
+            return self._flushed.wait_for(lambda: self._written >= target, timeout=timeout)
+
+    def _reader(self) -> sqlite3.Connection:
+        # Readers keep a connection per thread; WAL keeps them off the writer's lock.
+        # The schema is created once, so reading before the first write works
+        connection = getattr(self._readers, "connection", None)
+        if connection is None:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    _connect(self.path).close()
+                    self._schema_ready = True
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            self._readers.connection = connection
+        return connection
+
+    def _query(self, sql: str, params: tuple) -> List[sqlite3.Row]:
+        return self._reader().execute(sql, params).fetchall()
+
+    def hotel_history(self, hotel: Dict[str, Any], check_in_date: Optional[str] = None, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Price observations of one hotel, oldest first.
+
+        Args:
+            hotel (dict): A hotel from search results (matched by source and id or name)
+            check_in_date (str, optional): Only observations for this check-in date
+            since (float, optional): Only observations after this Unix timestamp
+
+        Returns:
+            list: Dicts with observed_at, check_in_date, check_out_date, num_adults, price and rating
+        """
+        sql = "SELECT observed_at, check_in_date, check_out_date, num_adults, price, rating FROM observations WHERE hotel_key = ?"
+        params = [hotel_key(hotel)]
+        if check_in_date:
+            sql += " AND check_in_date = ?"
+            params.append(check_in_date)
+        if since is not None:
+            sql += " AND observed_at >= ?"
+            params.append(since)
+        sql += " ORDER BY observed_at"
+        return [dict(row) for row in self._query(sql, tuple(params))]
+
+    def city_price_trend(self, location: str, check_in_date: Optional[str] = None, days: int = 30) -> List[Dict[str, Any]]:
+        """
+        Daily price statistics of a location's observed hotels.
+
+        Args:
+            location (str): Location as searched (resolved through the gazetteer)
+            check_in_date (str, optional): Only stays starting on this date
+            days (int): How many past days to include
+
+        Returns:
+            list: Dicts with day, observations, min_price, avg_price and max_price, oldest first
+        """
+        sql = (
+            "SELECT date(observed_at, 'unixepoch') AS day, COUNT(*) AS observations, "
+            "MIN(price) AS min_price, AVG(price) AS avg_price, MAX(price) AS max_price "
+            "FROM observations WHERE location = ? AND observed_at >= ? AND price IS NOT NULL"
+        )
+        params = [canonical_location_key(location), time() - days * 86400]
+        if check_in_date:
+            sql += " AND check_in_date = ?"
+            params.append(check_in_date)
+        sql += " GROUP BY day ORDER BY day"
+        return [dict(row) for row in self._query(sql, tuple(params))]
+
+_store: Optional[PriceHistoryStore] = None
+_store_lock = threading.Lock()
+
+def get_price_history() -> PriceHistoryStore:
+    """Return the process-wide price history store, starting its writer on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PriceHistoryStore()
+            atexit.register(_store.flush)
+        return _store
+
+def record_observations(location: str, check_in_date: str, check_out_date: str, num_adults: int, hotels: List[Dict[str, Any]]):
+    """Queue a search's hotels for the price history, if enabled. Never raises."""
+    if not PRICE_HISTORY_ENABLED or not hotels:
+        return
+    try:
+        get_price_history().record(location, check_in_date, check_out_date, num_adults, hotels)
+    except Exception as e:
+        logging.warning(f"Could not record price history: {str(e)}")
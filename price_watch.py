@@ -0,0 +1,342 @@
+import os
+import json
+import math
+import heapq
+import uuid
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from time import time
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from hotel_search import search_hotels
+from price_history import hotel_key
+from provider_guard import get_guard
+from result_cache import make_cache_key
+from search_log import DATA_DIR
+
+# Set HOTELFINDER_PRICE_WATCH=1 to re-check watched searches in the background
+PRICE_WATCH_ENABLED = os.environ.get("HOTELFINDER_PRICE_WATCH", "").lower() in ("1", "true", "yes")
+PRICE_WATCH_PATH = os.environ.get("HOTELFINDER_PRICE_WATCH_PATH", os.path.join(DATA_DIR, "price_watches.sqlite3"))
+# Searches the watcher may start per hour, on top of the providers' own background rate limits
+PRICE_WATCH_MAX_CHECKS_PER_HOUR = int(os.environ.get("HOTELFINDER_PRICE_WATCH_MAX_CHECKS_PER_HOUR", "30"))
+# Re-check interval in seconds by days until check-in: (max days, interval), first match wins
+RECHECK_INTERVALS = ((2, 3600), (7, 3 * 3600), (30, 12 * 3600), (None, 24 * 3600))
+# Retry delay when a check was skipped for lack of provider capacity
+RETRY_DELAY = 600
+# Undelivered price-drop events are kept this many seconds
+EVENT_TTL = 7 * 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watches (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    location TEXT NOT NULL,
+    check_in_date TEXT NOT NULL,
+    check_out_date TEXT NOT NULL,
+    num_adults INTEGER NOT NULL,
+    hotel_key TEXT,
+    max_price REAL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS watch_groups (
+    group_key TEXT PRIMARY KEY,
+    prices TEXT NOT NULL,
+    checked_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    event TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_owner ON events (owner, id);
+"""
+
+GroupKey = str
+NotificationHook = Callable[[Dict[str, Any]], None]
+
+def _group_key(location: str, check_in_date: str, check_out_date: str, num_adults: int) -> GroupKey:
+    # Watches on the same (canonical location, dates, adults) share one scrape
+    return json.dumps(make_cache_key(location, check_in_date, check_out_date, num_adults))
+
+def _price(hotel: Dict[str, Any]) -> Optional[float]:
+    # A scraped, finite price; normalize_price gives inf when there is none
+    price = hotel.get("price_value")
+    if hotel.get("sample") or not isinstance(price, (int, float)) or not math.isfinite(price) or price <= 0:
+        return None
+    return float(price)
+
+def _days_until(check_in_date: str) -> int:
+    return (datetime.strptime(check_in_date, "%Y-%m-%d").date() - datetime.now().date()).days
+
+def recheck_interval(check_in_date: str) -> float:
+    """Seconds between checks of a watch group; stays that start sooner are checked more often."""
+    days = _days_until(check_in_date)
+    for max_days, interval in RECHECK_INTERVALS:
+        if max_days is None or days <= max_days:
+            return interval
+    return RECHECK_INTERVALS[-1][1]
+
+class PriceWatcher:
+    """
+    Re-checks watched searches and reports hotels whose price dropped.
+
+    Watches are persisted in SQLite and grouped by (location, dates, adults), so one
+    background search serves every watcher of a group. Groups wait in a heap ordered
+    by when they are due and then by how soon their check-in is. Checks run as
+    background searches, which only use spare provider rate-limit capacity, and
+    are further capped at PRICE_WATCH_MAX_CHECKS_PER_HOUR.
+
+    Price drops are stored as events until their owner collects them with
+    pop_events(), so they survive a restart of the process.
+    """
+
+    def __init__(self, path: str = PRICE_WATCH_PATH, max_checks_per_hour: int = PRICE_WATCH_MAX_CHECKS_PER_HOUR):
+        self.path = path
+        self.max_checks_per_hour = max_checks_per_hour
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # (due_at, check_in_date, group_key); stale heap entries are skipped via _due
+        self._heap: List[Tuple[float, str, GroupKey]] = []
+        self._due: Dict[GroupKey, float] = {}
+        # Groups being checked right now; they are rescheduled when the check ends
+        self._checking: set = set()
+        self._check_times: List[float] = []
+        self._hooks: List[NotificationHook] = []
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"checks": 0, "skipped": 0, "events": 0}
+        self._stats_lock = threading.Lock()
+
+        with self._lock:
+            for row in self._db.execute("SELECT DISTINCT location, check_in_date, check_out_date, num_adults FROM watches"):
+                self._schedule(_group_key(*row), row["check_in_date"], time())
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def add_hook(self, hook: NotificationHook):
+        """Call hook(event) for every price drop; hooks run on the watcher thread and must be quick."""
+        self._hooks.append(hook)
+
+    def add_watch(self, owner: str, location: str, check_in_date: str, check_out_date: str, num_adults: int = 2, hotel: Optional[Dict[str, Any]] = None, max_price: Optional[float] = None) -> str:
+        """
+        Watch a search for price drops.
+
+        Args:
+            owner (str): Who is notified, e.g. a session id; passed through in events
+            location, check_in_date, check_out_date, num_adults: The search to watch
+            hotel (dict, optional): Only watch this hotel from the search results
+            max_price (float, optional): Only report prices at or below this
+
+        Returns:
+            str: The watch id
+        """
+        if _days_until(check_in_date) < 0:
+            raise ValueError("Cannot watch a stay that has already started")
+
+        watch_id = uuid.uuid4().hex
+        group_key = _group_key(location, check_in_date, check_out_date, num_adults)
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "INSERT INTO watches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (watch_id, owner, location, check_in_date, check_out_date, int(num_adults), hotel_key(hotel) if hotel else None, max_price, time())
+                )
+            if group_key not in self._due and group_key not in self._checking:
+                # A new group gets its baseline prices right away
+                self._schedule(group_key, check_in_date, time())
+            self._wakeup.notify()
+        return watch_id
+
+    def remove_watch(self, watch_id: str, owner: Optional[str] = None) -> bool:
+        with self._lock, self._db:
+            sql, params = "DELETE FROM watches WHERE id = ?", [watch_id]
+            if owner is not None:
+                sql += " AND owner = ?"
+                params.append(owner)
+            return self._db.execute(sql, params).rowcount > 0
+
+    def list_watches(self, owner: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(row) for row in self._db.execute("SELECT * FROM watches WHERE owner = ? ORDER BY created_at", (owner,))]
+
+    def has_owner(self, owner: str) -> bool:
+        """True if owner has watches or undelivered events."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM watches WHERE owner = ? UNION ALL SELECT 1 FROM events WHERE owner = ? LIMIT 1", (owner, owner)
+            ).fetchone() is not None
+
+    def pop_events(self, owner: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return and delete owner's undelivered price-drop events, oldest first."""
+        with self._lock, self._db:
+            rows = self._db.execute("SELECT id, event FROM events WHERE owner = ? ORDER BY id LIMIT ?", (owner, limit)).fetchall()
+            self._db.executemany("DELETE FROM events WHERE id = ?", [(row["id"],) for row in rows])
+        return [json.loads(row["event"]) for row in rows]
+
+    def _schedule(self, group_key: GroupKey, check_in_date: str, due_at: float):
+        self._due[group_key] = due_at
+        heapq.heappush(self._heap, (due_at, check_in_date, group_key))
+
+    def _within_budget(self) -> bool:
+        hour_ago = time() - 3600
+        self._check_times = [started for started in self._check_times if started > hour_ago]
+        return len(self._check_times) < self.max_checks_per_hour
+
+    def _next_group(self) -> Optional[GroupKey]:
+        """Pop the next due group, or None if nothing is due yet (waits up to a minute)."""
+        with self._lock:
+            while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                self._wakeup.wait(60)
+                return None
+            due_at, _, group_key = self._heap[0]
+            if due_at > time():
+                self._wakeup.wait(min(due_at - time(), 60))
+                return None
+            if not self._within_budget():
+                self._wakeup.wait(60)
+                return None
+            heapq.heappop(self._heap)
+            del self._due[group_key]
+            self._checking.add(group_key)
+            self._check_times.append(time())
+            return group_key
+
+    def _group_watches(self, group_key: GroupKey) -> List[Dict[str, Any]]:
+        # Called with self._lock held
+        _, check_in_date, check_out_date, num_adults = json.loads(group_key)
+        return [dict(row) for row in self._db.execute(
+            "SELECT * FROM watches WHERE check_in_date = ? AND check_out_date = ? AND num_adults = ?",
+            (check_in_date, check_out_date, num_adults)
+        ) if _group_key(row["location"], row["check_in_date"], row["check_out_date"], row["num_adults"]) == group_key]
+
+    def check_group(self, group_key: GroupKey):
+        """Search a watch group once, notify its watchers of drops and schedule the next check."""
+        location_key, check_in_date, check_out_date, num_adults = json.loads(group_key)
+        with self._lock:
+            watches = self._group_watches(group_key)
+            previous = self._db.execute("SELECT prices FROM watch_groups WHERE group_key = ?", (group_key,)).fetchone()
+
+        if not watches or _days_until(check_in_date) < 0:
+            # Nobody watches this group anymore, or the stay has started
+            with self._lock:
+                with self._db:
+                    self._db.execute("DELETE FROM watch_groups WHERE group_key = ?", (group_key,))
+                    self._db.executemany("DELETE FROM watches WHERE id = ?", [(watch["id"],) for watch in watches])
+                if self._group_watches(group_key) and _days_until(check_in_date) >= 0:
+                    # Watched again while this check ran
+                    self._schedule(group_key, check_in_date, time())
+            return
+
+        if any(get_guard(provider).is_open() for provider in ("Booking.com", "Kayak")):
+            self._count("skipped")
+            with self._lock:
+                self._schedule(group_key, check_in_date, time() + RETRY_DELAY)
+            return
+
+        self._count("checks")
+        hotels = search_hotels(
+            location=watches[0]["location"],
+            check_in_date=check_in_date,
+            check_out_date=check_out_date,
+            num_adults=num_adults,
+            background=True,
+            refresh=True
+        )
+
+        # Hotels without a price (or sample data) are left out: an unknown price
+        # followed by a real one is not a drop
+        old_prices = {key: price for key, price in (json.loads(previous["prices"]) if previous else {}).items() if isinstance(price, (int, float)) and math.isfinite(price)}
+        new_prices = dict(old_prices)
+        hotels_by_key = {}
+        for hotel in hotels:
+            price = _price(hotel)
+            if price is not None:
+                key = hotel_key(hotel)
+                hotels_by_key[key] = hotel
+                new_prices[key] = price
+
+        if previous is not None:
+            for key, hotel in hotels_by_key.items():
+                new_price = new_prices[key]
+                old_price = old_prices.get(key)
+                if old_price is None or new_price >= old_price:
+                    continue
+                for watch in watches:
+                    if watch["hotel_key"] not in (None, key):
+                        continue
+                    if watch["max_price"] is not None and new_price > watch["max_price"]:
+                        continue
+                    self._notify({
+                        "watch_id": watch["id"],
+                        "owner": watch["owner"],
+                        "location": watch["location"],
+                        "check_in_date": check_in_date,
+                        "check_out_date": check_out_date,
+                        "hotel": hotel.get("name"),
+                        "source": hotel.get("source"),
+                        "old_price": old_price,
+                        "new_price": new_price,
+                        "booking_link": hotel.get("booking_link"),
+                    })
+
+        # Without results (no spare provider capacity) keep the baseline and retry soon
+        next_check = recheck_interval(check_in_date) if hotels_by_key else RETRY_DELAY
+        with self._lock:
+            with self._db:
+                if hotels_by_key:
+                    self._db.execute("INSERT OR REPLACE INTO watch_groups VALUES (?, ?, ?)", (group_key, json.dumps(new_prices), time()))
+                self._db.execute("DELETE FROM events WHERE created_at < ?", (time() - EVENT_TTL,))
+            self._schedule(group_key, check_in_date, time() + next_check)
+
+    def _notify(self, event: Dict[str, Any]):
+        self._count("events")
+        logging.info(f"Price drop for watch {event['watch_id']}: {event['hotel']} {event['old_price']} -> {event['new_price']}")
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO events (owner, created_at, event) VALUES (?, ?, ?)", (event["owner"], time(), json.dumps(event)))
+        for hook in self._hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                logging.error(f"Price watch hook failed: {str(e)}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="price-watch", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            group_key = self._next_group()
+            if group_key is None:
+                continue
+            try:
+                self.check_group(group_key)
+            except Exception as e:
+                logging.error(f"Price watch check failed: {str(e)}", exc_info=True)
+                with self._lock:
+                    self._schedule(group_key, json.loads(group_key)[1], time() + RETRY_DELAY)
+            finally:
+                with self._lock:
+                    self._checking.discard(group_key)
+
+_watcher: Optional[PriceWatcher] = None
+_watcher_lock = threading.Lock()
+
+def get_price_watcher() -> PriceWatcher:
+    """Return the process-wide price watcher, starting its thread if HOTELFINDER_PRICE_WATCH is enabled."""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = PriceWatcher()
+            if PRICE_WATCH_ENABLED:
+                _watcher.start()
+        return _watcher
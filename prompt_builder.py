@@ -0,0 +1,211 @@
+import os
+import re
+import math
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple
+
+# Tokens the hotel table of a recommendation prompt may use
+PROMPT_TOKEN_BUDGET = int(os.environ.get("HOTELFINDER_PROMPT_TOKEN_BUDGET", "600"))
+# Upper bound on hotels in one prompt, whatever the budget
+PROMPT_MAX_CANDIDATES = int(os.environ.get("HOTELFINDER_PROMPT_MAX_CANDIDATES", "20"))
+# Longest hotel name / area kept in a table row
+_MAX_FIELD_CHARS = 40
+
+# Budget words -> preferred position in the search's price range (0 = cheapest, 1 = dearest)
+_BUDGET_TARGETS = {"budget": 0.0, "cheap": 0.0, "low": 0.0, "moderate": 0.4, "medium": 0.4, "mid": 0.4, "high": 0.8, "luxury": 1.0}
+_SOURCE_CODES = {"Booking.com": "B", "Kayak": "K"}
+
+# About 4 characters per token for English text with LLaMA-style tokenizers
+_CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a text."""
+    return math.ceil(len(text) / _CHARS_PER_TOKEN)
+
+def _budget_limit(budget: Any) -> Optional[float]:
+    if isinstance(budget, (int, float)):
+        return float(budget)
+    match = re.search(r"\d+(?:\.\d+)?", str(budget or ""))
+    return float(match.group(0)) if match else None
+
+def _price(hotel: Dict[str, Any]) -> Optional[float]:
+    # normalize_price gives inf for a missing price
+    price = hotel.get("price_value")
+    if isinstance(price, (int, float)) and math.isfinite(price) and price > 0:
+        return float(price)
+    return None
+
+def score_hotels(hotels: List[Dict[str, Any]], preferences: Dict[str, Any]) -> List[Tuple[float, Dict[str, Any]]]:
+    """
+    Score every candidate against the user's budget and priorities, best first.
+
+    Each hotel gets 0..1 components for rating, price fit (a numeric budget is a soft
+    cap; a budget word is a target position in this search's price range), value
+    (rating per price), stars and area information. A hotel without a price gets
+    neutral price and value scores. Priorities weight the components, and a
+    preference-match distance from the hotel index is a bonus.
+    """
+    budget = preferences.get("budget", "moderate")
+    priorities = " ".join(preferences.get("priorities", ["Value for money", "Location", "Amenities"])).lower()
+    limit = _budget_limit(budget)
+    if limit is not None and limit <= 0:
+        limit = None
+    target = _BUDGET_TARGETS.get(str(budget).lower().strip(), 0.4)
+
+    prices = sorted(price for price in map(_price, hotels) if price is not None)
+    low, high = (prices[0], prices[-1]) if prices else (0.0, 0.0)
+
+    weights = {"rating": 1.0, "price": 1.0, "value": 0.5, "stars": 0.3, "area": 0.2}
+    if "value" in priorities or "price" in priorities or "cheap" in priorities:
+        weights["value"] += 1.0
+        weights["price"] += 0.5
+    if "location" in priorities or "near" in priorities or "central" in priorities:
+        weights["area"] += 1.0
+    if "amenit" in priorities or "luxury" in priorities or "star" in priorities:
+        weights["stars"] += 1.0
+    if "rating" in priorities or "review" in priorities or "quality" in priorities:
+        weights["rating"] += 1.0
+
+    scored = []
+    for hotel in hotels:
+        rating = min((hotel.get("rating_normalized") or 0) / 5, 1.0)
+        price = _price(hotel)
+        if price is None:
+            price_fit = 0.5
+            value = rating * 0.5
+        elif limit is not None:
+            price_fit = 1.0 if price <= limit else max(0.0, 1 - (price - limit) / limit)
+            value = rating * (low / price)
+        else:
+            position = (price - low) / (high - low) if high > low else 0.5
+            price_fit = 1 - abs(position - target)
+            value = rating * (low / price)
+        stars_match = re.search(r"\d", str(hotel.get("stars") or ""))
+        stars = int(stars_match.group(0)) / 5 if stars_match else 0.0
+        area = 1.0 if hotel.get("location") or hotel.get("address") else 0.0
+
+        score = (
+            weights["rating"] * rating
+            + weights["price"] * price_fit
+            + weights["value"] * value
+            + weights["stars"] * stars
+            + weights["area"] * area
+        )
+        if hotel.get("match_distance") is not None:
+            # Cosine distance from the preference query: 0 is a perfect match
+            score += 1.5 * max(0.0, 1 - hotel["match_distance"])
+        scored.append((score, hotel))
+
+    scored.sort(key=lambda item: -item[0])
+    return scored
+
+def _cell(value: Any) -> str:
+    text = re.sub(r"\s+", " ", str(value or "-")).replace("|", "/").strip()
+    return text if len(text) <= _MAX_FIELD_CHARS else text[:_MAX_FIELD_CHARS - 1] + "…"
+
+def format_hotel_row(index: int, hotel: Dict[str, Any]) -> str:
+    rating = hotel.get("rating_normalized")
+    return "|".join([
+        str(index),
+        _cell(hotel.get("name")),
+        _cell(hotel.get("price")),
+        f"{rating:.1f}" if isinstance(rating, (int, float)) else "-",
+        _cell(hotel.get("stars")),
+        _cell(hotel.get("location") or hotel.get("address")),
+        _SOURCE_CODES.get(hotel.get("source"), _cell(hotel.get("source"))),
+    ])
+
+HOTEL_TABLE_HEADER = "#|name|price|rating/5|stars|area|src (B=Booking.com, K=Kayak)"
+
+def pack_hotel_table(hotels: List[Dict[str, Any]], preferences: Dict[str, Any], token_budget: int = PROMPT_TOKEN_BUDGET, max_candidates: int = PROMPT_MAX_CANDIDATES) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Build the compact hotel table of a recommendation prompt.
+
+    Candidates are scored locally and added best first while the table stays within
+    token_budget, so a larger budget simply lets more of the ranking through. The
+    best candidate is included even if the budget is too small for it.
+
+    Returns:
+        tuple: (table text, hotels included in row order)
+    """
+    lines = [HOTEL_TABLE_HEADER]
+    # Characters of the table so far: estimating the whole table, not row by row,
+    # keeps per-row rounding from wasting the budget
+    length = len(HOTEL_TABLE_HEADER)
+    included = []
+    for _, hotel in score_hotels(hotels, preferences):
+        if len(included) >= max_candidates:
+            break
+        row = format_hotel_row(len(included) + 1, hotel)
+        if math.ceil((length + 1 + len(row)) / _CHARS_PER_TOKEN) > token_budget and included:
+            break
+        lines.append(row)
+        length += 1 + len(row)
+        included.append(hotel)
+    return "\n".join(lines), included
+
+def build_recommendation_prompt(hotels: List[Dict[str, Any]], preferences: Dict[str, Any], token_budget: int = PROMPT_TOKEN_BUDGET) -> Tuple[str, int]:
+    """
+    Build the personalized recommendation prompt.
+
+    Returns:
+        tuple: (prompt, number of hotels included)
+    """
+    table, included = pack_hotel_table(hotels, preferences, token_budget)
+    budget = preferences.get("budget", "moderate")
+    priorities_text = ", ".join(preferences.get("priorities", ["Value for money", "Location", "Amenities"]))
+
+    prompt = f"""You are an expert hotel concierge. Recommend hotels for this user.
+
+HOTELS (best local match first):
+{table}
+
+USER PREFERENCES:
+- Budget: {budget}
+- Priorities: {priorities_text}
+
+Recommend the best hotel for this user with a brief explanation (2-3 sentences) of why it
+matches their preferences, then suggest a second option as an alternative. Refer to hotels
+by name. Keep your response under 150 words total."""
+    return prompt, len(included)
+
+class TokenUsage:
+    """Per-call token accounting of LLM prompts (estimated and, when reported, actual)."""
+
+    def __init__(self, keep: int = 500):
+        self._calls = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, estimated_prompt_tokens: int, candidates: int = 0, prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None):
+        call = {
+            "kind": kind,
+            "estimated_prompt_tokens": estimated_prompt_tokens,
+            "candidates": candidates,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        }
+        with self._lock:
+            self._calls.append(call)
+        logging.info(f"LLM {kind}: ~{estimated_prompt_tokens} prompt tokens estimated, {prompt_tokens} reported, {completion_tokens} completion, {candidates} hotels")
+
+    def summary(self) -> Dict[str, Any]:
+        """Call count and mean token counts per kind of call."""
+        with self._lock:
+            calls = list(self._calls)
+        summary = {}
+        for kind in sorted({call["kind"] for call in calls}):
+            kind_calls = [call for call in calls if call["kind"] == kind]
+            entry = {"calls": len(kind_calls)}
+            for field in ("estimated_prompt_tokens", "prompt_tokens", "completion_tokens", "candidates"):
+                values = [call[field] for call in kind_calls if call[field] is not None]
+                entry[f"mean_{field}"] = sum(values) / len(values) if values else None
+            summary[kind] = entry
+        return summary
+
+_token_usage = TokenUsage()
+
+def get_token_usage() -> TokenUsage:
+    """Return the process-wide token accounting."""
+    return _token_usage
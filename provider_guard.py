@@ -0,0 +1,265 @@
+import logging
+import threading
+from collections import deque
+from time import monotonic, sleep
+from typing import Dict, Any, Callable, Optional
+
+class ProviderUnavailable(Exception):
+    """Raised instead of calling a provider that is rate limited or whose circuit is open."""
+
+class SearchCancelled(Exception):
+    """Raised inside a provider call that was cancelled, e.g. the losing side of a hedge."""
+
+# Per-provider limits; target_latency is the latency above which a call counts as slow
+PROVIDER_LIMITS = {
+    "Booking.com": {"rate": 0.5, "burst": 3, "max_concurrency": 4, "target_latency": 45.0},
+    "Kayak": {"rate": 1.0, "burst": 5, "max_concurrency": 8, "target_latency": 15.0},
+}
+DEFAULT_LIMITS = {"rate": 1.0, "burst": 5, "max_concurrency": 4, "target_latency": 30.0}
+
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` calls per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available right now."""
+        with self._lock:
+            self._refill(monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for a token."""
+        deadline = monotonic() + timeout
+        while True:
+            with self._lock:
+                now = monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate if self.rate > 0 else timeout
+            if now + wait > deadline:
+                return False
+            sleep(wait)
+
+class CircuitBreaker:
+    """
+    Circuit breaker over a rolling window of call outcomes.
+
+    The circuit opens when the failure or slow-call rate of the last `window` calls
+    exceeds its threshold, rejects calls for `open_seconds`, then lets a single
+    half-open probe through: success closes the circuit, failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window: int = 20, min_calls: int = 5, failure_threshold: float = 0.5, slow_threshold: float = 0.8, slow_call_seconds: float = 30.0, open_seconds: float = 60.0):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.slow_threshold = slow_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a call may go ahead now."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record(self, success: bool, latency: float):
+        """Record the outcome of a call let through by allow()."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+                if success and latency <= self.slow_call_seconds:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._trip()
+                return
+
+            self._outcomes.append((success, latency > self.slow_call_seconds))
+            if len(self._outcomes) < self.min_calls:
+                return
+            failures = sum(1 for ok, _ in self._outcomes if not ok)
+            slow = sum(1 for _, is_slow in self._outcomes if is_slow)
+            if failures / len(self._outcomes) >= self.failure_threshold or slow / len(self._outcomes) >= self.slow_threshold:
+                self._trip()
+
+    def release_probe(self):
+        """Give back a half-open probe slot that was allowed but never used."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _trip(self):
+        self.state = self.OPEN
+        self._opened_at = monotonic()
+        self._outcomes.clear()
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit adjusted by AIMD on observed latency.
+
+    Every call that succeeds within target_latency raises the limit by 1/limit
+    (about +1 per round of calls); a failure or a slow call halves it.
+    """
+
+    def __init__(self, max_limit: int, target_latency: float, min_limit: int = 1):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float]) -> bool:
+        """Wait up to timeout seconds (None: forever) for a free slot."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.in_flight < int(self.limit), timeout=timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, success: Optional[bool], latency: float):
+        """Free a slot and adjust the limit from the call's outcome (None: leave it unchanged)."""
+        with self._cond:
+            self.in_flight -= 1
+            if success is None:
+                pass
+            elif success and latency <= self.target_latency:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(self.min_limit, self.limit / 2)
+            self._cond.notify_all()
+
+class ProviderGuard:
+    """Rate limiter, circuit breaker and adaptive concurrency limit for one provider."""
+
+    def __init__(self, name: str, rate: float, burst: float, max_concurrency: int, target_latency: float):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(slow_call_seconds=target_latency)
+        self.limiter = AdaptiveLimiter(max_concurrency, target_latency)
+        self.stats = {"calls": 0, "failures": 0, "rejected": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def is_open(self) -> bool:
+        return self.breaker.state == CircuitBreaker.OPEN
+
+    def call(self, fn: Callable, *args, block: bool = True, wait_timeout: float = 30.0, is_failure: Optional[Callable[[Any], bool]] = None, **kwargs):
+        """
+        Call a provider function under this guard.
+
+        Args:
+            fn: Provider function
+            block (bool): Wait for a rate-limit token and a concurrency slot; background
+                work passes False so it only runs on spare capacity
+            wait_timeout (float): Longest wait for a token and a slot when blocking
+            is_failure: Classifies a result as a failure; by default an empty result
+                counts as one, since a blocked scrape returns []
+
+        Returns:
+            The provider function's result
+
+        Raises:
+            ProviderUnavailable: The circuit is open, or no capacity was available in time
+        """
+        if is_failure is None:
+            is_failure = lambda result: not result
+
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise ProviderUnavailable(f"{self.name} circuit is open")
+
+        acquired = self.bucket.acquire(wait_timeout) if block else self.bucket.try_acquire()
+        if acquired:
+            acquired = self.limiter.acquire(wait_timeout if block else 0)
+        if not acquired:
+            self.breaker.release_probe()
+            self._count("rejected")
+            raise ProviderUnavailable(f"{self.name} is rate limited")
+
+        self._count("calls")
+        started = monotonic()
+        success = False
+        try:
+            result = fn(*args, **kwargs)
+            success = not is_failure(result)
+            return result
+        except SearchCancelled:
+            # A cancelled call says nothing about the provider's health
+            success = None
+            raise
+        finally:
+            latency = monotonic() - started
+            self.limiter.release(success, latency)
+            if success is None:
+                self.breaker.release_probe()
+            else:
+                if not success:
+                    self._count("failures")
+                was_open = self.is_open()
+                self.breaker.record(success, latency)
+                if not was_open and self.is_open():
+                    logging.warning(f"{self.name} circuit opened after {'a failed' if not success else 'a slow'} call ({latency:.1f}s)")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state for logging and monitoring."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats.update({
+            "state": self.breaker.state,
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+        })
+        return stats
+
+_guards: Dict[str, ProviderGuard] = {}
+_guards_lock = threading.Lock()
+
+def get_guard(provider: str) -> ProviderGuard:
+    """Return the process-wide guard for a provider, creating it on first use."""
+    with _guards_lock:
+        guard = _guards.get(provider)
+        if guard is None:
+            guard = ProviderGuard(provider, **PROVIDER_LIMITS.get(provider, DEFAULT_LIMITS))
+            _guards[provider] = guard
+        return guard
+
+def all_guards() -> Dict[str, ProviderGuard]:
+    """Return the guards created so far, keyed by provider."""
+    with _guards_lock:
+        return dict(_guards)
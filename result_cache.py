@@ -0,0 +1,150 @@
+import os
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Dict, List, Any, Optional, Callable, Tuple
+from gazetteer import canonical_location_key
+
+# Seconds a cached search result stays fresh
+CACHE_TTL = float(os.environ.get("HOTELFINDER_CACHE_TTL", "900"))
+# Searches kept in memory before the least recently used is evicted
+CACHE_MAX_ENTRIES = int(os.environ.get("HOTELFINDER_CACHE_MAX_ENTRIES", "256"))
+
+CacheKey = Tuple[str, str, str, int]
+
+def make_cache_key(location: str, check_in_date: str, check_out_date: str, num_adults: int) -> CacheKey:
+    """Build the cache key of a search; every spelling of a known place ("NYC", "new york") shares one key."""
+    return (canonical_location_key(location), check_in_date, check_out_date, int(num_adults))
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.results: Optional[List[Dict[str, Any]]] = None
+        self.cursor: Optional[Dict[str, Any]] = None
+
+class ResultCache:
+    """
+    In-process TTL + LRU cache of merged search results.
+
+    Concurrent lookups of a key that is already being searched (for example by a
+    speculative prefetch) wait for that search instead of starting another one.
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (stored_at, results, cursor, ttl)
+        self._entries: "OrderedDict[CacheKey, Tuple[float, List[Dict[str, Any]], Optional[Dict[str, Any]], float]]" = OrderedDict()
+        self._in_flight: Dict[CacheKey, _InFlight] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "joined": 0}
+
+    @staticmethod
+    def _copy(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Callers annotate hotels in place (e.g. the UI's rating_num), so never hand out the cached dicts
+        return [dict(hotel) for hotel in results]
+
+    def _lookup(self, key: CacheKey):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, results, cursor, ttl = entry
+        if monotonic() - stored_at > ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: CacheKey) -> Optional[List[Dict[str, Any]]]:
+        """Return a copy of the fresh results for key, or None."""
+        with self._lock:
+            entry = self._lookup(key)
+        return self._copy(entry[1]) if entry else None
+
+    def contains(self, key: CacheKey) -> bool:
+        """True if key has fresh results or is being searched right now."""
+        with self._lock:
+            return self._lookup(key) is not None or key in self._in_flight
+
+    def age(self, key: CacheKey) -> Optional[float]:
+        """Seconds since key was stored, or None if it is not cached."""
+        with self._lock:
+            entry = self._lookup(key)
+        return monotonic() - entry[0] if entry else None
+
+    def put(self, key: CacheKey, results: List[Dict[str, Any]], cursor: Optional[Dict[str, Any]] = None, ttl: Optional[float] = None):
+        """Store results (and the pagination cursor they left behind) under key, fresh for ttl seconds (default: the cache TTL)."""
+        with self._lock:
+            self._entries[key] = (monotonic(), self._copy(results), dict(cursor) if cursor else None, ttl if ttl is not None else self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: CacheKey, compute: Callable[[Optional[Dict[str, Any]]], List[Dict[str, Any]]], cursor: Optional[Dict[str, Any]] = None, store: Callable[[List[Dict[str, Any]]], bool] = bool, refresh: bool = False, ttl: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Return cached results for key, joining or running the search on a miss.
+
+        Args:
+            key: Cache key from make_cache_key()
+            compute: Runs the search; receives a cursor to advance
+            cursor (dict, optional): Caller's pagination cursor, updated from the cached or computed search
+            store: Decides whether computed results are cached (default: only non-empty results)
+            refresh (bool): Ignore a cached entry and search again (a running search is still joined)
+            ttl (float, optional): Freshness of the stored results (default: the cache TTL)
+
+        Returns:
+            list: A private copy of the results
+        """
+        while True:
+            with self._lock:
+                entry = None if refresh else self._lookup(key)
+                if entry is not None:
+                    self.stats["hits"] += 1
+                    if cursor is not None and entry[2]:
+                        cursor.update(entry[2])
+                    return self._copy(entry[1])
+
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    in_flight = _InFlight()
+                    self._in_flight[key] = in_flight
+                    owner = True
+                    self.stats["misses"] += 1
+                else:
+                    owner = False
+                    self.stats["joined"] += 1
+
+            if not owner:
+                in_flight.done.wait()
+                if in_flight.results is None:
+                    # The search we joined was cancelled or failed; run our own
+                    continue
+                if cursor is not None and in_flight.cursor:
+                    cursor.update(in_flight.cursor)
+                return self._copy(in_flight.results)
+
+            search_cursor = dict(cursor) if cursor is not None else {"next_offset": 0, "exhausted": False}
+            try:
+                results = compute(search_cursor)
+                if store(results):
+                    self.put(key, results, search_cursor, ttl=ttl)
+                    in_flight.results = results
+                    in_flight.cursor = search_cursor
+                if cursor is not None:
+                    cursor.update(search_cursor)
+                return self._copy(results)
+            finally:
+                with self._lock:
+                    self._in_flight.pop(key, None)
+                in_flight.done.set()
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+def get_result_cache() -> ResultCache:
+    """Return the process-wide result cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
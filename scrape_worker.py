@@ -0,0 +1,137 @@
+import os
+import signal
+import socket
+import logging
+import threading
+from typing import Callable, Dict, List, Any, Optional
+from dotenv import load_dotenv
+from chrome_driver import get_browser_pool, BROWSER_POOL_SIZE
+from chrome_watchdog import collect_browser_usage
+from job_queue import Broker, Job, SCRAPE_QUEUE, VISIBILITY_TIMEOUT, BROKER_URL, create_broker
+
+# Jobs run at once per worker process: one per pooled browser. Run more worker
+# processes (or hosts) to scale out further.
+WORKER_CONCURRENCY = BROWSER_POOL_SIZE
+# Seconds an idle worker waits before polling the queue again
+IDLE_POLL_INTERVAL = 0.5
+
+def _booking_page(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    from hotel_search import _generate_booking_url, _scrape_booking_page
+
+    query = {field: payload[field] for field in ("location", "check_in_date", "check_out_date", "num_adults", "offset")}
+    url = _generate_booking_url(query["location"], query["check_in_date"], query["check_out_date"], query["num_adults"], offset=query["offset"])
+    capture_network = payload.get("capture_network")
+    with get_browser_pool(capture_network).acquire() as driver:
+        return _scrape_booking_page(driver, url, capture_network, None, query)
+
+def _kayak(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    from kayak import kayak_hotels
+
+    return kayak_hotels(payload["location"], payload["check_in_date"], payload["check_out_date"], payload["num_adults"])
+
+# Job kind -> handler(payload) -> JSON-serializable result (acked with the job's browser usage)
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "booking_page": _booking_page,
+    "kayak": _kayak,
+}
+
+class ScrapeWorker:
+    """
+    Claims scrape jobs from a broker and runs them on this host's browsers.
+
+    Each of `concurrency` threads claims one job at a time, so the highest-priority
+    (interactive) jobs are taken first. Delivery is at-least-once: a job whose
+    worker dies is claimed again once its visibility timeout expires, and every
+    handler is a read-only scrape, so running one twice is harmless.
+    """
+
+    def __init__(self, broker: Broker, concurrency: int = WORKER_CONCURRENCY, queue: str = SCRAPE_QUEUE, visibility_timeout: float = VISIBILITY_TIMEOUT):
+        self.broker = broker
+        self.concurrency = max(1, concurrency)
+        self.queue = queue
+        self.visibility_timeout = visibility_timeout
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def run_one(self) -> bool:
+        """Claim and run a single job; returns False if the queue was empty."""
+        job = self.broker.claim(self.queue, self.worker_id, self.visibility_timeout)
+        if job is None:
+            return False
+        self._run(job)
+        return True
+
+    def _run(self, job: Job):
+        handler = JOB_HANDLERS.get(job.kind)
+        if handler is None:
+            self.broker.ack(job, error=f"Unknown job kind: {job.kind}")
+            return
+        logging.info(f"Worker {self.worker_id} running {job}")
+        try:
+            with collect_browser_usage(f"{job.kind} job {job.id}") as usage:
+                result = handler(job.payload)
+        except Exception as e:
+            logging.error(f"{job} failed: {str(e)}")
+            self.broker.ack(job, error=str(e) or e.__class__.__name__)
+            return
+        # The browser usage travels with the result, so the front end can charge it to its search
+        self.broker.ack(job, result={"result": result, "browser_usage": usage.to_dict() if usage.leases else None})
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if not self.run_one():
+                    self._stop.wait(IDLE_POLL_INTERVAL)
+            except Exception as e:
+                # Broker unavailable: back off; claimed jobs are redelivered after their timeout
+                logging.error(f"Worker {self.worker_id} could not reach the broker: {str(e)}")
+                self._stop.wait(5)
+
+    def start(self):
+        """Start the worker threads (daemon threads; the caller keeps the process alive)."""
+        for index in range(self.concurrency):
+            thread = threading.Thread(target=self._loop, name=f"scrape-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop claiming jobs and wait for the jobs in progress to finish."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def serve_forever(self):
+        """Run until SIGINT/SIGTERM, then finish the jobs in progress and exit."""
+        self.start()
+        signal.signal(signal.SIGTERM, lambda signum, frame: self._stop.set())
+        logging.info(f"Worker {self.worker_id} serving queue '{self.queue}' with {self.concurrency} browsers")
+        try:
+            while not self._stop.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        logging.info(f"Worker {self.worker_id} stopping")
+        self.stop()
+
+def start_worker_threads(broker: Broker, concurrency: int = WORKER_CONCURRENCY) -> ScrapeWorker:
+    """Serve a broker from threads of this process (used for the in-memory broker)."""
+    worker = ScrapeWorker(broker, concurrency)
+    worker.start()
+    return worker
+
+if __name__ == "__main__":
+    import argparse
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    parser = argparse.ArgumentParser(description="Run scrape jobs queued by the HotelFinder front ends")
+    parser.add_argument("--broker", default=BROKER_URL, help="Broker URL, e.g. sqlite:///data/jobs.sqlite3 (default: HOTELFINDER_BROKER)")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY, help="Jobs (browsers) run at once")
+    parser.add_argument("--queue", default=SCRAPE_QUEUE)
+    args = parser.parse_args()
+
+    if not args.broker or args.broker == "memory":
+        parser.error("a shared broker is required (e.g. --broker sqlite:///data/jobs.sqlite3)")
+    ScrapeWorker(create_broker(args.broker), args.concurrency, args.queue).serve_forever()
@@ -0,0 +1,75 @@
+import os
+import json
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import List, Tuple, Optional
+from result_cache import make_cache_key
+
+DATA_DIR = os.environ.get("HOTELFINDER_DATA_DIR", "data")
+# JSON-lines log of user searches, read by the pre-warm scheduler
+SEARCH_LOG_PATH = os.environ.get("HOTELFINDER_SEARCH_LOG", os.path.join(DATA_DIR, "search_log.jsonl"))
+
+_write_lock = threading.Lock()
+
+def record_search(location: str, check_in_date: Optional[str], check_out_date: Optional[str], num_adults: int, path: Optional[str] = None):
+    """
+    Append a user search to the search log.
+
+    Searches without dates still count towards top_locations(). Only searches a user asked for are logged; prefetch and pre-warm searches are
+    not, so they never feed back into what gets pre-warmed.
+    """
+    path = path or SEARCH_LOG_PATH
+    location_key, check_in_date, check_out_date, num_adults = make_cache_key(location, check_in_date, check_out_date, num_adults)
+    entry = {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "location": location_key,
+        "check_in_date": check_in_date,
+        "check_out_date": check_out_date,
+        "num_adults": num_adults,
+    }
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as log_file:
+                log_file.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        logging.warning(f"Could not write search log: {str(e)}")
+
+def _read_entries(path: str, since: datetime):
+    try:
+        with open(path, encoding="utf-8") as log_file:
+            for line in log_file:
+                try:
+                    entry = json.loads(line)
+                    if datetime.fromisoformat(entry["ts"]) >= since:
+                        yield entry
+                except (ValueError, KeyError):
+                    continue
+    except FileNotFoundError:
+        return
+
+def top_queries(limit: int = 30, window_days: int = 14, path: Optional[str] = None) -> List[Tuple[Tuple[str, str, str, int], int]]:
+    """
+    Most frequent (location, check-in, check-out, adults) searches that are still in the future.
+
+    Args:
+        limit (int): Number of queries to return
+        window_days (int): Only count searches logged in this many past days
+        path (str, optional): Search log to read (default: HOTELFINDER_SEARCH_LOG)
+
+    Returns:
+        list: ((location, check_in_date, check_out_date, num_adults), count) pairs, most frequent first
+    """
+    today = datetime.now().strftime("%Y-%m-%d")
+    counts = Counter()
+    for entry in _read_entries(path or SEARCH_LOG_PATH, datetime.now() - timedelta(days=window_days)):
+        if entry.get("check_in_date") and entry["check_in_date"] >= today:
+            counts[(entry["location"], entry["check_in_date"], entry["check_out_date"], entry["num_adults"])] += 1
+    return counts.most_common(limit)
+
+def top_locations(limit: int = 20, window_days: int = 14, path: Optional[str] = None) -> List[Tuple[str, int]]:
+    """Most frequently searched locations, whatever the dates."""
+    counts = Counter(entry["location"] for entry in _read_entries(path or SEARCH_LOG_PATH, datetime.now() - timedelta(days=window_days)))
+    return counts.most_common(limit)
@@ -0,0 +1,417 @@
+import os
+import json
+import mmap
+import zlib
+import queue
+import atexit
+import hashlib
+import logging
+import sqlite3
+import threading
+from time import time, monotonic
+from typing import Callable, Dict, List, Any, Iterator, Optional, Tuple
+from search_log import DATA_DIR
+
+try:
+    import zstandard
+except ImportError:  # zlib keeps the archive working without the optional dependency
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single writer process is assumed
+    fcntl = None
+
+# Set HOTELFINDER_SNAPSHOTS=1 to archive fetched result pages
+SNAPSHOTS_ENABLED = os.environ.get("HOTELFINDER_SNAPSHOTS", "").lower() in ("1", "true", "yes")
+SNAPSHOT_DIR = os.environ.get("HOTELFINDER_SNAPSHOT_DIR", os.path.join(DATA_DIR, "snapshots"))
+# Snapshots older than this many days are dropped, then the oldest until the archived
+# pages fit in SNAPSHOT_MAX_MB (compressed)
+SNAPSHOT_MAX_AGE_DAYS = float(os.environ.get("HOTELFINDER_SNAPSHOT_MAX_AGE_DAYS", "14"))
+SNAPSHOT_MAX_MB = float(os.environ.get("HOTELFINDER_SNAPSHOT_MAX_MB", "512"))
+# Seconds between retention passes of the background writer
+COMPACT_INTERVAL = 3600
+# The pack is rewritten once this fraction of it belongs to dropped pages
+REWRITE_DEAD_FRACTION = 0.25
+# Pages waiting for the writer before new ones are dropped (scrapers never wait on disk)
+MAX_PENDING = 64
+ZSTD_LEVEL = 6
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    pack_offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    raw_length INTEGER NOT NULL,
+    codec TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    captured_at REAL NOT NULL,
+    provider TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    location TEXT,
+    check_in_date TEXT,
+    check_out_date TEXT,
+    num_adults INTEGER,
+    page_offset INTEGER,
+    sha256 TEXT NOT NULL REFERENCES blobs (sha256)
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_query ON snapshots (location, check_in_date, captured_at);
+CREATE INDEX IF NOT EXISTS idx_snapshots_provider ON snapshots (provider, captured_at);
+"""
+
+_zlib_fallback_logged = False
+
+def _compress(raw: bytes) -> Tuple[bytes, str]:
+    global _zlib_fallback_logged
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw), "zstd"
+    if not _zlib_fallback_logged:
+        _zlib_fallback_logged = True
+        logging.warning("zstandard is not installed: archiving snapshots with zlib, which compresses them less well")
+    return zlib.compress(raw, 6), "zlib"
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This snapshot was compressed with zstd; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+class SnapshotArchive:
+    """
+    Content-addressed archive of fetched result pages and captured API payloads.
+
+    Each distinct page is compressed (zstd, or zlib without it) and appended once to
+    a single pack file, keyed by the SHA-256 of its raw content. A SQLite index maps
+    every capture (provider, URL, query, time) to its blob. Reads go through a
+    memory map of the pack, so replaying parsers over many pages runs at disk speed
+    without re-scraping.
+
+    store_async() hands pages to a writer thread, which hashes, compresses and
+    appends them off the scraping threads and periodically applies the retention
+    limits (see compact()).
+    """
+
+    def __init__(self, directory: str = SNAPSHOT_DIR, max_age_days: float = SNAPSHOT_MAX_AGE_DAYS, max_bytes: float = SNAPSHOT_MAX_MB * 1024 * 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.pack_path = os.path.join(directory, "pages.pack")
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), timeout=30, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._pack = open(self.pack_path, "ab+")
+        self._map: Optional[mmap.mmap] = None
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=MAX_PENDING)
+        self._writer: Optional[threading.Thread] = None
+        self.stats = {"stored": 0, "dropped": 0}
+
+    def store_async(self, content: Any, provider: str, kind: str, url: str, query: Optional[Dict[str, Any]] = None):
+        """Queue a page for store() on the writer thread; dropped if the writer is MAX_PENDING pages behind."""
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="snapshot-archive", daemon=True)
+                self._writer.start()
+        try:
+            self._queue.put_nowait((content, provider, kind, url, query))
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _write_loop(self):
+        next_compaction = monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, next_compaction - monotonic()))
+            except queue.Empty:
+                item = None
+            try:
+                if item is not None:
+                    content, provider, kind, url, query = item
+                    if kind == "json" and not isinstance(content, (str, bytes)):
+                        content = json.dumps(content, separators=(",", ":"))
+                    if query and query.get("location"):
+                        from gazetteer import canonical_location_key
+                        query = dict(query, location=canonical_location_key(query["location"]))
+                    self.store(content, provider, kind, url, query)
+                    self.stats["stored"] += 1
+                if monotonic() >= next_compaction:
+                    next_compaction = monotonic() + COMPACT_INTERVAL
+                    self.compact()
+            except Exception as e:
+                logging.warning(f"Could not archive snapshot: {str(e)}")
+            finally:
+                if item is not None:
+                    self._queue.task_done()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued page has been stored (or given up on)."""
+        with self._queue.all_tasks_done:
+            return self._queue.all_tasks_done.wait_for(lambda: not self._queue.unfinished_tasks, timeout=timeout)
+
+    def store(self, content: Any, provider: str, kind: str, url: str, query: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Archive one fetched page or payload.
+
+        Args:
+            content (str or bytes): Page HTML, or JSON text of captured payloads
+            provider (str): e.g. 'Booking.com' or 'Kayak'
+            kind (str): 'html' or 'json'
+            url (str): URL the content was fetched from
+            query (dict, optional): location, check_in_date, check_out_date, num_adults, offset
+
+        Returns:
+            str: SHA-256 of the content
+        """
+        raw = content.encode("utf-8") if isinstance(content, str) else content
+        digest = hashlib.sha256(raw).hexdigest()
+        query = query or {}
+
+        with self._lock:
+            known = self._db.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (digest,)).fetchone()
+            with self._db:
+                if not known:
+                    compressed, codec = _compress(raw)
+                    offset = self._append(compressed)
+                    self._db.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?, ?)", (digest, offset, len(compressed), len(raw), codec))
+                self._db.execute(
+                    "INSERT INTO snapshots (captured_at, provider, kind, url, location, check_in_date, check_out_date, num_adults, page_offset, sha256) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (time(), provider, kind, url, query.get("location"), query.get("check_in_date"), query.get("check_out_date"), query.get("num_adults"), query.get("offset"), digest)
+                )
+        return digest
+
+    def _reopen_if_replaced(self):
+        # Called with self._lock held: compaction in another process may have rewritten the pack
+        try:
+            replaced = os.stat(self.pack_path).st_ino != os.fstat(self._pack.fileno()).st_ino
+        except FileNotFoundError:
+            replaced = True
+        if replaced:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._pack.close()
+            self._pack = open(self.pack_path, "ab+")
+
+    def _lock_pack(self):
+        # An exclusive file lock keeps appends and compactions of several app
+        # processes from interleaving; it is taken on the current pack file
+        while True:
+            self._reopen_if_replaced()
+            if fcntl is None:
+                return
+            fcntl.flock(self._pack, fcntl.LOCK_EX)
+            if os.fstat(self._pack.fileno()).st_ino == os.stat(self.pack_path).st_ino:
+                return
+            fcntl.flock(self._pack, fcntl.LOCK_UN)
+
+    def _unlock_pack(self):
+        if fcntl is not None:
+            fcntl.flock(self._pack, fcntl.LOCK_UN)
+
+    def _append(self, data: bytes) -> int:
+        self._lock_pack()
+        try:
+            self._pack.seek(0, os.SEEK_END)
+            offset = self._pack.tell()
+            self._pack.write(data)
+            self._pack.flush()
+            return offset
+        finally:
+            self._unlock_pack()
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Apply the retention limits.
+
+        Drops snapshots older than max_age_days, then the oldest snapshots until
+        their pages fit in max_bytes, then the pages no snapshot refers to. The pack
+        is rewritten without them once they make up REWRITE_DEAD_FRACTION of it.
+
+        Returns:
+            dict: Snapshots expired and evicted, and bytes reclaimed from the pack
+        """
+        with self._lock:
+            self._lock_pack()
+            try:
+                with self._db:
+                    expired = self._db.execute("DELETE FROM snapshots WHERE captured_at < ?", (time() - self.max_age_days * 86400,)).rowcount
+
+                    # Newest first: the first snapshot whose pages no longer fit sets the cutoff
+                    cutoff, kept, total = None, set(), 0
+                    for row in self._db.execute("SELECT s.captured_at, s.sha256, b.length FROM snapshots s JOIN blobs b USING (sha256) ORDER BY s.captured_at DESC"):
+                        if row["sha256"] in kept:
+                            continue
+                        total += row["length"]
+                        if total > self.max_bytes:
+                            cutoff = row["captured_at"]
+                            break
+                        kept.add(row["sha256"])
+                    evicted = self._db.execute("DELETE FROM snapshots WHERE captured_at <= ?", (cutoff,)).rowcount if cutoff is not None else 0
+                    self._db.execute("DELETE FROM blobs WHERE sha256 NOT IN (SELECT sha256 FROM snapshots)")
+                return {"expired": expired, "evicted": evicted, "reclaimed": self._rewrite_pack()}
+            finally:
+                self._unlock_pack()
+
+    def _rewrite_pack(self) -> int:
+        # Called with both locks held; copies the live pages into a new pack
+        blobs = self._db.execute("SELECT sha256, pack_offset, length FROM blobs ORDER BY pack_offset").fetchall()
+        pack_size = os.fstat(self._pack.fileno()).st_size
+        dead = pack_size - sum(blob["length"] for blob in blobs)
+        if dead <= pack_size * REWRITE_DEAD_FRACTION:
+            return 0
+
+        new_path = self.pack_path + ".new"
+        offsets = []
+        with open(self.pack_path, "rb") as old_pack, open(new_path, "wb") as new_pack:
+            for blob in blobs:
+                old_pack.seek(blob["pack_offset"])
+                offsets.append((new_pack.tell(), blob["sha256"]))
+                new_pack.write(old_pack.read(blob["length"]))
+            new_pack.flush()
+            os.fsync(new_pack.fileno())
+        with self._db:
+            self._db.executemany("UPDATE blobs SET pack_offset = ? WHERE sha256 = ?", offsets)
+            os.replace(new_path, self.pack_path)
+        # Keep holding the old file's lock until the caller releases it; later
+        # operations reopen the new pack
+        return dead
+
+    def usage(self) -> Dict[str, Any]:
+        """Snapshot and page counts, raw and compressed bytes of the archived pages."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT (SELECT COUNT(*) FROM snapshots) AS snapshots, COUNT(*) AS pages, "
+                "COALESCE(SUM(raw_length), 0) AS raw_bytes, COALESCE(SUM(length), 0) AS stored_bytes FROM blobs"
+            ).fetchone()
+        return dict(row)
+
+    def read(self, digest: str) -> bytes:
+        """Return the raw content stored under digest."""
+        with self._lock:
+            self._reopen_if_replaced()
+            blob = self._db.execute("SELECT pack_offset, length, codec FROM blobs WHERE sha256 = ?", (digest,)).fetchone()
+            if blob is None:
+                raise KeyError(digest)
+            end = blob["pack_offset"] + blob["length"]
+            if self._map is None or len(self._map) < end:
+                # The pack grew since it was mapped
+                if self._map is not None:
+                    self._map.close()
+                self._map = mmap.mmap(self._pack.fileno(), 0, access=mmap.ACCESS_READ)
+            data = self._map[blob["pack_offset"]:end]
+        return _decompress(data, blob["codec"])
+
+    def find(self, provider: Optional[str] = None, kind: Optional[str] = None, location: Optional[str] = None, check_in_date: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Index entries matching the filters, oldest first; location is matched as searched (canonicalized)."""
+        sql = "SELECT * FROM snapshots WHERE 1 = 1"
+        params: List[Any] = []
+        for column, value in (("provider", provider), ("kind", kind), ("check_in_date", check_in_date)):
+            if value is not None:
+                sql += f" AND {column} = ?"
+                params.append(value)
+        if location is not None:
+            from gazetteer import canonical_location_key
+            sql += " AND location = ?"
+            params.append(canonical_location_key(location))
+        if since is not None:
+            sql += " AND captured_at >= ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND captured_at < ?"
+            params.append(until)
+        # Reading in pack order keeps the memory-mapped reads sequential
+        sql += " ORDER BY captured_at"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def replay(self, parser: Optional[Callable[[Dict[str, Any], str], List[Dict[str, Any]]]] = None, **filters) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Run a parser over archived snapshots.
+
+        Args:
+            parser (callable, optional): parser(snapshot, content) -> hotels; defaults to
+                parse_snapshot(), i.e. the current parsers of this codebase
+            **filters: Passed to find()
+
+        Yields:
+            tuple: (snapshot index entry, parsed hotels)
+        """
+        parser = parser or parse_snapshot
+        for snapshot in self.find(**filters):
+            try:
+                content = self.read(snapshot["sha256"]).decode("utf-8")
+            except (KeyError, OSError, RuntimeError, zlib.error) as e:
+                logging.warning(f"Unreadable snapshot {snapshot['id']}: {str(e)}")
+                continue
+            yield snapshot, parser(snapshot, content)
+
+def parse_snapshot(snapshot: Dict[str, Any], content: str) -> List[Dict[str, Any]]:
+    """Parse an archived snapshot with the current Booking.com / Kayak parsers."""
+    from parsing import parse_booking_html
+    from network_capture import parse_booking_payload, parse_kayak_payload
+
+    if snapshot["kind"] == "html":
+        return parse_booking_html(content, snapshot["url"])
+
+    payload_parser = parse_kayak_payload if snapshot["provider"] == "Kayak" else parse_booking_payload
+    hotels = []
+    for payload in json.loads(content):
+        hotels.extend(payload_parser(payload, snapshot["url"]))
+    return hotels
+
+_archive: Optional[SnapshotArchive] = None
+_archive_lock = threading.Lock()
+
+def get_snapshot_archive() -> SnapshotArchive:
+    """Return the process-wide snapshot archive."""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = SnapshotArchive()
+            atexit.register(_archive.flush)
+        return _archive
+
+def archive_snapshot(content: Any, provider: str, kind: str, url: str, query: Optional[Dict[str, Any]] = None):
+    """Queue a fetched page or payload list for the archive, if enabled. Never raises or blocks on disk."""
+    if not SNAPSHOTS_ENABLED or not content:
+        return
+    try:
+        get_snapshot_archive().store_async(content, provider, kind, url, query)
+    except Exception as e:
+        logging.warning(f"Could not archive {provider} snapshot: {str(e)}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-parse archived result pages with the current parsers")
+    parser.add_argument("--provider")
+    parser.add_argument("--kind", choices=["html", "json"])
+    parser.add_argument("--location")
+    parser.add_argument("--since-days", type=float, help="Only snapshots captured in the last N days")
+    parser.add_argument("--compact", action="store_true", help="Apply the retention limits now and report the archive size")
+    args = parser.parse_args()
+
+    if args.compact:
+        archive = get_snapshot_archive()
+        print(archive.compact())
+        print(archive.usage())
+        raise SystemExit(0)
+
+    since = time() - args.since_days * 86400 if args.since_days else None
+    pages = empty = hotels = 0
+    for snapshot, parsed in get_snapshot_archive().replay(provider=args.provider, kind=args.kind, location=args.location, since=since):
+        pages += 1
+        hotels += len(parsed)
+        if not parsed:
+            empty += 1
+            print(f"no hotels: #{snapshot['id']} {snapshot['provider']} {snapshot['url']}")
+    print(f"{pages} snapshots, {hotels} hotels, {empty} snapshots without hotels")
@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+import pytest
+
+# agents builds the CrewAI agents and Streamlit UI at import time
+agents = pytest.importorskip("agents")
+from agents import parse_structured_request, route_hotel_request, get_router_stats
+
+PARIS = "Paris, Ile-de-France, France"
+
+@pytest.mark.parametrize("request_, expected", [
+    (
+        {"location": "Paris", "check_in_date": "2026-11-06", "check_out_date": "2026-11-08", "num_adults": 3},
+        {"location": "Paris", "check_in_date": "2026-11-06", "check_out_date": "2026-11-08", "num_adults": 3},
+    ),
+    (
+        {"location": "Paris", "check_in_date": "2026-11-06", "check_out_date": "2026-11-08", "num_adults": None},
+        {"location": "Paris", "check_in_date": "2026-11-06", "check_out_date": "2026-11-08", "num_adults": 2},
+    ),
+    (
+        {"location": "Paris", "check_in_date": "2026-11-06", "check_out_date": "2026-11-08", "num_adults": "4"},
+        {"location": "Paris", "check_in_date": "2026-11-06", "check_out_date": "2026-11-08", "num_adults": 4},
+    ),
+    (
+        "hotels in Paris from 2026-11-06 to 2026-11-08 for 3 adults",
+        {"location": PARIS, "check_in_date": "2026-11-06", "check_out_date": "2026-11-08", "num_adults": 3},
+    ),
+    (
+        "Find a room in paris, 2026-11-08 and 2026-11-06",
+        {"location": PARIS, "check_in_date": "2026-11-06", "check_out_date": "2026-11-08", "num_adults": 2},
+    ),
+    (
+        "hotel near NYC between 2026-12-30 and 2027-01-02 for 2 guests",
+        {"location": "New York, United States", "check_in_date": "2026-12-30", "check_out_date": "2027-01-02", "num_adults": 2},
+    ),
+])
+def test_structured_requests_skip_the_agent(request_, expected):
+    assert parse_structured_request(request_) == expected
+
+@pytest.mark.parametrize("request_", [
+    {"location": "Paris"},
+    {"location": "Paris", "check_in_date": "2026-11-06"},
+    "somewhere quiet by the sea next weekend",
+    "hotels in Paris next weekend for 2 adults",
+    "hotels in Paris on 2026-11-06",
+    "hotels in Atlantis from 2026-11-06 to 2026-11-08",
+    "hotels in Paris or London from 2026-11-06 to 2026-11-08",
+    "Paris 2026-11-06 2026-11-08 2026-11-10",
+])
+def test_ambiguous_requests_go_to_the_agent(request_):
+    assert parse_structured_request(request_) is None
+
+@pytest.mark.parametrize("request_, message", [
+    ({"check_in_date": "2026-11-06", "check_out_date": "2026-11-08"}, "location"),
+    ({"location": "", "check_in_date": "2026-11-06", "check_out_date": "2026-11-08"}, "location"),
+    ({"location": "Paris", "check_in_date": "2026-11-06", "check_out_date": "2026-11-08", "num_adults": "two"}, "num_adults"),
+    ({"location": "Paris", "check_in_date": "2026-11-06", "check_out_date": "2026-11-08", "num_adults": 0}, "num_adults"),
+    ({"location": "Paris", "check_in_date": "2026-11-06", "check_out_date": "2026-11-08", "num_adults": 2.5}, "num_adults"),
+    ({"location": "Paris", "check_in_date": "06/11/2026", "check_out_date": "2026-11-08"}, "YYYY-MM-DD"),
+    ({"location": "Paris", "check_in_date": "2026-02-30", "check_out_date": "2026-03-02"}, "YYYY-MM-DD"),
+    ({"location": "Paris", "check_in_date": "2026-11-08", "check_out_date": "2026-11-06"}, "after"),
+    ({"location": "Paris", "check_in_date": "2026-11-06", "check_out_date": "2026-11-06"}, "after"),
+    ("hotels in Paris from 2026-02-30 to 2026-03-02", "YYYY-MM-DD"),
+    ("hotels in Paris from 2026-11-06 to 2026-11-06", "after"),
+    ("hotels in Paris from 2026-11-06 to 2026-11-08 for 0 adults", "num_adults"),
+])
+def test_invalid_requests_raise_value_error(request_, message):
+    with pytest.raises(ValueError, match=message):
+        parse_structured_request(request_)
+
+@pytest.fixture
+def router(monkeypatch):
+    # Stub search and crew; returns the calls made on each route
+    calls = {"direct": [], "agent": []}
+    monkeypatch.setattr(agents, "_router_stats", {"direct": 0, "agent": 0, "agent_measured": 0, "agent_llm_calls": 0})
+    monkeypatch.setattr(agents, "run_hotel_search", lambda api_keys=None, **query: calls["direct"].append(query) or [{"name": "A"}])
+
+    class Crew:
+        def __init__(self, credentials):
+            self.credentials = credentials
+
+        def kickoff(self, inputs):
+            calls["agent"].append(inputs["request"])
+            return SimpleNamespace(token_usage=SimpleNamespace(successful_requests=calls.get("llm_calls", 0)))
+
+    monkeypatch.setattr(agents, "build_search_crew", Crew)
+    return calls
+
+def test_router_sends_structured_requests_direct(router):
+    response = route_hotel_request({"location": "Paris", "check_in_date": "2026-11-06", "check_out_date": "2026-11-08"})
+    assert response == {"route": "direct", "hotels": [{"name": "A"}]}
+    assert router["direct"] == [{"location": "Paris", "check_in_date": "2026-11-06", "check_out_date": "2026-11-08", "num_adults": 2}]
+    assert router["agent"] == []
+
+def test_router_sends_free_text_to_the_agent(router):
+    response = route_hotel_request("somewhere quiet by the sea")
+    assert response["route"] == "agent"
+    assert router["agent"] == ["somewhere quiet by the sea"]
+    assert router["direct"] == []
+
+@pytest.mark.parametrize("request_", ["", "   ", {"location": None}])
+def test_router_rejects_empty_requests(router, request_):
+    with pytest.raises(ValueError):
+        route_hotel_request(request_)
+    assert router["direct"] == [] and router["agent"] == []
+
+def test_router_stats_only_estimate_savings_from_measured_runs(router):
+    route_hotel_request({"location": "Paris", "check_in_date": "2026-11-06", "check_out_date": "2026-11-08"})
+    stats = get_router_stats()
+    assert (stats["direct"], stats["agent"]) == (1, 0)
+    assert stats["mean_agent_llm_calls"] is None and stats["estimated_llm_calls_saved"] is None
+
+    route_hotel_request("somewhere quiet")  # no usage reported: counted, but not measured
+    router["llm_calls"] = 4
+    route_hotel_request("somewhere quieter")
+    router["llm_calls"] = 6
+    route_hotel_request("somewhere quietest")
+    stats = get_router_stats()
+    assert (stats["direct"], stats["agent"], stats["agent_measured"], stats["agent_llm_calls"]) == (1, 3, 2, 10)
+    assert stats["mean_agent_llm_calls"] == 5.0
+    assert stats["estimated_llm_calls_saved"] == 5.0
@@ -0,0 +1,196 @@
+import pytest
+
+import chrome_watchdog
+from chrome_watchdog import OWNER_SWITCH, BrowserUsage, ChromeWatchdog, _descendants, _Process, _read_proc, collect_browser_usage
+
+# Above any real pid_max, so a stray kill can never reach a real process
+BASE = 5_000_000
+MB = 2**20
+
+def _process(offset, parent, name="chrome", rss_mb=100, cpu_seconds=1.0):
+    return _Process(BASE + offset, BASE + parent if parent is not None else 1, rss_mb * MB, cpu_seconds, 1000.0 + offset, name)
+
+def _processes(*processes):
+    return {process.pid: process for process in processes}
+
+class FakeProcess:
+    def __init__(self, pid):
+        self.pid = pid
+
+    def wait(self, timeout=None):
+        return 0
+
+class FakeDriver:
+    def __init__(self, pid):
+        self.service = type("Service", (), {"process": FakeProcess(pid)})()
+
+@pytest.fixture
+def system(monkeypatch):
+    """Synthetic process table; records kills and which command lines were read."""
+    state = {"processes": {}, "cmdlines": {}, "killed": [], "read": [], "now": 10_000.0}
+    monkeypatch.setattr(chrome_watchdog, "snapshot_processes", lambda: dict(state["processes"]))
+    monkeypatch.setattr(chrome_watchdog, "_kill", lambda pids: state["killed"].append(list(pids)))
+    monkeypatch.setattr(chrome_watchdog, "_cmdline", lambda pid: state["read"].append(pid) or state["cmdlines"].get(pid, []))
+    monkeypatch.setattr(chrome_watchdog, "monotonic", lambda: state["now"])
+    monkeypatch.setattr(ChromeWatchdog, "_ensure_thread", lambda self: None)
+    return state
+
+@pytest.fixture
+def watchdog(system):
+    watchdog = ChromeWatchdog(max_rss_mb=500, max_cpu_seconds=60, max_lease_seconds=30)
+    watchdog.enabled = True
+    # Nothing to reap unless a test asks for it
+    watchdog._last_orphan_scan = system["now"]
+    yield watchdog
+    # Release while the fakes are still installed, before the drivers' finalizers run
+    for key in list(watchdog._browsers):
+        watchdog._release(key)
+
+def _browser_tree(cpu_seconds=1.0, rss_mb=100):
+    # chromedriver -> chrome -> two renderers
+    return _processes(
+        _process(0, None, "chromedriver", 10, 0.5),
+        _process(1, 0, "chrome", rss_mb, cpu_seconds),
+        _process(2, 1, "chrome", 50, 2.0),
+        _process(3, 1, "chrome", 50, 2.0),
+    )
+
+def test_read_proc_parses_stat_fields(monkeypatch, tmp_path):
+    # The command name may contain spaces and parentheses
+    stat = "4242 (Chrome (Renderer) x) S 4241 4242 4242 0 -1 4194304 1 0 0 0 250 50 0 0 20 0 12 0 98765 1234567 300 18446744073709551615"
+    path = tmp_path / "stat"
+    path.write_bytes(stat.encode())
+    monkeypatch.setattr(chrome_watchdog, "open", lambda *args: open(path, "rb"), raising=False)
+    process = _read_proc(4242)
+    assert (process.pid, process.ppid, process.name) == (4242, 4241, "Chrome (Renderer) x")
+    assert process.rss == 300 * chrome_watchdog._PAGE_SIZE
+    assert process.cpu_seconds == 300 / chrome_watchdog._CLOCK_TICKS
+    assert process.started == 98765.0
+    assert process.is_chrome()
+
+def test_read_proc_of_an_exited_process():
+    assert _read_proc(BASE + 1) is None
+
+def test_descendants():
+    processes = _browser_tree()
+    processes.update(_processes(_process(10, None, "python"), _process(11, 3, "chrome")))
+    assert sorted(process.pid - BASE for process in _descendants(BASE + 1, processes)) == [1, 2, 3, 11]
+    assert [process.pid - BASE for process in _descendants(BASE + 10, processes)] == [10]
+    assert _descendants(BASE + 99, processes) == []
+
+def test_reap_orphans_matches_the_owner_tag(system, watchdog):
+    owner = BASE + 50
+    dead_owner = BASE + 99
+    processes = _processes(
+        _process(50, None, "python"),
+        # Orphaned: its owner is gone
+        _process(0, None, "chromedriver"), _process(1, 0, "chrome"), _process(2, 1, "chrome"),
+        # Still owned
+        _process(20, None, "chromedriver"), _process(21, 20, "chrome"),
+        # Untagged Chrome (the user's own browser)
+        _process(30, None, "chrome"),
+        # Not Chrome: its command line is never read
+        _process(40, None, "python"),
+    )
+    system["processes"] = processes
+    system["cmdlines"] = {
+        BASE + 1: ["chrome", f"{OWNER_SWITCH}{dead_owner}"],
+        BASE + 2: ["chrome", "--type=renderer", f"{OWNER_SWITCH}{dead_owner}"],
+        BASE + 21: ["chrome", f"{OWNER_SWITCH}{owner}"],
+        BASE + 30: ["chrome"],
+        BASE + 40: ["python", f"{OWNER_SWITCH}{dead_owner}"],
+    }
+    assert watchdog.reap_orphans(processes) == 3
+    assert [[pid - BASE for pid, _ in kill] for kill in system["killed"]] == [[0, 1, 2]]
+    assert system["killed"][0][1] == (BASE + 1, processes[BASE + 1].started)
+    assert BASE + 40 not in system["read"] and BASE + 50 not in system["read"]
+    assert watchdog.stats()["orphans_reaped"] == 3
+
+def test_check_kills_a_tree_over_the_rss_cap(system, watchdog):
+    driver = FakeDriver(BASE)
+    system["processes"] = _browser_tree(rss_mb=300)
+    watchdog.register(driver, "booking")
+    watchdog.check()
+    assert not watchdog.is_killed(driver) and system["killed"] == []
+
+    system["processes"] = _browser_tree(rss_mb=450)
+    watchdog.check()
+    assert watchdog.is_killed(driver)
+    assert sorted(pid - BASE for pid, _ in system["killed"][0]) == [0, 1, 2, 3]
+    assert watchdog.stats()["kills"] == {"rss": 1}
+    # A killed browser is not checked again
+    watchdog.check()
+    assert len(system["killed"]) == 1
+
+def test_lease_limit_and_usage(system, watchdog):
+    driver = FakeDriver(BASE)
+    system["processes"] = _browser_tree(cpu_seconds=5.0)
+    watchdog.register(driver, "kayak")
+    with collect_browser_usage("search") as usage:
+        with watchdog.lease(driver):
+            system["now"] += 10
+            system["processes"] = _browser_tree(cpu_seconds=8.0, rss_mb=200)
+            watchdog.check()
+            assert not watchdog.is_killed(driver)
+            system["now"] += 25
+            watchdog.check()
+            assert watchdog.is_killed(driver)
+    report = usage.to_dict()
+    assert (report["leases"], report["browser_seconds"], report["cpu_seconds"]) == (1, 35.0, 3.0)
+    assert report["peak_rss_mb"] == 310.0
+    assert report["killed"] == ["lease 35s > 30s"]
+    assert watchdog.stats()["kills"] == {"lease": 1}
+
+def test_an_idle_browser_is_never_killed_for_its_age(system, watchdog):
+    driver = FakeDriver(BASE)
+    system["processes"] = _browser_tree()
+    watchdog.register(driver)
+    with watchdog.lease(driver):
+        system["now"] += 10
+    system["now"] += 1000
+    watchdog.check()
+    assert not watchdog.is_killed(driver)
+
+def test_needs_recycle_counts_the_whole_life(system, watchdog):
+    driver = FakeDriver(BASE)
+    system["processes"] = _browser_tree(cpu_seconds=30.0)
+    watchdog.register(driver)
+    watchdog.check()
+    assert not watchdog.needs_recycle(driver)
+
+    # A renderer that used CPU time and exited still counts
+    system["processes"] = _browser_tree(cpu_seconds=30.0)
+    system["processes"][BASE + 4] = _process(4, 1, "chrome", 50, 40.0)
+    watchdog.check()
+    del system["processes"][BASE + 4]
+    watchdog.check()
+    assert watchdog.needs_recycle(driver)
+    assert watchdog.stats()["recycled"] == 1
+    assert not watchdog.needs_recycle(FakeDriver(BASE + 90))
+
+def test_unregister_kills_what_quit_left_behind(system, watchdog):
+    driver = FakeDriver(BASE)
+    system["processes"] = _browser_tree()
+    watchdog.register(driver)
+    watchdog.check()
+    system["processes"] = _processes(_process(2, None, "chrome"))
+    watchdog.unregister(driver)
+    assert sorted(pid - BASE for pid, _ in system["killed"][0]) == [0, 1, 2, 3]
+    assert watchdog.stats()["browsers"] == []
+
+def test_browser_usage_merge_and_to_dict():
+    usage = BrowserUsage("Paris")
+    usage.add(2.5, 1.25, 300 * MB)
+    usage.add(1.0, 0.5, 200 * MB, killed="rss 1600MB > 1500MB")
+    worker = BrowserUsage("worker")
+    worker.add(4.0, 2.0, 450 * MB)
+    usage.merge(worker.to_dict())
+    usage.merge({})
+    assert usage.to_dict() == {
+        "label": "Paris",
+        "leases": 3,
+        "browser_seconds": 7.5,
+        "cpu_seconds": 3.75,
+        "peak_rss_mb": 450.0,
+        "killed": ["rss 1600MB > 1500MB"],
+    }
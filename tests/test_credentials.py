@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from credentials import SearchCredentials, get_credentials, submit_with_context, use_credentials
+
+@pytest.fixture(autouse=True)
+def environment(monkeypatch):
+    monkeypatch.setenv("BROWSERBASE_API_KEY", "env-bb")
+    monkeypatch.setenv("BROWSERBASE_PROJECT_ID", "env-project")
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+
+def _fields(credentials):
+    return (credentials.browserbase_api_key, credentials.browserbase_project_id, credentials.groq_api_key)
+
+@pytest.mark.parametrize("api_keys, expected", [
+    ({"BROWSERBASE_API_KEY": "bb", "BROWSERBASE_PROJECT_ID": "project", "GROQ_API_KEY": "groq"}, ("bb", "project", "groq")),
+    ({"BROWSERBASE_KEY": "bb-alias"}, ("bb-alias", "env-project", None)),
+    # The canonical name wins over its alias
+    ({"BROWSERBASE_API_KEY": "bb", "BROWSERBASE_KEY": "bb-alias"}, ("bb", "env-project", None)),
+    ({"BROWSERBASE_API_KEY": "", "BROWSERBASE_KEY": "bb-alias"}, ("bb-alias", "env-project", None)),
+    # Missing or empty values fall back to the environment
+    ({"BROWSERBASE_API_KEY": "", "GROQ_API_KEY": "groq"}, ("env-bb", "env-project", "groq")),
+    ({}, ("env-bb", "env-project", None)),
+    (None, ("env-bb", "env-project", None)),
+])
+def test_from_api_keys(api_keys, expected):
+    assert _fields(SearchCredentials.from_api_keys(api_keys)) == expected
+
+def test_repr_hides_the_secrets():
+    text = repr(SearchCredentials("secret-bb", None, "secret-groq"))
+    assert "secret" not in text
+    assert "browserbase_api_key" in text and "groq_api_key" in text
+
+def test_use_credentials_is_scoped():
+    assert _fields(get_credentials()) == ("env-bb", "env-project", None)
+    with use_credentials(SearchCredentials("outer", "p", "g")):
+        with use_credentials(SearchCredentials("inner", "p", "g")):
+            assert get_credentials().browserbase_api_key == "inner"
+        assert get_credentials().browserbase_api_key == "outer"
+    assert get_credentials().browserbase_api_key == "env-bb"
+
+def test_submitted_work_sees_the_callers_credentials():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Start the worker thread before any credentials are set
+        executor.submit(lambda: None).result()
+        with use_credentials(SearchCredentials("request-bb", "request-project", "request-groq")):
+            carried = submit_with_context(executor, lambda: _fields(get_credentials())).result()
+            plain = executor.submit(lambda: _fields(get_credentials())).result()
+    assert carried == ("request-bb", "request-project", "request-groq")
+    assert plain == ("env-bb", "env-project", None)
+
+def test_concurrent_requests_do_not_share_credentials():
+    def search(user):
+        with use_credentials(SearchCredentials(f"{user}-bb", None, None)):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                return [submit_with_context(executor, lambda: get_credentials().browserbase_api_key).result() for _ in range(5)]
+
+    with ThreadPoolExecutor(max_workers=4) as requests:
+        results = dict(zip(("alice", "bob", "carol"), requests.map(search, ("alice", "bob", "carol"))))
+    assert results == {user: [f"{user}-bb"] * 5 for user in results}
@@ -0,0 +1,70 @@
+import math
+
+from facets import BLOCK, FacetIndex
+
+def _hotels(count):
+    return [
+        {
+            "name": f"Hotel {index}",
+            "price_value": float(50 + index * 7 % 300),
+            "rating_normalized": index % 10 / 2,
+            "stars": index % 5 + 1,
+            "location": ["Le Marais", "Opera", "Montmartre"][index % 3],
+            "source": "Kayak" if index % 4 == 0 else "Booking.com",
+        }
+        for index in range(count)
+    ]
+
+def _positions(index, mask):
+    return [position for position in range(len(index.hotels)) if mask >> position & 1]
+
+def test_range_filters_match_a_linear_scan():
+    # Several blocks, so ranges combine prefix bitsets with single bits
+    hotels = _hotels(BLOCK * 5 + 3)
+    index = FacetIndex(hotels)
+    for low, high in ((None, None), (60, 120), (None, 80), (200, None), (100, 100), (400, 500)):
+        expected = [position for position, hotel in enumerate(hotels) if (low is None or hotel["price_value"] >= low) and (high is None or hotel["price_value"] <= high)]
+        assert _positions(index, index.filter(min_price=low, max_price=high)) == expected
+
+def test_filters_combine_and_keep_result_order():
+    hotels = _hotels(100)
+    index = FacetIndex(hotels)
+    mask = index.filter(min_rating=3, stars=[4, 5], areas=["Opera"], sources=["Booking.com"])
+    expected = [hotel for hotel in hotels if hotel["rating_normalized"] >= 3 and hotel["stars"] in (4, 5) and hotel["location"] == "Opera" and hotel["source"] == "Booking.com"]
+    assert index.select(mask) == expected
+    assert index.select(mask, limit=2) == expected[:2]
+    assert index.count(mask) == len(expected)
+
+def test_facet_counts_leave_out_their_own_filter():
+    hotels = _hotels(60)
+    index = FacetIndex(hotels)
+    counts = index.facet_counts(areas=["Opera"], sources=["Kayak"])
+    kayak = [hotel for hotel in hotels if hotel["source"] == "Kayak"]
+    opera = [hotel for hotel in hotels if hotel["location"] == "Opera"]
+    assert counts["total"] == len([hotel for hotel in kayak if hotel["location"] == "Opera"])
+    assert counts["area"] == {area: len([hotel for hotel in kayak if hotel["location"] == area]) for area in ("Le Marais", "Opera", "Montmartre") if any(hotel["location"] == area for hotel in kayak)}
+    assert counts["source"] == {source: len([hotel for hotel in opera if hotel["source"] == source]) for source in ("Kayak", "Booking.com")}
+    matched = [hotel["price_value"] for hotel in kayak if hotel["location"] == "Opera"]
+    assert counts["price_range"] == (min(matched), max(matched))
+
+def test_unpriced_hotels_have_no_price_facet_value():
+    hotels = [
+        {"name": "A", "price_value": 80.0, "source": "Kayak"},
+        {"name": "B", "price_value": math.inf, "source": "Kayak"},
+        {"name": "C", "price_value": 140.0, "source": "Booking.com"},
+        {"name": "D", "price_value": float("nan"), "source": "Booking.com"},
+    ]
+    index = FacetIndex(hotels)
+    assert index.ranges["price"].bounds(index.all) == (80.0, 140.0)
+    assert [hotel["name"] for hotel in index.select(index.filter(min_price=100))] == ["C"]
+    assert [hotel["name"] for hotel in index.select(index.filter(max_price=100))] == ["A"]
+    # Without a price filter the unpriced hotels are still listed and counted
+    assert index.count(index.filter(sources=["Kayak"])) == 2
+    counts = index.facet_counts()
+    assert counts["total"] == 4
+    assert counts["price_range"] == (80.0, 140.0)
+
+def test_empty_result_set():
+    index = FacetIndex([])
+    assert index.select(index.filter(min_price=10)) == []
+    assert index.facet_counts()["price_range"] is None
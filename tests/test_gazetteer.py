@@ -0,0 +1,56 @@
+import pytest
+
+from gazetteer import Gazetteer, Place, normalize_text, canonical_location_key, kayak_location, booking_location_params
+
+@pytest.fixture
+def gazetteer():
+    return Gazetteer([
+        Place("Hisar", "Haryana", "India", 301249, ("Hissar",), kayak_id="p15321"),
+        Place("Mumbai", "Maharashtra", "India", 12442373, ("Bombay",)),
+        Place("Berlin", "Berlin", "Germany", 3644826),
+        Place("Geneva", "Geneva", "Switzerland", 201818),
+        Place("Paris", "Ile-de-France", "France", 2161000),
+        Place("Paris", "Texas", "United States", 24171),
+        Place("Sao Paulo", "Sao Paulo", "Brazil", 12325232),
+    ])
+
+def test_normalize_text_folds_case_accents_and_punctuation():
+    assert normalize_text("  São  Paulo, ") == "sao paulo"
+
+def test_resolve_exact_name_in_any_spelling(gazetteer):
+    assert gazetteer.resolve("mumbai").name == "Mumbai"
+    assert gazetteer.resolve("São Paulo").name == "Sao Paulo"
+    assert gazetteer.resolve("Hisar, Haryana, India").name == "Hisar"
+
+def test_resolve_alias(gazetteer):
+    assert gazetteer.resolve("Bombay").name == "Mumbai"
+    assert gazetteer.resolve("hissar").key == gazetteer.resolve("Hisar").key
+
+def test_resolve_prefers_the_most_populous_place_unless_qualified(gazetteer):
+    assert gazetteer.resolve("Paris").country == "France"
+    assert gazetteer.resolve("Paris Texas").country == "United States"
+
+def test_resolve_strips_a_provider_id_suffix(gazetteer):
+    assert gazetteer.resolve("Hisar,Haryana,India-p15321").name == "Hisar"
+
+@pytest.mark.parametrize("text", ["Bern", "Genova", "Pariss", "Mumba", "", "   "])
+def test_resolve_does_not_guess_at_places_it_does_not_know(gazetteer, text):
+    assert gazetteer.resolve(text) is None
+
+def test_autocomplete_prefix_most_populous_first(gazetteer):
+    assert [place.display_name for place in gazetteer.autocomplete("par")] == ["Paris, Ile-de-France, France", "Paris, Texas, United States"]
+    assert [place.name for place in gazetteer.autocomplete("bom")] == ["Mumbai"]
+
+def test_autocomplete_suggests_close_misspellings(gazetteer):
+    assert [place.name for place in gazetteer.autocomplete("Berlim")] == ["Berlin"]
+    assert gazetteer.autocomplete("zzz") == []
+
+def test_kayak_location_only_carries_a_known_id(gazetteer):
+    assert gazetteer.resolve("Hisar").kayak_location == "Hisar,Haryana,India-p15321"
+    assert gazetteer.resolve("Mumbai").booking_params() == "ss=Mumbai%2C+India"
+
+def test_unknown_cities_fall_back_to_the_text_as_typed():
+    # Against the bundled gazetteer, which has Berlin, Geneva and Orlando
+    assert canonical_location_key("Bern") == "bern"
+    assert kayak_location("Portland, Oregon") == "portland,oregon"
+    assert booking_location_params("Genova") == "ss=genova"
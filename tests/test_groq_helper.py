@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+groq_helper = pytest.importorskip("groq_helper")
+
+USAGE = {"prompt_tokens": 120, "completion_tokens": 7, "total_tokens": 127}
+
+class FakeStream:
+    """A streamed response whose body arrives in the given raw chunks."""
+
+    def __init__(self, chunks, status_error=None):
+        self.chunks = chunks
+        self.status_error = status_error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        if self.status_error is not None:
+            raise self.status_error
+
+    def iter_lines(self, decode_unicode=False):
+        # Lines are reassembled across chunk boundaries, as requests does
+        pending = ""
+        for chunk in self.chunks:
+            if isinstance(chunk, Exception):
+                raise chunk
+            pending += chunk
+            *lines, pending = pending.split("\n")
+            yield from (line.rstrip("\r") for line in lines)
+        if pending:
+            yield pending
+
+def _event(payload) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+def _delta(content: str, **extra) -> str:
+    return _event(dict({"choices": [{"index": 0, "delta": {"content": content}}]}, **extra))
+
+@pytest.fixture
+def stream(monkeypatch):
+    # Set stream["chunks"] (or stream["error"]) before calling; records the request payloads
+    state = {"chunks": [], "requests": []}
+
+    def post(url, headers=None, json=None, stream=False, timeout=None):
+        state["requests"].append(json)
+        if "error" in state:
+            raise state["error"]
+        return FakeStream(state["chunks"])
+
+    monkeypatch.setattr(groq_helper.requests, "post", post)
+    return state
+
+def _collect(**kwargs):
+    usages = []
+    fragments = list(groq_helper.stream_chat_completion("prompt", 100, api_key="key", on_usage=usages.append, **kwargs))
+    return fragments, usages
+
+def test_parses_events_comments_and_done(stream):
+    body = ": keep-alive\n\n" + _delta("Hello") + "\n" + _delta(", world") + _event({"choices": [{"delta": {}}]}) + "data: [DONE]\n\n" + _delta("after done")
+    stream["chunks"] = [body]
+    fragments, usages = _collect()
+    assert fragments == ["Hello", ", world"]
+    assert usages == []
+    assert stream["requests"][0]["stream"] is True
+
+def test_event_split_across_chunks(stream):
+    body = _delta("Grand ") + _delta("Hotel") + "data: [DONE]\n\n"
+    split = body.index("Hotel") - 3
+    stream["chunks"] = [body[:split], body[split:split + 5], body[split + 5:]]
+    assert _collect()[0] == ["Grand ", "Hotel"]
+
+def test_usage_from_x_groq_and_a_usage_only_chunk_is_reported_once(stream):
+    stream["chunks"] = [
+        _delta("Hi"),
+        _delta("!", x_groq={"usage": USAGE}),
+        _event({"choices": [], "usage": USAGE}),
+        "data: [DONE]\n\n",
+    ]
+    fragments, usages = _collect()
+    assert fragments == ["Hi", "!"]
+    assert usages == [USAGE]
+
+def test_usage_is_reported_when_the_stream_ends_without_done(stream):
+    stream["chunks"] = [_delta("Hi", x_groq={"usage": USAGE})]
+    assert _collect() == (["Hi"], [USAGE])
+
+def test_malformed_events_are_skipped(stream):
+    stream["chunks"] = ["data: {not json\n\n", _delta("ok"), "data: [DONE]\n\n"]
+    assert _collect()[0] == ["ok"]
+
+def test_fallback_replaces_a_failed_or_empty_stream(stream):
+    stream["error"] = OSError("connection refused")
+    assert list(groq_helper._stream_with_fallback("prompt", 100, "key", "fallback text")) == ["fallback text"]
+
+    del stream["error"]
+    stream["chunks"] = [_delta("   "), "data: [DONE]\n\n"]
+    assert list(groq_helper._stream_with_fallback("prompt", 100, "key", "fallback text")) == ["fallback text"]
+
+def test_fallback_strips_leading_whitespace_and_keeps_partial_output(stream):
+    stream["chunks"] = [_delta("\n "), _delta("  Stay at"), _delta(" the Ritz"), OSError("reset")]
+    usages = []
+    fragments = list(groq_helper._stream_with_fallback("prompt", 100, "key", "fallback text", on_usage=usages.append))
+    assert fragments == ["Stay at", " the Ritz"]
+    assert usages == []
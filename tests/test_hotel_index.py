@@ -0,0 +1,50 @@
+import math
+
+import pytest
+
+from hotel_index import _matches, describe_hotel, parse_preferences
+
+@pytest.mark.parametrize("text, semantic, filters", [
+    ("quiet, near old town, under $150", "quiet, near old town", {"max_price": 150.0}),
+    ("cheap under 99€ near beach", "cheap near beach", {"max_price": 99.0}),
+    ("max 1,200 INR", "", {"max_price": 1200.0}),
+    ("up to 150.50 eur, with breakfast", "with breakfast", {"max_price": 150.5}),
+    ("near station <150$", "near station", {"max_price": 150.0}),
+    ("pool, 4-star", "pool", {"min_stars": 4.0}),
+    ("at least 3 stars, spa", "spa", {"min_stars": 3.0}),
+    ("rated above 8.5, family rooms", "family rooms", {"min_rating": 4.25}),
+    ("rating 4.5+", "", {"min_rating": 4.5}),
+    ("boutique, 5 star, rated 9, below £300", "boutique", {"max_price": 300.0, "min_stars": 5.0, "min_rating": 4.5}),
+])
+def test_parse_preferences_extracts_hard_filters(text, semantic, filters):
+    assert parse_preferences(text) == (semantic, filters)
+
+@pytest.mark.parametrize("text", ["romantic boutique hotel", "undercover spa, maximalist decor", "quiet room with a view", ""])
+def test_parse_preferences_passes_plain_text_through(text):
+    assert parse_preferences(text) == (text, {})
+
+def _hotel(price=120.0, stars="4 stars", rating=4.3):
+    return {"name": "Le Grand", "price_value": price, "stars": stars, "rating_normalized": rating}
+
+@pytest.mark.parametrize("hotel, filters, expected", [
+    (_hotel(), {}, True),
+    (_hotel(), {"max_price": 150.0, "min_stars": 4.0, "min_rating": 4.0}, True),
+    (_hotel(price=150.0), {"max_price": 150.0}, True),
+    (_hotel(price=151.0), {"max_price": 150.0}, False),
+    # An unknown price never passes a price cap
+    (_hotel(price=math.inf), {"max_price": 150.0}, False),
+    (_hotel(price=None), {"max_price": 150.0}, False),
+    (_hotel(price="€ 120"), {"max_price": 150.0}, False),
+    (_hotel(stars="3-star"), {"min_stars": 4.0}, False),
+    (_hotel(stars=None), {"min_stars": 1.0}, False),
+    (_hotel(stars=5), {"min_stars": 4.0}, True),
+    (_hotel(rating=3.9), {"min_rating": 4.0}, False),
+    (_hotel(rating=None), {"min_rating": 1.0}, False),
+])
+def test_matches(hotel, filters, expected):
+    assert _matches(hotel, filters) is expected
+
+def test_describe_hotel_skips_missing_fields_and_the_price():
+    hotel = {"name": "Le Grand", "description": "Rooftop bar", "location": "Opera", "address": "", "stars": 4, "rating": "8.9", "price": "€ 180"}
+    assert describe_hotel(hotel) == "Le Grand. Rooftop bar. Opera. 4-star hotel. rated 8.9"
+    assert describe_hotel({"name": "Le Petit"}) == "Le Petit"
@@ -0,0 +1,99 @@
+import pytest
+
+import job_queue
+from job_queue import Broker, InMemoryBroker, Job, JobFailed, SQLiteBroker, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(job_queue, "time", lambda: now[0])
+    return now
+
+@pytest.fixture(params=["memory", "sqlite"])
+def broker(request, tmp_path, clock):
+    if request.param == "memory":
+        return InMemoryBroker()
+    return SQLiteBroker(str(tmp_path / "jobs.sqlite3"))
+
+def test_broker_is_abstract():
+    with pytest.raises(TypeError):
+        Broker()
+
+def test_claim_takes_the_highest_priority_job_first(broker, clock):
+    background = Job("kayak", {"n": 1}, PRIORITY_BACKGROUND)
+    broker.enqueue(background)
+    clock[0] += 1
+    interactive = Job("kayak", {"n": 2}, PRIORITY_INTERACTIVE)
+    broker.enqueue(interactive)
+
+    first = broker.claim("scrape", "w1")
+    assert (first.id, first.payload, first.attempts) == (interactive.id, {"n": 2}, 1)
+    assert broker.claim("scrape", "w1").id == background.id
+    assert broker.claim("scrape", "w1") is None
+
+def test_claim_only_takes_jobs_of_its_queue(broker):
+    broker.enqueue(Job("kayak", {}, queue="other"))
+    assert broker.claim("scrape", "w1") is None
+    assert broker.claim("other", "w1") is not None
+
+def test_acked_result_is_published_once(broker):
+    job = Job("kayak", {})
+    broker.enqueue(job)
+    broker.ack(broker.claim("scrape", "w1"), result=[{"name": "A"}])
+    assert broker.wait_result(job.id, timeout=1) == [{"name": "A"}]
+    assert broker.claim("scrape", "w1") is None
+    with pytest.raises(TimeoutError):
+        broker.wait_result(job.id, timeout=0.05, poll_interval=0.01)
+
+def test_acked_error_raises_job_failed(broker):
+    job = Job("kayak", {})
+    broker.enqueue(job)
+    broker.ack(broker.claim("scrape", "w1"), error="blocked")
+    with pytest.raises(JobFailed, match="blocked"):
+        broker.wait_result(job.id, timeout=1)
+
+def test_claimed_job_is_redelivered_after_its_visibility_timeout(broker, clock):
+    job = Job("kayak", {})
+    broker.enqueue(job)
+    assert broker.claim("scrape", "w1", visibility_timeout=30).attempts == 1
+    clock[0] += 29
+    assert broker.claim("scrape", "w2", visibility_timeout=30) is None
+    clock[0] += 1
+    redelivered = broker.claim("scrape", "w2", visibility_timeout=30)
+    assert (redelivered.id, redelivered.attempts) == (job.id, 2)
+
+def test_job_fails_after_max_attempts(broker, clock):
+    job = Job("kayak", {}, max_attempts=2)
+    broker.enqueue(job)
+    for _ in range(2):
+        assert broker.claim("scrape", "w1", visibility_timeout=10) is not None
+        clock[0] += 10
+    assert broker.claim("scrape", "w1", visibility_timeout=10) is None
+    with pytest.raises(JobFailed, match="Gave up after 2 attempts"):
+        broker.wait_result(job.id, timeout=1)
+
+def test_cancelled_job_is_not_claimed_and_its_ack_is_dropped(broker):
+    job = Job("kayak", {})
+    broker.enqueue(job)
+    claimed = broker.claim("scrape", "w1")
+    broker.cancel(job.id)
+    broker.ack(claimed, result=[{"name": "late"}])
+    assert broker.claim("scrape", "w1") is None
+    with pytest.raises(TimeoutError):
+        broker.wait_result(job.id, timeout=0.05, poll_interval=0.01)
+
+def test_sqlite_purges_results_nobody_fetched(tmp_path, clock):
+    broker = SQLiteBroker(str(tmp_path / "jobs.sqlite3"))
+    abandoned, recent, fresh = Job("kayak", {}), Job("kayak", {}), Job("kayak", {})
+    for offset, job in enumerate((abandoned, recent, fresh)):
+        job.enqueued_at += offset
+        broker.enqueue(job)
+    broker.ack(broker.claim("scrape", "w1"), result=1)
+    clock[0] += job_queue.RESULT_TTL / 2
+    broker.ack(broker.claim("scrape", "w1"), result=2)
+    clock[0] += job_queue.RESULT_TTL / 2 + 1
+    broker.ack(broker.claim("scrape", "w1"), result=3)
+
+    rows = broker._connection().execute("SELECT job_id FROM results").fetchall()
+    assert {row[0] for row in rows} == {recent.id, fresh.id}
+    assert broker.wait_result(recent.id, timeout=1) == 2
@@ -0,0 +1,153 @@
+import base64
+import json
+
+import pytest
+
+from network_capture import BOOKING_API_PATTERNS, collect_json_responses, parse_booking_payload, parse_kayak_payload
+
+LINK = "https://search.example/"
+
+def _booking_record(name="Le Grand", price=18500, score=8.6, **extra):
+    record = {
+        "displayName": {"text": name},
+        "basicPropertyData": {
+            "id": 101,
+            "reviewScore": {"score": score, "reviewCount": 1234},
+            "starRating": {"value": 4},
+            "location": {"address": "1 Rue de Rivoli", "city": "Paris", "latitude": 48.86, "longitude": 2.34},
+        },
+        "priceDisplayInfoIrene": {"displayPrice": {"amountPerStay": {"amountUnformatted": price}}},
+        "location": {"displayLocation": "Le Marais"},
+    }
+    record.update(extra)
+    return record
+
+def _booking_payload(*records):
+    return {"data": {"searchQueries": {"search": {"results": list(records)}}}}
+
+def test_booking_record_fields():
+    [hotel] = parse_booking_payload(_booking_payload(_booking_record()), LINK)
+    assert hotel == {
+        "name": "Le Grand",
+        "price": "₹18,500",
+        "price_value": 18500.0,
+        "rating": "Scored 8.6",
+        "rating_normalized": 4.3,
+        "review_count": 1234,
+        "stars": 4,
+        "location": "Le Marais",
+        "address": "1 Rue de Rivoli",
+        "latitude": 48.86,
+        "longitude": 2.34,
+        "hotel_id": "101",
+        "source": "Booking.com",
+        "booking_link": LINK,
+    }
+
+def test_booking_missing_price_or_rating():
+    no_price = _booking_record("No Price", price=None)
+    no_rating = _booking_record("No Rating", score=None)
+    neither = _booking_record("Neither", price=None, score=None)
+    hotels = parse_booking_payload(_booking_payload(no_price, no_rating, neither), LINK)
+    assert [hotel["name"] for hotel in hotels] == ["No Price", "No Rating"]
+    assert "price_value" not in hotels[0] and hotels[0]["rating_normalized"] == 4.3
+    assert "rating" not in hotels[1] and hotels[1]["price_value"] == 18500.0
+
+def test_booking_price_from_a_formatted_string():
+    record = _booking_record(priceDisplayInfoIrene={"displayPrice": {"amountPerStay": {"amount": "₹ 12,345.50"}}})
+    assert parse_booking_payload([record], LINK)[0]["price_value"] == 12345.5
+
+def test_booking_hotels_keep_the_page_order():
+    payload = {"data": {"promoted": [_booking_record("First")], "results": [_booking_record(f"Hotel {index}") for index in range(3)]}}
+    assert [hotel["name"] for hotel in parse_booking_payload(payload, LINK)] == ["First", "Hotel 0", "Hotel 1", "Hotel 2"]
+
+@pytest.mark.parametrize("results", [None, "unavailable", 42, {}])
+def test_booking_non_list_results_node(results):
+    assert parse_booking_payload({"data": {"searchQueries": {"search": {"results": results}}}}, LINK) == []
+
+def test_booking_single_record_results_node():
+    # A results node that is one object rather than a list still yields its hotel
+    hotels = parse_booking_payload({"data": {"search": {"results": _booking_record()}}}, LINK)
+    assert [hotel["name"] for hotel in hotels] == ["Le Grand"]
+
+def test_booking_nameless_and_malformed_records_are_skipped():
+    nameless = _booking_record(name=None)
+    nameless["basicPropertyData"].pop("name", None)
+    malformed = _booking_record("Bad Count")
+    malformed["basicPropertyData"]["reviewScore"]["reviewCount"] = "many"
+    hotels = parse_booking_payload(_booking_payload(nameless, malformed, _booking_record("Kept")), LINK)
+    assert [hotel["name"] for hotel in hotels] == ["Kept"]
+
+def _kayak_record(name="Hotel Lutetia", price="$312", rating=9.1, **extra):
+    record = {"hotelId": "k-7", "hotelName": name, "price": {"price": price}, "reviewScore": rating, "ratingLabel": "Wonderful", "reviewCount": 880, "stars": "5", "neighborhood": "Saint-Germain"}
+    record.update(extra)
+    return {key: value for key, value in record.items() if value is not None}
+
+def test_kayak_record_fields():
+    [hotel] = parse_kayak_payload({"results": [_kayak_record()]}, LINK)
+    assert hotel == {
+        "name": "Hotel Lutetia",
+        "price": "$312/night",
+        "price_value": 312.0,
+        "rating": "9.1 Wonderful",
+        "rating_normalized": 4.55,
+        "review_count": 880,
+        "stars": 5,
+        "location": "Saint-Germain",
+        "hotel_id": "k-7",
+        "source": "Kayak",
+        "booking_link": LINK,
+    }
+
+def test_kayak_missing_price_or_rating():
+    no_price = _kayak_record("No Price", price=None)
+    no_rating = _kayak_record("No Rating", rating=None, ratingLabel=None)
+    neither = _kayak_record("Neither", price=None, rating=None)
+    hotels = parse_kayak_payload({"results": [no_price, no_rating, neither]}, LINK)
+    assert [hotel["name"] for hotel in hotels] == ["No Price", "No Rating"]
+    assert "price" not in hotels[0]
+    assert "rating" not in hotels[1] and hotels[1]["price_value"] == 312.0
+
+def test_kayak_unknown_stars_are_dropped():
+    [hotel] = parse_kayak_payload([_kayak_record(stars="n/a")], LINK)
+    assert "stars" not in hotel
+
+@pytest.mark.parametrize("payload", [{"results": None}, {"results": "none"}, {"results": {}}, [], None])
+def test_kayak_non_list_results_node(payload):
+    assert parse_kayak_payload(payload, LINK) == []
+
+class FakeDriver:
+    def __init__(self, messages, bodies):
+        self.messages = messages
+        self.bodies = bodies
+
+    def get_log(self, log_type):
+        messages, self.messages = self.messages, []
+        return [{"message": json.dumps({"message": message})} for message in messages]
+
+    def execute_cdp_cmd(self, command, params):
+        return self.bodies[params["requestId"]]
+
+def _response(request_id, url, mime_type="application/json"):
+    return {"method": "Network.responseReceived", "params": {"requestId": request_id, "response": {"url": url, "mimeType": mime_type}}}
+
+def _finished(request_id):
+    return {"method": "Network.loadingFinished", "params": {"requestId": request_id}}
+
+def test_collect_json_responses_waits_for_finished_matching_bodies():
+    payload = _booking_payload(_booking_record())
+    graphql = "https://www.booking.com/dml/graphql?lang=en"
+    driver = FakeDriver(
+        [_response("1", graphql), _response("2", "https://www.booking.com/other"), _response("3", graphql, "text/html"), _response("4", graphql)],
+        {
+            "1": {"body": base64.b64encode(json.dumps(payload).encode()).decode(), "base64Encoded": True},
+            "4": {"body": "{not json"},
+        },
+    )
+    pending = {}
+    assert collect_json_responses(driver, BOOKING_API_PATTERNS, pending) == []
+    assert pending == {"1": graphql, "4": graphql}
+
+    driver.messages = [_finished("1"), _finished("2"), _finished("4")]
+    assert collect_json_responses(driver, BOOKING_API_PATTERNS, pending) == [{"url": graphql, "payload": payload}]
+    assert pending == {}
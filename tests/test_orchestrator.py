@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+import orchestrator
+from orchestrator import HedgeStats, LatencyTracker, is_hedge_attempt, run_providers
+from provider_guard import ProviderGuard
+
+P90 = 0.05
+
+@pytest.fixture(autouse=True)
+def fresh_registries(monkeypatch):
+    # Guards with room for every attempt, and no latencies or hedge stats from other tests
+    guards = {}
+    monkeypatch.setattr(orchestrator, "get_guard", lambda provider: guards.setdefault(provider, ProviderGuard(provider, rate=1000.0, burst=1000, max_concurrency=8, target_latency=30.0)))
+    monkeypatch.setattr(orchestrator, "_latencies", {})
+    monkeypatch.setattr(orchestrator, "_hedge_stats", {})
+    monkeypatch.setattr(orchestrator, "HEDGE_BUDGET", 0.1)
+
+def _seed_latencies(provider: str, latency: float = P90):
+    tracker = orchestrator._tracker(provider)
+    for _ in range(orchestrator.HEDGE_MIN_SAMPLES):
+        tracker.record(latency)
+
+class SlowPrimary:
+    """The first attempt hangs until cancelled; a hedge attempt answers at once."""
+
+    def __init__(self, hold: float = 5.0):
+        self.hold = hold
+        self.attempts = []
+        self.primary_cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, cancel_event: threading.Event):
+        hedge = is_hedge_attempt()
+        with self._lock:
+            self.attempts.append("hedge" if hedge else "primary")
+        if hedge:
+            return [{"name": "from hedge"}]
+        if cancel_event.wait(self.hold):
+            self.primary_cancelled.set()
+            return []
+        return [{"name": "from primary"}]
+
+def test_latency_tracker_needs_enough_samples():
+    tracker = LatencyTracker()
+    for latency in range(1, 11):
+        tracker.record(float(latency))
+    assert tracker.percentile(0.9, min_samples=20) is None
+    assert tracker.percentile(0.9, min_samples=10) == 10.0
+    assert tracker.percentile(0.5, min_samples=10) == 6.0
+
+def test_hedge_budget_allows_the_first_hedge_then_a_fraction_of_calls():
+    stats = HedgeStats()
+    assert stats.try_spend(0.1)
+    assert not stats.try_spend(0.1)
+    for _ in range(10):
+        stats.count_primary()
+    assert stats.try_spend(0.1)
+    assert not stats.try_spend(0.1)
+    assert stats.snapshot()["hedges"] == 2
+    assert stats.snapshot()["skipped_budget"] == 2
+
+def test_slow_call_is_hedged_and_the_loser_cancelled():
+    _seed_latencies("slow")
+    provider = SlowPrimary()
+    started = time.monotonic()
+    result = run_providers({"slow": provider}, hedge=True)
+    assert result == {"slow": [{"name": "from hedge"}]}
+    assert time.monotonic() - started < provider.hold
+    assert provider.primary_cancelled.wait(2)
+    assert provider.attempts == ["primary", "hedge"]
+    stats = orchestrator._stats("slow").snapshot()
+    assert (stats["primary_calls"], stats["hedges"], stats["hedge_wins"]) == (1, 1, 1)
+
+def test_fast_call_is_not_hedged():
+    _seed_latencies("fast", latency=1.0)
+    calls = []
+    result = run_providers({"fast": lambda cancel_event: calls.append(is_hedge_attempt()) or [{"name": "A"}]}, hedge=True)
+    assert result == {"fast": [{"name": "A"}]}
+    assert calls == [False]
+    assert orchestrator._stats("fast").snapshot()["hedges"] == 0
+
+def test_no_hedge_without_enough_latency_samples():
+    provider = SlowPrimary(hold=0.3)
+    assert run_providers({"new": provider}, hedge=True) == {"new": [{"name": "from primary"}]}
+    assert provider.attempts == ["primary"]
+
+def test_exhausted_budget_waits_for_the_primary():
+    _seed_latencies("slow")
+    orchestrator._stats("slow").try_spend(0.1)  # the free hedge is already spent
+    provider = SlowPrimary(hold=0.3)
+    assert run_providers({"slow": provider}, hedge=True) == {"slow": [{"name": "from primary"}]}
+    assert provider.attempts == ["primary"]
+    assert orchestrator._stats("slow").snapshot()["skipped_budget"] == 1
+
+def test_calls_with_a_cancel_event_are_never_hedged():
+    _seed_latencies("slow")
+    provider = SlowPrimary(hold=0.3)
+    result = run_providers({"slow": provider}, hedge=True, cancel_event=threading.Event())
+    assert result == {"slow": [{"name": "from primary"}]}
+    assert provider.attempts == ["primary"]
+    assert orchestrator._stats("slow").snapshot()["primary_calls"] == 0
+
+def test_cancel_event_reaches_the_provider_call():
+    cancel_event = threading.Event()
+    provider = SlowPrimary()
+    threading.Timer(0.05, cancel_event.set).start()
+    assert run_providers({"slow": provider}, cancel_event=cancel_event) == {"slow": []}
+    assert provider.primary_cancelled.is_set()
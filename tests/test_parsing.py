@@ -0,0 +1,100 @@
+import math
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import parsing
+from parsing import COMPACT_FIELDS, _expand_compact, _parse_booking_compact, normalize_hotels, normalize_price, parse_booking_page
+
+URL = "https://www.booking.com/searchresults.html?ss=Paris"
+
+def _card(name, price=None, rating=None):
+    price_html = f'<span data-testid="price-and-discounted-price">{price}</span>' if price else ""
+    rating_html = f'<div data-testid="review-score">{rating}</div>' if rating else ""
+    return f'<div data-testid="property-card"><div data-testid="title">{name}</div>{price_html}{rating_html}</div>'
+
+PAGE = "<html><body>" + "".join([
+    _card("Le Grand", "₹ 18,500", "Scored 8.6"),
+    _card("Petit Hôtel", "₹ 9,200"),
+    _card("Unpriced", rating="4.1"),
+    _card("Nothing Known"),
+]) + "</body></html>"
+
+EXPECTED = [
+    {"name": "Le Grand", "price": "₹18,500", "price_value": 18500.0, "rating": "Scored 8.6", "rating_normalized": 4.3},
+    {"name": "Petit Hôtel", "price": "₹9,200", "price_value": 9200.0},
+    {"name": "Unpriced", "rating": "Scored 4.1", "rating_normalized": 4.1},
+]
+
+@pytest.mark.parametrize("price, expected", [
+    ("₹ 1,234", 1234.0),
+    ("₹18,500", 18500.0),
+    ("US$99", 99.0),
+    ("$175/night", 175.0),
+    ("€ 89.50", 89.5),
+    (120, 120.0),
+    (99.5, 99.5),
+])
+def test_normalize_price(price, expected):
+    assert normalize_price(price) == expected
+
+@pytest.mark.parametrize("price", ["", None, 0, "Sold out", "1.2.3"])
+def test_unparseable_prices_sort_last(price):
+    assert normalize_price(price) == math.inf
+
+def test_normalize_hotels():
+    hotels = [
+        {"name": "Ten Scale", "rating": "Scored 9.0", "price": "$200"},
+        {"name": "Five Scale", "rating": "4.5 / 5", "source": "Kayak"},
+        {"name": "Wordy", "rating": "Fabulous"},
+        {"name": "Kept", "rating": "8", "rating_normalized": 3.9, "price": "$10", "price_value": 12.0},
+        {"rating": "9.0"},
+        "not a hotel",
+    ]
+    normalized = normalize_hotels(hotels, "Booking.com")
+    assert [(hotel["name"], hotel["rating_normalized"], hotel["source"]) for hotel in normalized] == [
+        ("Ten Scale", 4.5, "Booking.com"),
+        ("Five Scale", 4.5, "Kayak"),
+        ("Wordy", 3.0, "Booking.com"),
+        ("Kept", 3.9, "Booking.com"),
+    ]
+    assert normalized[0]["price_value"] == 200.0
+    assert "price_value" not in normalized[1]
+    assert normalized[3]["price_value"] == 12.0
+
+def test_compact_records_round_trip():
+    records = _parse_booking_compact(PAGE.encode("utf-8"))
+    assert all(len(record) == len(COMPACT_FIELDS) for record in records)
+    hotels = _expand_compact(records, "Booking.com", URL)
+    assert hotels == [dict(hotel, source="Booking.com", booking_link=URL) for hotel in EXPECTED]
+
+def test_parse_booking_page_inline(monkeypatch):
+    monkeypatch.setattr(parsing, "PARSE_WORKERS", 0)
+    assert parse_booking_page(PAGE, URL) == [dict(hotel, source="Booking.com", booking_link=URL) for hotel in EXPECTED]
+
+def test_parse_booking_page_in_a_worker_process(monkeypatch):
+    monkeypatch.setattr(parsing, "PARSE_WORKERS", 1)
+    monkeypatch.setattr(parsing, "_executor", None)
+    try:
+        assert parse_booking_page(PAGE, URL) == [dict(hotel, source="Booking.com", booking_link=URL) for hotel in EXPECTED]
+    finally:
+        if parsing._executor is not None:
+            parsing._executor.shutdown()
+
+def test_broken_pool_falls_back_to_inline_parsing(monkeypatch):
+    class BrokenPool:
+        shut_down = False
+
+        def submit(self, fn, *args):
+            raise BrokenProcessPool("worker died")
+
+        def shutdown(self, wait=True):
+            self.shut_down = True
+
+    broken = BrokenPool()
+    monkeypatch.setattr(parsing, "PARSE_WORKERS", 1)
+    monkeypatch.setattr(parsing, "_executor", broken)
+    assert parse_booking_page(PAGE, URL) == [dict(hotel, source="Booking.com", booking_link=URL) for hotel in EXPECTED]
+    # The broken pool is dropped so the next page starts a fresh one
+    assert broken.shut_down
+    assert parsing._executor is None
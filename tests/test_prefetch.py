@@ -0,0 +1,140 @@
+import threading
+import time
+
+import pytest
+
+# prefetch starts its searches through hotel_search, which needs selenium
+prefetch = pytest.importorskip("prefetch")
+from prefetch import SpeculativePrefetcher
+
+DEBOUNCE = 0.05
+PARIS = ("Paris", "2026-11-06", "2026-11-08", 2)
+
+class FakeCache:
+    def __init__(self):
+        self.keys = set()
+
+    def contains(self, key):
+        return key in self.keys
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = FakeCache()
+    monkeypatch.setattr(prefetch, "get_result_cache", lambda: cache)
+    return cache
+
+@pytest.fixture
+def searches(monkeypatch):
+    """Stub search: records its queries and runs until released or cancelled."""
+    state = {"calls": [], "cancel_events": [], "release": threading.Event()}
+
+    def search_hotels(location, check_in_date, check_out_date, num_adults, credentials=None, background=False, cancel_event=None):
+        assert background
+        state["calls"].append((location, check_in_date, check_out_date, num_adults))
+        state["cancel_events"].append(cancel_event)
+        while not state["release"].is_set() and not cancel_event.is_set():
+            time.sleep(0.005)
+        return []
+
+    monkeypatch.setattr(prefetch, "search_hotels", search_hotels)
+    yield state
+    state["release"].set()
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+def test_search_starts_once_the_inputs_settle(cache, searches):
+    prefetcher = SpeculativePrefetcher(debounce=DEBOUNCE)
+    for location in ("Pa", "Par", "Pari", "Paris"):
+        prefetcher.observe("session", location, "2026-11-06", "2026-11-08", 2)
+    # Repeating the same inputs does not restart the debounce
+    prefetcher.observe("session", "Paris", "2026-11-06", "2026-11-08", 2)
+    _wait_for(lambda: searches["calls"])
+    time.sleep(DEBOUNCE * 2)
+    assert searches["calls"] == [PARIS]
+    # "Pa" was too short to schedule; "Par" and "Pari" were replaced before they started
+    assert prefetcher.stats["scheduled"] == 3
+    assert prefetcher.stats["cancelled"] == 2
+    assert prefetcher.stats["started"] == 1
+
+    searches["release"].set()
+    _wait_for(lambda: prefetcher.stats["completed"] == 1)
+    assert prefetcher._running == 0 and prefetcher._sessions == {}
+
+def test_incomplete_or_cached_inputs_are_not_searched(cache, searches):
+    prefetcher = SpeculativePrefetcher(debounce=DEBOUNCE)
+    prefetcher.observe("a", "Paris", "2026-11-06", None, 2)
+    prefetcher.observe("b", "Pa", "2026-11-06", "2026-11-08", 2)
+    cache.keys.add(prefetch.make_cache_key(*PARIS))
+    prefetcher.observe("c", *PARIS)
+    time.sleep(DEBOUNCE * 3)
+    assert searches["calls"] == []
+    assert prefetcher.stats["scheduled"] == 0
+
+def test_changing_the_inputs_cancels_the_running_search(cache, searches):
+    prefetcher = SpeculativePrefetcher(debounce=DEBOUNCE)
+    prefetcher.observe("session", *PARIS)
+    _wait_for(lambda: searches["calls"])
+    prefetcher.observe("session", "London", "2026-11-06", "2026-11-08", 2)
+    assert searches["cancel_events"][0].is_set()
+    _wait_for(lambda: len(searches["calls"]) == 2)
+    assert searches["calls"][1][0] == "London"
+    assert not searches["cancel_events"][1].is_set()
+
+def test_sessions_are_cancelled_independently(cache, searches):
+    prefetcher = SpeculativePrefetcher(debounce=DEBOUNCE)
+    prefetcher.observe("alice", *PARIS)
+    prefetcher.observe("bob", "London", "2026-11-06", "2026-11-08", 2)
+    _wait_for(lambda: len(searches["calls"]) == 2)
+    events = dict(zip((call[0] for call in searches["calls"]), searches["cancel_events"]))
+    prefetcher.cancel("alice")
+    assert events["Paris"].is_set()
+    assert not events["London"].is_set()
+    # Cancelling a session without a search is a no-op
+    prefetcher.cancel("carol")
+    assert prefetcher.stats["cancelled"] == 1
+
+def test_a_pending_search_is_cancelled_before_it_starts(cache, searches):
+    prefetcher = SpeculativePrefetcher(debounce=DEBOUNCE)
+    prefetcher.observe("session", *PARIS)
+    prefetcher.cancel("session")
+    time.sleep(DEBOUNCE * 3)
+    assert searches["calls"] == []
+
+def test_concurrency_cap_is_global(cache, searches):
+    prefetcher = SpeculativePrefetcher(debounce=DEBOUNCE, max_concurrent=2)
+    for index in range(4):
+        prefetcher.observe(f"session-{index}", f"City {index}", "2026-11-06", "2026-11-08", 2)
+    _wait_for(lambda: prefetcher.stats["started"] + prefetcher.stats["skipped_cap"] == 4)
+    assert prefetcher.stats["started"] == 2 and prefetcher.stats["skipped_cap"] == 2
+    _wait_for(lambda: len(searches["calls"]) == 2)
+
+    # Once the running searches finish there is room again
+    searches["release"].set()
+    _wait_for(lambda: prefetcher._running == 0)
+    prefetcher.observe("session-9", "Lisbon", "2026-11-06", "2026-11-08", 2)
+    _wait_for(lambda: prefetcher.stats["started"] == 3)
+
+def test_per_minute_cap(cache, searches, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prefetch, "monotonic", lambda: now[0])
+    searches["release"].set()
+    prefetcher = SpeculativePrefetcher(debounce=DEBOUNCE, max_concurrent=5, max_per_minute=2)
+
+    def observe(session):
+        decided = prefetcher.stats["started"] + prefetcher.stats["skipped_cap"]
+        prefetcher.observe(session, f"City {session}", "2026-11-06", "2026-11-08", 2)
+        _wait_for(lambda: prefetcher.stats["started"] + prefetcher.stats["skipped_cap"] > decided and prefetcher._running == 0)
+
+    for session in ("a", "b", "c"):
+        observe(session)
+    assert (prefetcher.stats["started"], prefetcher.stats["skipped_cap"]) == (2, 1)
+
+    # Skipped inputs are retried when observed again, and starts older than a minute no longer count
+    assert prefetcher._sessions == {}
+    now[0] += 61
+    observe("c")
+    assert prefetcher.stats["started"] == 3
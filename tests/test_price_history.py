@@ -0,0 +1,81 @@
+import math
+
+import pytest
+
+import price_history
+from price_history import PriceHistoryStore, hotel_key
+
+PARIS = ("Paris", "2026-11-06", "2026-11-08", 2)
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # The writer still batches, without waiting seconds for more rows
+    monkeypatch.setattr(price_history, "WRITE_INTERVAL", 0.05)
+    return PriceHistoryStore(str(tmp_path / "history.sqlite3"))
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_800_000_000.0]
+    monkeypatch.setattr(price_history, "time", lambda: now[0])
+    return now
+
+def _hotel(name, price, rating=4.2, source="Booking.com", **extra):
+    return dict({"name": name, "price_value": price, "rating_normalized": rating, "source": source}, **extra)
+
+def test_hotel_key_prefers_the_provider_id():
+    assert hotel_key({"source": "Kayak", "hotel_id": 42, "name": "X"}) == "Kayak:42"
+    assert hotel_key(_hotel("Hôtel  Le Grand", 1)) == hotel_key(_hotel("hotel le grand", 2))
+    assert hotel_key(_hotel("Le Grand", 1)) != hotel_key(_hotel("Le Grand", 1, source="Kayak"))
+
+def test_reading_before_any_write_is_empty(store):
+    assert store.hotel_history(_hotel("Le Grand", 100.0)) == []
+    assert store.city_price_trend("Paris") == []
+
+def test_recorded_observations_are_written_in_batches(store, clock):
+    store.record(*PARIS, [_hotel("Le Grand", 180.0), _hotel("Petit", 90.0, rating=float("nan"))])
+    clock[0] += 3600
+    store.record(*PARIS, [_hotel("Le Grand", 150.0)])
+    assert store.flush()
+
+    history = store.hotel_history(_hotel("le grand", 0))
+    assert [(row["observed_at"], row["price"], row["rating"]) for row in history] == [(1_800_000_000.0, 180.0, 4.2), (1_800_003_600.0, 150.0, 4.2)]
+    assert history[0]["check_in_date"] == "2026-11-06" and history[0]["num_adults"] == 2
+    assert store.hotel_history(_hotel("Petit", 0))[0]["rating"] is None
+    assert store.stats["written"] == 3
+    assert store.stats["dropped"] == 0
+
+def test_missing_prices_are_stored_as_null(store):
+    store.record(*PARIS, [_hotel("Le Grand", math.inf), _hotel("Petit", None), _hotel("Moyen", "€ 120"), _hotel("Cher", 300.0)])
+    assert store.flush()
+    assert [row["price"] for row in store.hotel_history(_hotel("Le Grand", 0))] == [None]
+    assert [row["price"] for row in store.hotel_history(_hotel("Petit", 0))] == [None]
+    assert [row["price"] for row in store.hotel_history(_hotel("Moyen", 0))] == [None]
+
+    # Day statistics ignore the NULL prices
+    trend = store.city_price_trend("paris")
+    assert len(trend) == 1
+    assert (trend[0]["observations"], trend[0]["min_price"], trend[0]["max_price"]) == (1, 300.0, 300.0)
+
+def test_sample_and_nameless_hotels_are_skipped(store):
+    store.record(*PARIS, [_hotel("Sample Inn", 99.0, sample=True), _hotel("", 80.0), _hotel("Real", 120.0)])
+    assert store.flush()
+    assert store.hotel_history(_hotel("Sample Inn", 0)) == []
+    assert store.stats["written"] == 1
+
+def test_history_filters(store, clock):
+    store.record("Paris", "2026-11-06", "2026-11-08", 2, [_hotel("Le Grand", 180.0)])
+    clock[0] += 86400
+    store.record("Paris", "2026-12-01", "2026-12-03", 2, [_hotel("Le Grand", 210.0)])
+    assert store.flush()
+    hotel = _hotel("Le Grand", 0)
+    assert [row["price"] for row in store.hotel_history(hotel, check_in_date="2026-12-01")] == [210.0]
+    assert [row["price"] for row in store.hotel_history(hotel, since=clock[0])] == [210.0]
+    assert [row["avg_price"] for row in store.city_price_trend("Paris", check_in_date="2026-11-06")] == [180.0]
+
+def test_recording_is_opt_in(monkeypatch):
+    def fail():
+        raise AssertionError("price history used while disabled")
+
+    monkeypatch.setattr(price_history, "get_price_history", fail)
+    monkeypatch.setattr(price_history, "PRICE_HISTORY_ENABLED", False)
+    price_history.record_observations(*PARIS, [_hotel("Le Grand", 180.0)])
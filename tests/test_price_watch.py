@@ -0,0 +1,151 @@
+from datetime import date, timedelta
+
+import pytest
+
+# price_watch searches through hotel_search, which needs the scraping dependencies
+price_watch = pytest.importorskip("price_watch")
+from price_watch import PriceWatcher, RECHECK_INTERVALS, RETRY_DELAY, recheck_interval
+
+class NoWait:
+    # Stands in for the watcher's condition so _next_group returns instead of sleeping
+    def wait(self, timeout=None):
+        return False
+
+    def notify(self):
+        pass
+
+def _day(days: int) -> str:
+    return (date.today() + timedelta(days=days)).isoformat()
+
+def _hotel(name: str, price: float, source: str = "Booking.com"):
+    return {"name": name, "price_value": price, "source": source, "booking_link": f"https://example.com/{name}"}
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(price_watch, "time", lambda: now[0])
+    return now
+
+@pytest.fixture
+def results(monkeypatch):
+    # Hotels the next search returns, and the searches made
+    state = {"hotels": [], "searches": []}
+
+    def search_hotels(**kwargs):
+        state["searches"].append(kwargs)
+        return [dict(hotel) for hotel in state["hotels"]]
+
+    monkeypatch.setattr(price_watch, "search_hotels", search_hotels)
+    return state
+
+@pytest.fixture
+def watcher(tmp_path, clock, results):
+    watcher = PriceWatcher(str(tmp_path / "watches.sqlite3"), max_checks_per_hour=10)
+    watcher._wakeup = NoWait()
+    return watcher
+
+def _check_next(watcher):
+    group_key = watcher._next_group()
+    assert group_key is not None
+    try:
+        watcher.check_group(group_key)
+    finally:
+        watcher._checking.discard(group_key)
+    return group_key
+
+@pytest.mark.parametrize("days, interval", [(0, 3600), (2, 3600), (3, 3 * 3600), (7, 3 * 3600), (8, 12 * 3600), (30, 12 * 3600), (31, 24 * 3600), (365, 24 * 3600)])
+def test_recheck_interval_shrinks_as_check_in_nears(days, interval):
+    assert recheck_interval(_day(days)) == interval
+
+def test_recheck_intervals_end_with_a_catch_all():
+    assert RECHECK_INTERVALS[-1][0] is None
+
+def test_due_groups_are_checked_soonest_check_in_first(watcher):
+    watcher.add_watch("alice", "Paris", _day(20), _day(22))
+    watcher.add_watch("bob", "Rome", _day(3), _day(5))
+    watcher.add_watch("carol", "Oslo", _day(10), _day(11))
+    order = [watcher._next_group() for _ in range(3)]
+    assert [price_watch.json.loads(key)[1] for key in order] == [_day(3), _day(10), _day(20)]
+    assert watcher._next_group() is None
+
+def test_watches_on_the_same_search_share_one_check(watcher, results):
+    watcher.add_watch("alice", "Paris", _day(20), _day(22))
+    watcher.add_watch("bob", "Paris", _day(20), _day(22))
+    _check_next(watcher)
+    assert len(results["searches"]) == 1
+    assert watcher._next_group() is None
+
+def test_price_drop_is_reported_and_persisted(watcher, results, clock, tmp_path):
+    hooked = []
+    watcher.add_hook(hooked.append)
+    watch_id = watcher.add_watch("alice", "Paris", _day(20), _day(22))
+
+    # The first check only records the baseline
+    results["hotels"] = [_hotel("Le Grand", 200.0), _hotel("Petit", 90.0)]
+    _check_next(watcher)
+    assert hooked == [] and watcher.pop_events("alice") == []
+    assert watcher._next_group() is None
+
+    clock[0] += recheck_interval(_day(20))
+    results["hotels"] = [_hotel("Le Grand", 150.0), _hotel("Petit", 90.0)]
+    _check_next(watcher)
+    assert len(hooked) == 1
+    event = hooked[0]
+    assert (event["watch_id"], event["hotel"], event["old_price"], event["new_price"]) == (watch_id, "Le Grand", 200.0, 150.0)
+    assert watcher.stats["events"] == 1
+
+    # Events are stored until collected, so another process (or a restart) delivers them
+    reopened = PriceWatcher(watcher.path)
+    assert reopened.has_owner("alice")
+    assert reopened.pop_events("alice") == [event]
+    assert reopened.pop_events("alice") == []
+
+def test_price_increase_is_not_reported_and_becomes_the_baseline(watcher, results, clock):
+    watcher.add_watch("alice", "Paris", _day(20), _day(22))
+    results["hotels"] = [_hotel("Le Grand", 200.0)]
+    _check_next(watcher)
+
+    clock[0] += recheck_interval(_day(20))
+    results["hotels"] = [_hotel("Le Grand", 260.0)]
+    _check_next(watcher)
+    assert watcher.pop_events("alice") == []
+
+    # A later drop is measured from the raised price
+    clock[0] += recheck_interval(_day(20))
+    results["hotels"] = [_hotel("Le Grand", 230.0)]
+    _check_next(watcher)
+    assert [(event["old_price"], event["new_price"]) for event in watcher.pop_events("alice")] == [(260.0, 230.0)]
+
+def test_unpriced_and_filtered_hotels_are_not_reported(watcher, results, clock):
+    watcher.add_watch("alice", "Paris", _day(20), _day(22), max_price=100.0)
+    watcher.add_watch("bob", "Paris", _day(20), _day(22), hotel=_hotel("Petit", 0))
+    results["hotels"] = [_hotel("Le Grand", 200.0), _hotel("Petit", float("inf"))]
+    _check_next(watcher)
+
+    clock[0] += recheck_interval(_day(20))
+    results["hotels"] = [_hotel("Le Grand", 150.0), _hotel("Petit", 80.0)]
+    _check_next(watcher)
+    # 150 is above alice's cap, and Petit had no price before, so nothing dropped
+    assert watcher.pop_events("alice") == [] and watcher.pop_events("bob") == []
+
+def test_check_over_the_hourly_budget_is_refused(tmp_path, clock, results):
+    watcher = PriceWatcher(str(tmp_path / "watches.sqlite3"), max_checks_per_hour=1)
+    watcher._wakeup = NoWait()
+    watcher.add_watch("alice", "Paris", _day(20), _day(22))
+    watcher.add_watch("bob", "Rome", _day(21), _day(22))
+    assert watcher._next_group() is not None
+    assert watcher._next_group() is None
+    clock[0] += 3601
+    assert watcher._next_group() is not None
+
+def test_check_without_results_retries_soon(watcher, results, clock):
+    watcher.add_watch("alice", "Paris", _day(20), _day(22))
+    group_key = _check_next(watcher)
+    assert watcher._due[group_key] == clock[0] + RETRY_DELAY
+
+def test_group_without_watches_is_dropped(watcher, results):
+    watch_id = watcher.add_watch("alice", "Paris", _day(20), _day(22))
+    assert watcher.remove_watch(watch_id, owner="alice")
+    _check_next(watcher)
+    assert results["searches"] == []
+    assert watcher._next_group() is None
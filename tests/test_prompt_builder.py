@@ -0,0 +1,86 @@
+import math
+
+import pytest
+
+from prompt_builder import HOTEL_TABLE_HEADER, build_recommendation_prompt, estimate_tokens, format_hotel_row, pack_hotel_table, score_hotels
+
+NO_PRIORITIES = {"budget": "moderate", "priorities": []}
+
+def _hotels(count):
+    return [
+        {
+            "name": f"Hotel {index} " + "Palace " * (index % 3),
+            "price": f"€ {80 + index * 13 % 200}",
+            "price_value": float(80 + index * 13 % 200),
+            "rating_normalized": 3 + index % 5 / 2.5,
+            "stars": f"{index % 5 + 1} stars",
+            "location": ["Le Marais", "Opera", "Montmartre"][index % 3],
+            "source": "Booking.com" if index % 2 else "Kayak",
+        }
+        for index in range(count)
+    ]
+
+def _score(hotel, preferences=NO_PRIORITIES, others=()):
+    return dict((id(scored), score) for score, scored in score_hotels([hotel, *others], preferences))[id(hotel)]
+
+def test_estimate_tokens_rounds_up():
+    assert [estimate_tokens(text) for text in ("", "abc", "abcd", "abcde")] == [0, 1, 1, 2]
+
+@pytest.mark.parametrize("token_budget", [60, 100, 250, 600])
+def test_packed_table_stays_within_the_token_budget(token_budget):
+    hotels = _hotels(60)
+    table, included = pack_hotel_table(hotels, NO_PRIORITIES, token_budget=token_budget, max_candidates=100)
+    assert estimate_tokens(table) <= token_budget
+    lines = table.split("\n")
+    assert lines[0] == HOTEL_TABLE_HEADER
+    assert len(lines) == len(included) + 1
+    # Best candidates first, and the next one would not have fit
+    ranked = [hotel for _, hotel in score_hotels(hotels, NO_PRIORITIES)]
+    assert included == ranked[:len(included)]
+    assert estimate_tokens(table + "\n" + format_hotel_row(len(included) + 1, ranked[len(included)])) > token_budget
+
+def test_a_larger_budget_lets_more_of_the_ranking_through():
+    hotels = _hotels(60)
+    counts = [len(pack_hotel_table(hotels, NO_PRIORITIES, token_budget=budget, max_candidates=100)[1]) for budget in (100, 300, 900)]
+    assert counts[0] < counts[1] < counts[2]
+
+def test_the_best_hotel_is_kept_even_over_a_tiny_budget():
+    table, included = pack_hotel_table(_hotels(5), NO_PRIORITIES, token_budget=1)
+    assert len(included) == 1
+    assert len(table.split("\n")) == 2
+
+def test_max_candidates_is_respected():
+    assert len(pack_hotel_table(_hotels(60), NO_PRIORITIES, token_budget=100_000, max_candidates=7)[1]) == 7
+    assert pack_hotel_table(_hotels(60), NO_PRIORITIES, token_budget=100_000, max_candidates=0)[1] == []
+
+@pytest.mark.parametrize("price", [math.inf, float("nan"), None, 0.0, -5.0])
+def test_unpriced_hotels_get_neutral_price_and_value_scores(price):
+    hotel = {"name": "Unpriced", "price_value": price, "rating_normalized": 4.0}
+    # rating 0.8 + price fit 0.5 + value weight 0.5 * (0.8 * 0.5)
+    assert _score(hotel) == pytest.approx(0.8 + 0.5 + 0.5 * 0.4)
+    assert _score(hotel, {"budget": 150, "priorities": []}) == pytest.approx(1.5)
+
+def test_unpriced_hotels_do_not_stretch_the_price_range():
+    cheap = {"name": "Cheap", "price_value": 100.0, "rating_normalized": 4.0}
+    dear = {"name": "Dear", "price_value": 200.0, "rating_normalized": 4.0}
+    unpriced = {"name": "Unknown", "price_value": math.inf, "rating_normalized": 4.0}
+    ranked = [hotel["name"] for _, hotel in score_hotels([dear, unpriced, cheap], {"budget": "budget", "priorities": []})]
+    assert ranked[0] == "Cheap"
+    # The cheapest hotel sits at the bottom of the range: a perfect fit for a budget target
+    assert _score(cheap, {"budget": "budget", "priorities": []}, others=[dear, unpriced]) == pytest.approx(0.8 + 1.0 + 0.5 * 0.8)
+
+def test_numeric_budget_is_a_soft_cap():
+    under = {"name": "Under", "price_value": 90.0, "rating_normalized": 4.0}
+    over = {"name": "Over", "price_value": 150.0, "rating_normalized": 4.0}
+    ranked = [hotel["name"] for _, hotel in score_hotels([over, under], {"budget": "100 EUR", "priorities": []})]
+    assert ranked == ["Under", "Over"]
+
+def test_preference_match_is_a_bonus():
+    plain = {"name": "Plain", "price_value": 100.0, "rating_normalized": 4.0}
+    matched = dict(plain, name="Matched", match_distance=0.2)
+    assert _score(matched) - _score(plain) == pytest.approx(1.5 * 0.8)
+
+def test_recommendation_prompt_counts_its_hotels():
+    prompt, count = build_recommendation_prompt(_hotels(40), {"budget": "luxury", "priorities": ["Amenities"]}, token_budget=200)
+    assert 0 < count < 40
+    assert HOTEL_TABLE_HEADER in prompt and "Budget: luxury" in prompt
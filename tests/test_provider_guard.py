@@ -0,0 +1,145 @@
+import pytest
+
+import provider_guard
+from provider_guard import TokenBucket, CircuitBreaker, AdaptiveLimiter, ProviderGuard, ProviderUnavailable
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(provider_guard, "monotonic", clock)
+    monkeypatch.setattr(provider_guard, "sleep", clock.sleep)
+    return clock
+
+def test_token_bucket_allows_a_burst_then_refills_at_rate(clock):
+    bucket = TokenBucket(rate=2.0, capacity=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+    clock.now += 0.5  # one token at 2 per second
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    clock.now += 60  # refills up to capacity, not beyond
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+def test_token_bucket_acquire_waits_for_a_token_within_the_timeout(clock):
+    bucket = TokenBucket(rate=1.0, capacity=1)
+    assert bucket.acquire(timeout=0)
+    started = clock.now
+    assert bucket.acquire(timeout=5)
+    assert clock.now - started == pytest.approx(1.0)
+
+def test_token_bucket_acquire_gives_up_when_the_token_comes_too_late(clock):
+    bucket = TokenBucket(rate=0.1, capacity=1)
+    assert bucket.acquire(timeout=0)
+    started = clock.now
+    assert not bucket.acquire(timeout=5)
+    assert clock.now == started
+
+def _tripped_breaker(clock) -> CircuitBreaker:
+    breaker = CircuitBreaker(window=4, min_calls=4, failure_threshold=0.5, open_seconds=60)
+    for success in (True, True, False, False):
+        assert breaker.allow()
+        breaker.record(success, 1.0)
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+def test_breaker_opens_on_failure_rate_and_rejects_until_open_seconds_pass(clock):
+    breaker = _tripped_breaker(clock)
+    assert not breaker.allow()
+    clock.now += 59
+    assert not breaker.allow()
+
+def test_breaker_half_open_lets_one_probe_through_and_closes_on_success(clock):
+    breaker = _tripped_breaker(clock)
+    clock.now += 60
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # only one probe at a time
+
+    breaker.record(True, 1.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+def test_breaker_half_open_probe_failure_or_slow_call_reopens(clock):
+    breaker = _tripped_breaker(clock)
+    clock.now += 60
+    assert breaker.allow()
+    breaker.record(False, 1.0)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    clock.now += 60
+    assert breaker.allow()
+    breaker.record(True, breaker.slow_call_seconds + 1)
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_breaker_released_probe_can_be_retried(clock):
+    breaker = _tripped_breaker(clock)
+    clock.now += 60
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow()
+
+def test_breaker_opens_on_slow_call_rate(clock):
+    breaker = CircuitBreaker(window=5, min_calls=5, slow_threshold=0.8, slow_call_seconds=10)
+    for latency in (11, 11, 11, 11):
+        breaker.record(True, latency)
+    assert breaker.state == CircuitBreaker.CLOSED  # below min_calls
+    breaker.record(True, 11)
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_adaptive_limiter_halves_on_failure_and_grows_additively():
+    limiter = AdaptiveLimiter(max_limit=8, target_latency=10)
+    assert limiter.acquire(0)
+    limiter.release(False, 1.0)
+    assert limiter.limit == 4
+    assert limiter.acquire(0)
+    limiter.release(True, 20.0)  # slow
+    assert limiter.limit == 2
+
+    for _ in range(2):
+        assert limiter.acquire(0)
+        limiter.release(True, 1.0)
+    assert limiter.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+
+def test_adaptive_limiter_bounds_and_cancelled_calls():
+    limiter = AdaptiveLimiter(max_limit=2, target_latency=10)
+    for _ in range(5):
+        assert limiter.acquire(0)
+        limiter.release(False, 1.0)
+    assert limiter.limit == limiter.min_limit
+
+    assert limiter.acquire(0)
+    assert not limiter.acquire(0)  # limit of one slot reached
+    limiter.release(None, 1.0)
+    assert limiter.limit == limiter.min_limit
+
+    limiter.limit = 2
+    for _ in range(10):
+        assert limiter.acquire(0)
+        limiter.release(True, 1.0)
+    assert limiter.limit == 2
+
+def test_guard_rejects_when_rate_limited_without_blocking(clock):
+    guard = ProviderGuard("Test", rate=0.01, burst=1, max_concurrency=2, target_latency=10)
+    assert guard.call(lambda: ["hotel"], block=False) == ["hotel"]
+    with pytest.raises(ProviderUnavailable):
+        guard.call(lambda: ["hotel"], block=False)
+    assert guard.snapshot()["rejected"] == 1
+
+def test_guard_counts_empty_results_as_failures(clock):
+    guard = ProviderGuard("Test", rate=100, burst=100, max_concurrency=4, target_latency=10)
+    assert guard.call(lambda: []) == []
+    snapshot = guard.snapshot()
+    assert snapshot["failures"] == 1
+    assert snapshot["concurrency_limit"] == 2
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache
+
+KEY = ("paris", "2026-11-06", "2026-11-08", 2)
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache, "monotonic", lambda: now[0])
+    return now
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = ResultCache(ttl=60)
+    cache.put(KEY, [{"name": "A"}])
+    clock[0] += 60
+    assert cache.get(KEY) == [{"name": "A"}]
+    clock[0] += 1
+    assert cache.get(KEY) is None
+    assert not cache.contains(KEY)
+
+def test_per_entry_ttl_overrides_the_default(clock):
+    cache = ResultCache(ttl=60)
+    cache.put(KEY, [{"name": "A"}], ttl=3600)
+    clock[0] += 600
+    assert cache.get(KEY) == [{"name": "A"}]
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResultCache(ttl=60, max_entries=2)
+    first, second, third = [("city", str(day), "x", 2) for day in range(3)]
+    cache.put(first, [{"name": "1"}])
+    cache.put(second, [{"name": "2"}])
+    assert cache.get(first)  # first is now the most recently used
+    cache.put(third, [{"name": "3"}])
+    assert cache.get(second) is None
+    assert cache.get(first) and cache.get(third)
+
+def test_results_are_copied_in_and_out(clock):
+    cache = ResultCache()
+    hotels = [{"name": "A"}]
+    cache.put(KEY, hotels)
+    hotels[0]["name"] = "changed"
+    cache.get(KEY)[0]["rating_num"] = 9
+    assert cache.get(KEY) == [{"name": "A"}]
+
+def test_get_or_compute_hits_after_a_stored_miss(clock):
+    cache = ResultCache()
+    calls = []
+
+    def compute(cursor):
+        calls.append(cursor)
+        cursor["next_offset"] = 75
+        return [{"name": "A"}]
+
+    assert cache.get_or_compute(KEY, compute) == [{"name": "A"}]
+    cursor = {"next_offset": 0, "exhausted": False}
+    assert cache.get_or_compute(KEY, compute, cursor=cursor) == [{"name": "A"}]
+    assert len(calls) == 1
+    assert cursor["next_offset"] == 75
+    assert cache.stats == {"hits": 1, "misses": 1, "joined": 0}
+
+def test_results_rejected_by_store_are_not_cached(clock):
+    cache = ResultCache()
+    assert cache.get_or_compute(KEY, lambda cursor: []) == []
+    assert cache.get_or_compute(KEY, lambda cursor: [{"name": "A"}], store=lambda results: False) == [{"name": "A"}]
+    assert cache.get(KEY) is None
+
+def _start_owner(cache, results):
+    started, release = threading.Event(), threading.Event()
+
+    def compute(cursor):
+        started.set()
+        release.wait(5)
+        return results
+
+    owner = threading.Thread(target=cache.get_or_compute, args=(KEY, compute))
+    owner.start()
+    assert started.wait(5)
+    return owner, release
+
+def _wait_until_joined(cache):
+    for _ in range(500):
+        if cache.stats["joined"]:
+            return
+        time.sleep(0.01)
+    pytest.fail("lookup never joined the search in flight")
+
+def test_concurrent_lookup_joins_the_search_in_flight():
+    cache = ResultCache()
+    owner, release = _start_owner(cache, [{"name": "A"}])
+    assert cache.contains(KEY)
+
+    joined = []
+    joiner = threading.Thread(target=lambda: joined.append(cache.get_or_compute(KEY, lambda cursor: pytest.fail("searched twice"))))
+    joiner.start()
+    _wait_until_joined(cache)
+    release.set()
+    owner.join(5)
+    joiner.join(5)
+    assert joined == [[{"name": "A"}]]
+    assert cache.stats["joined"] == 1
+
+def test_joiner_runs_its_own_search_when_the_joined_one_is_not_stored():
+    cache = ResultCache()
+    owner, release = _start_owner(cache, [])
+
+    joined = []
+    joiner = threading.Thread(target=lambda: joined.append(cache.get_or_compute(KEY, lambda cursor: [{"name": "B"}])))
+    joiner.start()
+    _wait_until_joined(cache)
+    release.set()
+    owner.join(5)
+    joiner.join(5)
+    assert joined == [[{"name": "B"}]]
@@ -0,0 +1,98 @@
+import json
+import os
+
+import pytest
+
+import snapshot_archive
+from snapshot_archive import SnapshotArchive
+
+DAY = 86400
+
+@pytest.fixture(params=["zlib", "zstd"])
+def codec(request, monkeypatch):
+    if request.param == "zstd":
+        monkeypatch.setattr(snapshot_archive, "zstandard", pytest.importorskip("zstandard"))
+    else:
+        monkeypatch.setattr(snapshot_archive, "zstandard", None)
+    return request.param
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_800_000_000.0]
+    monkeypatch.setattr(snapshot_archive, "time", lambda: now[0])
+    return now
+
+def _page(index: int) -> str:
+    # Distinct, compressible pages of a few KB
+    rows = "".join(f'<div data-testid="property-card"><h3>Hotel {index}-{row}</h3><span>€ {100 + row}</span></div>' for row in range(40))
+    return f"<html><body>{rows}</body></html>"
+
+QUERY = {"location": "Paris", "check_in_date": "2026-11-06", "check_out_date": "2026-11-08", "num_adults": 2, "offset": 0}
+
+def test_store_read_round_trip_and_dedup(tmp_path, codec, clock):
+    archive = SnapshotArchive(str(tmp_path))
+    first = archive.store(_page(1), "Booking.com", "html", "https://booking.example/1", QUERY)
+    again = archive.store(_page(1), "Booking.com", "html", "https://booking.example/1", QUERY)
+    payload = archive.store(json.dumps([{"results": []}]), "Kayak", "json", "https://kayak.example/")
+    assert first == again
+
+    assert archive.read(first).decode("utf-8") == _page(1)
+    assert json.loads(archive.read(payload)) == [{"results": []}]
+    usage = archive.usage()
+    assert (usage["snapshots"], usage["pages"]) == (3, 2)
+    assert usage["stored_bytes"] < usage["raw_bytes"] == len(_page(1).encode("utf-8")) + len(json.dumps([{"results": []}]))
+    codecs = {row["codec"] for row in archive._db.execute("SELECT codec FROM blobs")}
+    assert codecs == {codec}
+    assert [snapshot["url"] for snapshot in archive.find(provider="Booking.com")] == ["https://booking.example/1"] * 2
+
+    with pytest.raises(KeyError):
+        archive.read("0" * 64)
+
+def test_compact_expires_old_pages_and_rewrites_the_pack(tmp_path, codec, clock):
+    archive = SnapshotArchive(str(tmp_path), max_age_days=7)
+    old = [archive.store(_page(index), "Booking.com", "html", f"https://booking.example/{index}") for index in range(6)]
+    clock[0] += 5 * DAY
+    new = [archive.store(_page(index), "Booking.com", "html", f"https://booking.example/{index}") for index in range(4, 8)]
+    # Read through the memory map before the pack is replaced
+    assert archive.read(old[0]).decode("utf-8") == _page(0)
+    pack_size = os.path.getsize(archive.pack_path)
+
+    clock[0] += 3 * DAY
+    result = archive.compact()
+    assert result["expired"] == 6 and result["evicted"] == 0
+    assert result["reclaimed"] > 0
+    assert os.path.getsize(archive.pack_path) == pack_size - result["reclaimed"]
+
+    for index, digest in zip(range(4, 8), new):
+        assert archive.read(digest).decode("utf-8") == _page(index)
+    for digest in old[:4]:
+        with pytest.raises(KeyError):
+            archive.read(digest)
+    assert archive.usage()["pages"] == 4
+
+    # Another handle (e.g. another process) still reads the rewritten pack
+    assert SnapshotArchive(str(tmp_path)).read(new[-1]).decode("utf-8") == _page(7)
+
+def test_compact_evicts_oldest_pages_over_the_size_limit(tmp_path, codec, clock):
+    archive = SnapshotArchive(str(tmp_path), max_age_days=30)
+    digests = []
+    for index in range(5):
+        digests.append(archive.store(_page(index), "Booking.com", "html", f"https://booking.example/{index}"))
+        clock[0] += 60
+    sizes = [row["length"] for row in archive._db.execute("SELECT length FROM blobs ORDER BY pack_offset")]
+    archive.max_bytes = sum(sizes[-2:])
+    result = archive.compact()
+    assert result["evicted"] == 3
+    assert [snapshot["sha256"] for snapshot in archive.find()] == digests[-2:]
+    assert archive.read(digests[-1]).decode("utf-8") == _page(4)
+
+def test_store_async_flush(tmp_path, codec):
+    archive = SnapshotArchive(str(tmp_path))
+    for index in range(3):
+        archive.store_async(_page(index), "Booking.com", "html", f"https://booking.example/{index}", QUERY)
+    archive.store_async([{"results": [1]}], "Kayak", "json", "https://kayak.example/", QUERY)
+    assert archive.flush(timeout=10)
+    assert archive.stats["stored"] == 4
+    snapshots = archive.find(location="paris")
+    assert len(snapshots) == 4
+    assert json.loads(archive.read(snapshots[-1]["sha256"])) == [{"results": [1]}]
@@ -0,0 +1,82 @@
+import gzip
+import json
+import math
+
+import pytest
+
+import wire_format
+from wire_format import COLUMNS_FORMAT, COMPRESS_MIN_BYTES, MSGPACK_MEDIA_TYPE, dumps_json, encode_payload, from_columns, negotiate, project, to_columns
+
+def test_columns_round_trip():
+    hotels = wire_format._sample_hotels(40)
+    hotels[3]["stars"] = None
+    del hotels[5]["image_url"]
+    payload = to_columns(hotels)
+    assert payload["format"] == COLUMNS_FORMAT and payload["count"] == 40
+    # Repeated values are stored once, unique ones as plain lists
+    assert isinstance(payload["columns"]["source"], dict)
+    assert isinstance(payload["columns"]["name"], list)
+    expected = [{field: value for field, value in hotel.items() if value is not None} for hotel in hotels]
+    assert from_columns(json.loads(dumps_json(payload))) == expected
+
+def test_columns_with_fields_match_the_projection():
+    hotels = wire_format._sample_hotels(10)
+    fields = ["name", "price_value", "source"]
+    assert list(to_columns(hotels, fields)["columns"]) == fields
+    assert from_columns(to_columns(hotels, fields)) == project(hotels, fields)
+
+def test_from_columns_rejects_other_payloads():
+    with pytest.raises(ValueError):
+        from_columns({"format": "rows", "count": 0, "columns": {}})
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_non_finite_floats_are_null(monkeypatch, use_orjson):
+    if use_orjson and wire_format.orjson is None:
+        pytest.skip("orjson is not installed")
+    if not use_orjson:
+        monkeypatch.setattr(wire_format, "orjson", None)
+    payload = {"hotels": [{"price_value": math.inf, "rating": float("nan"), "stars": 4.0}]}
+    assert json.loads(dumps_json(payload)) == {"hotels": [{"price_value": None, "rating": None, "stars": 4.0}]}
+
+@pytest.fixture
+def no_brotli(monkeypatch):
+    monkeypatch.setattr(wire_format, "brotli", None)
+
+def test_negotiate_prefers_brotli_when_installed(monkeypatch):
+    monkeypatch.setattr(wire_format, "brotli", object())
+    assert negotiate(None, "gzip, br") == ("application/json", "br")
+    assert negotiate(None, "br;q=0.5, gzip") == ("application/json", "gzip")
+
+def test_negotiate_encodings(no_brotli):
+    assert negotiate(None, "gzip, deflate, br") == ("application/json", "gzip")
+    assert negotiate(None, "br") == ("application/json", None)
+    assert negotiate(None, "gzip;q=0") == ("application/json", None)
+    assert negotiate(None, "*") == ("application/json", "gzip")
+    assert negotiate(None, "*;q=0.5, gzip;q=0") == ("application/json", None)
+    assert negotiate(None, None) == ("application/json", None)
+
+def test_negotiate_media_type(monkeypatch, no_brotli):
+    monkeypatch.setattr(wire_format, "msgpack", None)
+    assert negotiate(MSGPACK_MEDIA_TYPE, None)[0] == "application/json"
+    monkeypatch.setattr(wire_format, "msgpack", object())
+    assert negotiate(f"{MSGPACK_MEDIA_TYPE}, application/json;q=0.5", None)[0] == MSGPACK_MEDIA_TYPE
+    assert negotiate(f"{MSGPACK_MEDIA_TYPE};q=0", None)[0] == "application/json"
+    assert negotiate(f"application/json, {MSGPACK_MEDIA_TYPE};q=0.1", None)[0] == "application/json"
+    assert negotiate(f"{MSGPACK_MEDIA_TYPE};q=0.5, */*;q=0.8", None)[0] == "application/json"
+    assert negotiate(f"{MSGPACK_MEDIA_TYPE}, application/json", None)[0] == MSGPACK_MEDIA_TYPE
+    assert negotiate(f"{MSGPACK_MEDIA_TYPE};q=0.9, application/*;q=0.5", None)[0] == MSGPACK_MEDIA_TYPE
+    # Wildcards alone never select MessagePack
+    assert negotiate("*/*", None)[0] == "application/json"
+
+def test_encode_payload_compresses_large_bodies_only(no_brotli):
+    small = {"hotels": []}
+    data, headers = encode_payload(small, None, "gzip")
+    assert "Content-Encoding" not in headers and json.loads(data) == small
+
+    large = {"hotels": wire_format._sample_hotels(30)}
+    data, headers = encode_payload(large, "application/json", "gzip")
+    assert headers["Content-Encoding"] == "gzip"
+    assert headers["Content-Type"] == "application/json"
+    assert headers["Vary"] == "Accept, Accept-Encoding"
+    raw = gzip.decompress(data)
+    assert len(raw) >= COMPRESS_MIN_BYTES and json.loads(raw) == json.loads(dumps_json(large))
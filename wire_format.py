@@ -0,0 +1,239 @@
+import json
+import gzip
+import math
+import logging
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+try:
+    import orjson
+except ImportError:  # the standard json module is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack responses are only offered when it is installed
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # gzip is offered instead
+    brotli = None
+
+# Layout of a columnar hotel list (see to_columns)
+COLUMNS_FORMAT = "hotels/columns-1"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+# Smaller bodies are sent uncompressed: the framing would cost more than it saves
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def project(hotels: List[Dict[str, Any]], fields: Optional[Sequence[str]]) -> List[Dict[str, Any]]:
+    """Keep only the given fields of each hotel (all of them if fields is empty)."""
+    if not fields:
+        return hotels
+    return [{field: hotel[field] for field in fields if field in hotel} for hotel in hotels]
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """'name, price,source' -> ['name', 'price', 'source']"""
+    return [field.strip() for field in (fields or "").split(",") if field.strip()]
+
+def to_columns(hotels: List[Dict[str, Any]], fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    Encode hotels column by column, naming each field once instead of once per hotel.
+
+    A column whose values repeat (the shared search URL used as booking_link, the
+    source, the area, star classes) is dictionary-encoded as {"d": distinct values,
+    "i": index of each hotel's value}; other columns are plain value lists. A
+    missing field is null.
+
+    Args:
+        hotels (list): Hotel dictionaries
+        fields (sequence, optional): Columns to include (default: every field, in first-seen order)
+
+    Returns:
+        dict: {"format": COLUMNS_FORMAT, "count": n, "columns": {field: column}}
+    """
+    if not fields:
+        fields = list(dict.fromkeys(field for hotel in hotels for field in hotel))
+    count = len(hotels)
+    columns = {}
+    for field in fields:
+        values = [hotel.get(field) for hotel in hotels]
+        columns[field] = _dictionary_encode(values) or values
+    return {"format": COLUMNS_FORMAT, "count": count, "columns": columns}
+
+def _dictionary_encode(values: List[Any]) -> Optional[Dict[str, Any]]:
+    # Only worth it when values repeat: at most one distinct value per two hotels
+    if len(values) < 4:
+        return None
+    distinct: Dict[Any, int] = {}
+    indexes = []
+    try:
+        for value in values:
+            indexes.append(distinct.setdefault(value, len(distinct)))
+            if len(distinct) * 2 > len(values):
+                return None
+    except TypeError:  # lists or dicts as values
+        return None
+    return {"d": list(distinct), "i": indexes}
+
+def from_columns(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Decode to_columns() output back into hotel dictionaries (null fields are left out)."""
+    if payload.get("format") != COLUMNS_FORMAT:
+        raise ValueError(f"Not a {COLUMNS_FORMAT} payload")
+    hotels = [{} for _ in range(payload["count"])]
+    for field, column in payload["columns"].items():
+        values = [column["d"][index] for index in column["i"]] if isinstance(column, dict) else column
+        for hotel, value in zip(hotels, values):
+            if value is not None:
+                hotel[field] = value
+    return hotels
+
+def _finite(value: Any) -> Any:
+    # NaN and infinity (the price_value of unpriced hotels) are not JSON: null, as orjson writes them
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+def dumps_json(payload: Any) -> bytes:
+    """Compact JSON bytes (orjson when installed); non-finite floats become null."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(_finite(payload), separators=(",", ":"), ensure_ascii=False, default=str, allow_nan=False).encode("utf-8")
+
+def dumps_msgpack(payload: Any) -> bytes:
+    return msgpack.packb(payload, default=str, use_bin_type=True)
+
+def _accepted(header: Optional[str]) -> Dict[str, float]:
+    # "gzip, br;q=0.9, *;q=0" -> {"gzip": 1.0, "br": 0.9, "*": 0.0}
+    accepted = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+def negotiate(accept: Optional[str], accept_encoding: Optional[str]) -> Tuple[str, Optional[str]]:
+    """
+    Pick the response media type and content encoding from the request headers.
+
+    Returns:
+        tuple: ("application/json" or MSGPACK_MEDIA_TYPE, "br", "gzip" or None)
+    """
+    media_type = "application/json"
+    if msgpack is not None:
+        types = _accepted(accept)
+        # MessagePack only when named explicitly, and ranked at least as high as JSON
+        msgpack_quality = types.get(MSGPACK_MEDIA_TYPE, 0.0)
+        json_quality = types.get("application/json", types.get("application/*", types.get("*/*", 0.0)))
+        if msgpack_quality > 0 and msgpack_quality >= json_quality:
+            media_type = MSGPACK_MEDIA_TYPE
+
+    encodings = _accepted(accept_encoding)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    scored = [(encodings.get(name, encodings.get("*", 0.0)), -rank, name) for rank, name in enumerate(candidates)]
+    quality, _, encoding = max(scored)
+    return media_type, encoding if quality > 0 else None
+
+def compress(data: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+    return data
+
+def encode_payload(payload: Any, accept: Optional[str] = None, accept_encoding: Optional[str] = None) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Serialize and compress a response body as the client accepts it.
+
+    Returns:
+        tuple: (body bytes, headers: Content-Type, Vary and, if compressed, Content-Encoding)
+    """
+    media_type, encoding = negotiate(accept, accept_encoding)
+    data = dumps_msgpack(payload) if media_type == MSGPACK_MEDIA_TYPE else dumps_json(payload)
+    headers = {"Content-Type": media_type, "Vary": "Accept, Accept-Encoding"}
+    if encoding and len(data) >= COMPRESS_MIN_BYTES:
+        try:
+            data = compress(data, encoding)
+            headers["Content-Encoding"] = encoding
+        except Exception as e:
+            logging.warning(f"Could not {encoding}-compress response: {str(e)}")
+    return data, headers
+
+def _sample_hotels(count: int) -> List[Dict[str, Any]]:
+    # Merged results as search_hotels returns them: Kayak hotels share the search URL
+    import random
+
+    rng = random.Random(0)
+    kayak_url = "https://www.kayak.com/hotels/Paris,France-c36014/2026-11-06/2026-11-08/2adults"
+    hotels = []
+    for index in range(count):
+        source = "Kayak" if index % 3 == 0 else "Booking.com"
+        price = rng.randint(45, 420)
+        rating = round(rng.uniform(6.0, 9.6), 1)
+        hotels.append({
+            "name": f"Hotel {rng.choice(['Grand', 'Central', 'Park', 'Garden', 'Plaza'])} {rng.choice(['Paris', 'Opera', 'Louvre', 'Marais'])} {index}",
+            "price": f"€ {price}",
+            "price_value": float(price),
+            "rating": f"{rating} {rng.choice(['Very good', 'Excellent', 'Good'])}",
+            "rating_normalized": rating / 2,
+            "stars": rng.choice([2, 3, 3, 4, 4, 5]),
+            "location": rng.choice(["Le Marais", "Opera", "Montmartre", "Latin Quarter", "Saint-Germain", "La Defense"]),
+            "description": "Comfortable rooms, free WiFi, breakfast available, 24-hour front desk.",
+            "booking_link": kayak_url if source == "Kayak" else f"https://www.booking.com/hotel/fr/hotel-{index}.html?checkin=2026-11-06&checkout=2026-11-08&group_adults=2",
+            "image_url": f"https://cf.bstatic.com/xdata/images/hotel/square240/{rng.randint(10**7, 10**8)}.jpg",
+            "source": source,
+            "rank": index + 1,
+        })
+    return hotels
+
+if __name__ == "__main__":
+    import argparse
+    import timeit
+
+    parser = argparse.ArgumentParser(description="Benchmark hotel response encodings: size and serialization time")
+    parser.add_argument("--hotels", type=int, default=300)
+    parser.add_argument("--fields", default="name,price,price_value,rating,rating_normalized,stars,location,source", help="Projection used by the projected variants")
+    args = parser.parse_args()
+
+    hotels = _sample_hotels(args.hotels)
+    fields = parse_fields(args.fields)
+    layouts = {
+        "rows": lambda: {"hotels": hotels},
+        "rows, projected": lambda: {"hotels": project(hotels, fields)},
+        "columns": lambda: {"hotels": to_columns(hotels)},
+        "columns, projected": lambda: {"hotels": to_columns(hotels, fields)},
+    }
+    serializers = {"json": lambda payload: json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")}
+    if orjson is not None:
+        serializers["orjson"] = dumps_json
+    if msgpack is not None:
+        serializers["msgpack"] = dumps_msgpack
+    encodings = [None, "gzip"] + (["br"] if brotli is not None else [])
+
+    def measure(fn) -> float:
+        runs, total = timeit.Timer(fn).autorange()
+        return total / runs * 1e3
+
+    baseline = len(serializers["json"]({"hotels": hotels}))
+    print(f"{len(hotels)} hotels; json rows baseline {baseline} bytes")
+    print(f"{'layout':<20}{'serializer':<12}{'encoding':<10}{'bytes':>9}{'vs base':>9}{'ms':>9}")
+    for layout, build in layouts.items():
+        for serializer, dump in serializers.items():
+            for encoding in encodings:
+                encode = lambda: compress(dump(build()), encoding)
+                size = len(encode())
+                print(f"{layout:<20}{serializer:<12}{encoding or '-':<10}{size:>9}{size / baseline:>9.0%}{measure(encode):>9.3f}")